@@ -1,14 +1,12 @@
 from flask import Flask,request, render_template
-import numpy as np
-import pickle
-import sklearn
-print(sklearn.__version__)
-#loading models
-dtr = pickle.load(open('dtr.pkl','rb'))
-preprocessor = pickle.load(open('preprocessor.pkl','rb'))
+from app.ml_registry import HotModel
+from app.yield_compiled import load_artifact
+#loading models (memory-mapped, shared between worker processes; follows the registry's active release)
+model = HotModel('yield', load_artifact)
 
 #flask app
 app = Flask(__name__)
+app.logger.info("Yield model %s", model.get().version)
 
 @app.route('/')
 def index():
@@ -23,11 +21,9 @@ def predict():
         Area = request.form['Area']
         Item  = request.form['Item']
 
-        features = np.array([[Year,average_rain_fall_mm_per_year,pesticides_tonnes,avg_temp,Area,Item]],dtype=object)
-        transformed_features = preprocessor.transform(features)
-        prediction = dtr.predict(transformed_features).reshape(1,-1)
+        prediction = model.get().predict_one(Year,average_rain_fall_mm_per_year,pesticides_tonnes,avg_temp,Area,Item)
 
-        return render_template('index.html',prediction = prediction[0][0])
+        return render_template('index.html',prediction = prediction)
 
 if __name__=="__main__":
     app.run(debug=True)
\ No newline at end of file
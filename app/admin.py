@@ -130,3 +130,13 @@ class NewsletterAdmin(admin.ModelAdmin):
             'has_permission': True,
         }
         return render(request, 'app/send_newsletter.html', context)
+
+
+from .models import PredictionJob
+
+@admin.register(PredictionJob)
+class PredictionJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'user', 'attempts', 'created_at', 'queue_wait_seconds', 'duration_seconds']
+    list_filter = ['kind', 'status']
+    search_fields = ['id', 'user__username']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'claimed_by']
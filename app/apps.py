@@ -6,3 +6,4 @@ class AppConfig(AppConfig):
     
     def ready(self):
         import app.signals
+        import app.checks
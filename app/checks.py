@@ -0,0 +1,23 @@
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.compatibility, deploy=True)
+def check_ocr_engine(app_configs, **kwargs):
+    """
+    Soil report scanning needs a working OCR engine; the rest of the site does not.
+    Deployment check only (`manage.py check --deploy`): it runs tesseract, which
+    migrate, shell and collectstatic should not pay for or warn about. At
+    runtime each ML worker runs the same check when it warms up, logs any
+    problem and reports it through the readiness probe.
+    """
+    from .ocr_engines import check_engine
+
+    engine, problems = check_engine(refresh=True)
+    return [
+        Warning(
+            f"Soil report OCR ({engine.get('engine')}) is unavailable: {problem}",
+            hint="Install tesseract-ocr, set TESSERACT_CMD / TESSDATA_PREFIX, or SOIL_OCR_ENGINE=fake for tests",
+            id='app.W001',
+        )
+        for problem in problems
+    ]
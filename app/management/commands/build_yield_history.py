@@ -0,0 +1,46 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app import ml_registry
+from app.yield_history import build_history, save_history
+
+
+class Command(BaseCommand):
+    help = "Convert yield_df.csv into the columnar historical yield store used for prediction context"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset', default=os.path.join(settings.BASE_DIR, 'yield_df.csv'),
+            help="Source CSV (default: yield_df.csv)"
+        )
+        parser.add_argument('--output', help="Write to this directory instead of the model registry")
+        parser.add_argument('--no-activate', action='store_true', help="Publish without making the release active")
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['dataset']):
+            raise CommandError(f"Dataset not found: {options['dataset']}")
+
+        started = time.perf_counter()
+        history = build_history(options['dataset'])
+        metadata = {'source': os.path.basename(options['dataset'])}
+        if options['output']:
+            save_history(history, options['output'], metadata=metadata)
+            output = options['output']
+        else:
+            with tempfile.TemporaryDirectory() as staging:
+                save_history(history, staging, metadata=metadata)
+                release = ml_registry.publish(
+                    'yield_history', [staging], metadata=metadata, activate=not options['no_activate']
+                )
+            output = os.path.join(ml_registry.ML_REGISTRY_DIR, 'yield_history', release['version'])
+        elapsed = time.perf_counter() - started
+
+        size = sum(a.nbytes for a in history.columns.values()) + history.offsets.nbytes
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {len(history)} area/crop/year rows for {len(history.areas)} areas and "
+            f"{len(history.items)} crops ({size / 1024:.0f} KiB) in {output} ({elapsed:.2f}s)"
+        ))
@@ -0,0 +1,80 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from app import ml_predict
+from app.ml_backends import create_backend
+
+
+class Command(BaseCommand):
+    help = "Compare disease model variants: latency vs top-1 agreement with the Keras model"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', required=True, help="Directory of sample leaf images")
+        parser.add_argument('--limit', type=int, default=200)
+        parser.add_argument(
+            '--variant', action='append', dest='variants', default=[],
+            help="backend:path, e.g. tflite:app/ml_models/plant_disease_model_int8.tflite (repeatable)"
+        )
+        parser.add_argument('--batch-size', type=int, default=1)
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def run_variant(self, backend, inputs, batch_size):
+        latencies = []
+        outputs = []
+        backend.predict(inputs[:1])  # warm-up, excluded from timings
+        for start in range(0, len(inputs), batch_size):
+            batch = inputs[start:start + batch_size]
+            began = time.perf_counter()
+            outputs.append(backend.predict(batch))
+            latencies.append((time.perf_counter() - began) * 1000 / len(batch))
+        return np.concatenate(outputs), np.array(latencies)
+
+    def handle(self, *args, **options):
+        paths = ml_predict.list_sample_images(options['images'], options['limit'])
+        arrays = [ml_predict.preprocess_image(str(p)) for p in paths]
+        arrays = [a for a in arrays if a is not None]
+        if not arrays:
+            raise CommandError(f"No readable images in {options['images']}")
+        inputs = np.stack(arrays).astype(np.float32)
+
+        variants = [('keras', str(ml_predict.MODEL_PATH))]
+        for spec in options['variants']:
+            name, _, path = spec.partition(':')
+            variants.append((name, path or str(ml_predict.model_path_for(name))))
+
+        report = []
+        reference = None
+        for name, path in variants:
+            backend = create_backend(name, path)
+            probabilities, latencies = self.run_variant(backend, inputs, options['batch_size'])
+            top1 = probabilities.argmax(axis=1)
+            if reference is None:
+                reference = top1
+            report.append({
+                'backend': name,
+                'model_path': path,
+                'images': len(inputs),
+                'batch_size': options['batch_size'],
+                'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+                'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+                'mean_ms': round(float(latencies.mean()), 3),
+                'top1_agreement': round(float((top1 == reference).mean()), 4),
+            })
+
+        baseline = report[0]['mean_ms']
+        for row in report:
+            row['speedup'] = round(baseline / row['mean_ms'], 2) if row['mean_ms'] else None
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{'variant':<60} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8} {'top-1 agree':>12}")
+        for row in report:
+            label = f"{row['backend']}:{row['model_path']}"
+            self.stdout.write(
+                f"{label[-60:]:<60} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['speedup']:>8} {row['top1_agreement']:>12.2%}"
+            )
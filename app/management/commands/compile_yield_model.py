@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app import ml_registry, yield_predict
+from app.yield_compiled import compile_model, save_artifact, load_artifact, verify
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile the yield preprocessor and decision tree into a memory-mappable artifact "
+        "(.npy arrays + manifest.json) published as a 'yield' registry release, optionally "
+        "verifying it against sklearn"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Write to this directory instead of the model registry")
+        parser.add_argument('--no-activate', action='store_true', help="Publish without making the release active")
+        parser.add_argument('--no-save', action='store_true', help="Compile (and verify) without writing")
+        parser.add_argument(
+            '--verify', action='store_true',
+            help="Check the model read back from disk is bit-identical to sklearn on the whole dataset"
+        )
+        parser.add_argument(
+            '--dataset', default=os.path.join(settings.BASE_DIR, 'yield_df.csv'),
+            help="CSV used for verification (default: yield_df.csv)"
+        )
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        dtr, preprocesser = yield_predict.load_sklearn_models()
+
+        started = time.perf_counter()
+        compiled = compile_model(dtr, preprocesser)
+        report = {
+            'version': compiled.version,
+            'nodes': compiled.node_count,
+            'features': compiled.n_features,
+            'array_bytes': compiled.nbytes,
+            'compile_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+
+        if not options['no_save']:
+            import sklearn
+            metadata = {'source': ['dtr.pkl', 'preprocesser.pkl'], 'sklearn_version': sklearn.__version__}
+            if options['output']:
+                output = options['output']
+                save_artifact(compiled, output, metadata=metadata)
+            else:
+                # The version is the model fingerprint: an already published model is only (re)activated
+                if compiled.version not in [r['version'] for r in ml_registry.versions('yield')]:
+                    with tempfile.TemporaryDirectory() as staging:
+                        save_artifact(compiled, staging, metadata=metadata)
+                        ml_registry.publish('yield', [staging], version=compiled.version, metadata=metadata)
+                if not options['no_activate']:
+                    ml_registry.activate_version('yield', compiled.version)
+                output = os.path.join(ml_registry.ML_REGISTRY_DIR, 'yield', compiled.version)
+            started = time.perf_counter()
+            compiled = load_artifact(output)
+            report['output'] = output
+            report['load_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+        if options['verify']:
+            if not os.path.exists(options['dataset']):
+                raise CommandError(f"Dataset not found: {options['dataset']}")
+            report['verification'] = verify(compiled, dtr, preprocesser, options['dataset'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(
+                f"Compiled model {report['version']}: {report['nodes']} nodes over {report['features']} "
+                f"features ({report['array_bytes'] / 1024:.0f} KiB) in {report['compile_ms']} ms"
+            )
+            if 'output' in report:
+                self.stdout.write(f"Saved to {report['output']} (memory-mapped load: {report['load_ms']} ms)")
+            if 'verification' in report:
+                v = report['verification']
+                self.stdout.write(
+                    f"Verified {v['rows']} rows ({v['skipped_unknown']} skipped): "
+                    f"sklearn {v['sklearn_ms']} ms, compiled batch {v['compiled_batch_ms']} ms, "
+                    f"compiled single-row {v['compiled_single_ms']} ms"
+                )
+
+        if options['verify']:
+            v = report['verification']
+            if v['batch_mismatches'] or v['single_mismatches']:
+                raise CommandError(
+                    f"Compiled model differs from sklearn: {v['batch_mismatches']} batch and "
+                    f"{v['single_mismatches']} single-row mismatches (max diff {v['max_abs_diff']})"
+                )
+            self.stdout.write(self.style.SUCCESS("Compiled output is bit-identical to sklearn"))
@@ -0,0 +1,178 @@
+import csv
+import json
+import os
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from app.soil_report_scanner import SOIL_FIELDS, extract_soil_data_from_image
+
+try:
+    import resource
+except ImportError:  # Windows: CPU time is not reported
+    resource = None
+
+LABELS_FILE = 'labels.csv'
+# Rendered like a 12 MP phone photo of an A4 lab report
+PHOTO_SIZE = (4000, 3000)
+PAGE_SIZE = (1240, 1754)
+VALUE_RANGES = {'ph': (4.5, 9.0), 'nitrogen': (80, 600), 'phosphorus': (5, 80), 'potassium': (50, 500)}
+ROWS = {
+    'ph': 'Soil pH',
+    'nitrogen': 'Available Nitrogen (kg/ha)',
+    'phosphorus': 'Available Phosphorus (kg/ha)',
+    'potassium': 'Available Potassium (kg/ha)',
+}
+
+
+def _cpu_seconds():
+    """(this process, reaped child processes) user + system CPU seconds"""
+    if resource is None:
+        return 0.0, 0.0
+    own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+
+def render_sample(path, values, rng):
+    """Lab report table photographed at an angle under uneven light, saved as JPEG"""
+    page = Image.new('L', PAGE_SIZE, 245)
+    draw = ImageDraw.Draw(page)
+    title, body = ImageFont.load_default(size=44), ImageFont.load_default(size=30)
+    draw.text((120, 120), 'SOIL TEST REPORT', font=title, fill=20)
+    draw.text((120, 200), f'Sample No. {rng.randint(1000, 9999)}   Farmer: Plot {rng.randint(1, 99)}', font=body, fill=40)
+    top, row_height = 360, 70
+    for i, field in enumerate(('parameter',) + SOIL_FIELDS):
+        y = top + i * row_height
+        draw.line((100, y, PAGE_SIZE[0] - 100, y), fill=30, width=3)
+        label = 'Parameter' if field == 'parameter' else ROWS[field]
+        value = 'Value' if field == 'parameter' else f'{values[field]:g}'
+        draw.text((120, y + 18), label, font=body, fill=25)
+        draw.text((820, y + 18), value, font=body, fill=25)
+    draw.line((100, top + 5 * row_height, PAGE_SIZE[0] - 100, top + 5 * row_height), fill=30, width=3)
+    draw.text((120, top + 5 * row_height + 60), 'Recommendation: apply as per soil test.', font=body, fill=40)
+
+    scale = rng.uniform(1.3, 1.6)
+    page = page.resize((int(PAGE_SIZE[0] * scale), int(PAGE_SIZE[1] * scale)), Image.BICUBIC)
+    page = page.rotate(rng.uniform(-2, 2), Image.BICUBIC, expand=True, fillcolor=60)
+    photo = Image.new('L', PHOTO_SIZE, 60)
+    photo.paste(page, ((PHOTO_SIZE[0] - page.size[0]) // 2, (PHOTO_SIZE[1] - page.size[1]) // 2))
+
+    pixels = np.asarray(photo, dtype=np.float32)
+    light = np.linspace(rng.uniform(0.55, 0.8), 1.0, PHOTO_SIZE[0], dtype=np.float32)
+    pixels = pixels * light[np.newaxis, :] + np.random.default_rng(rng.randint(0, 2**31)).normal(0, 6, pixels.shape)
+    photo = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(1.2))
+    photo.convert('RGB').save(path, 'JPEG', quality=85)
+
+
+def write_synthetic(directory, count, seed):
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    with open(os.path.join(directory, LABELS_FILE), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('filename',) + SOIL_FIELDS)
+        for i in range(count):
+            values = {
+                field: round(rng.uniform(low, high), 1) if field == 'ph' else rng.randint(int(low), int(high))
+                for field, (low, high) in VALUE_RANGES.items()
+            }
+            filename = f'report_{i:03d}.jpg'
+            render_sample(os.path.join(directory, filename), values, rng)
+            writer.writerow([filename] + [values[field] for field in SOIL_FIELDS])
+
+
+def read_labels(directory):
+    path = os.path.join(directory, LABELS_FILE)
+    if not os.path.exists(path):
+        raise CommandError(f"{path} not found (columns: filename,{','.join(SOIL_FIELDS)})")
+    with open(path, newline='') as f:
+        return [
+            (os.path.join(directory, row['filename']),
+             {field: float(row[field]) if row.get(field) not in (None, '') else None for field in SOIL_FIELDS})
+            for row in csv.DictReader(f)
+        ]
+
+
+class Command(BaseCommand):
+    help = "Soil report OCR accuracy, wall time and CPU time per preprocessing mode on a labeled sample set"
+
+    def add_arguments(self, parser):
+        parser.add_argument('samples', help=f"Directory of report images with {LABELS_FILE}")
+        parser.add_argument('--modes', default='adaptive,basic', help="Preprocessing modes to compare")
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help="First render this many labeled phone-photo reports into the directory")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--tolerance', type=float, default=0.01, help="Allowed absolute error per value")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def evaluate(self, mode, samples, tolerance):
+        correct = dict.fromkeys(SOIL_FIELDS, 0)
+        expected = dict.fromkeys(SOIL_FIELDS, 0)
+        complete, walls, failures = 0, [], []
+        cpu_before = _cpu_seconds()
+        for path, labels in samples:
+            started = time.perf_counter()
+            result = extract_soil_data_from_image(path, preprocess=mode)
+            walls.append((time.perf_counter() - started) * 1000)
+            right = 0
+            for field in SOIL_FIELDS:
+                if labels[field] is None:
+                    continue
+                expected[field] += 1
+                found = result.get(field)
+                if found is not None and abs(found - labels[field]) <= tolerance:
+                    correct[field] += 1
+                    right += 1
+            complete += right == sum(v is not None for v in labels.values())
+            if not result['success']:
+                failures.append(f"{os.path.basename(path)}: {result['message']}")
+        cpu = [(after - before) * 1000 / len(samples) for after, before in zip(_cpu_seconds(), cpu_before)]
+        walls = np.array(walls)
+        return {
+            'mode': mode,
+            'images': len(samples),
+            'accuracy': {field: round(correct[field] / expected[field], 4) if expected[field] else None for field in SOIL_FIELDS},
+            'all_fields': round(complete / len(samples), 4),
+            'p50_ms': round(float(np.percentile(walls, 50)), 1),
+            'p95_ms': round(float(np.percentile(walls, 95)), 1),
+            'mean_ms': round(float(walls.mean()), 1),
+            # Preprocessing (and the tesserocr engine) run in this process,
+            # the cli engine's Tesseract passes in child processes
+            'cpu_ms_per_image': {
+                'in_process': round(cpu[0], 1),
+                'subprocesses': round(cpu[1], 1),
+            },
+            'failures': failures[:5],
+        }
+
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            write_synthetic(options['samples'], options['synthetic'], options['seed'])
+        samples = read_labels(options['samples'])
+        if not samples:
+            raise CommandError(f"No samples listed in {options['samples']}")
+
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        report = [self.evaluate(mode, samples, options['tolerance']) for mode in modes]
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'mode':<10} " + ' '.join(f'{field:>10}' for field in SOIL_FIELDS)
+            + f" {'all four':>9} {'p50 ms':>8} {'p95 ms':>8} {'cpu own':>8} {'cpu sub':>8}"
+        )
+        for row in report:
+            accuracy = ' '.join(
+                f"{row['accuracy'][field]:>10.1%}" if row['accuracy'][field] is not None else f"{'-':>10}"
+                for field in SOIL_FIELDS
+            )
+            self.stdout.write(
+                f"{row['mode']:<10} {accuracy} {row['all_fields']:>9.1%} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+                f"{row['cpu_ms_per_image']['in_process']:>8} {row['cpu_ms_per_image']['subprocesses']:>8}"
+            )
+            for failure in row['failures']:
+                self.stdout.write(f"  {failure}")
@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from app import ml_predict
+
+
+class Command(BaseCommand):
+    help = "Convert plant_disease_model.h5 to TFLite (float, dynamic-range or int8)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quantize', choices=['none', 'dynamic', 'int8'], default='dynamic',
+            help="none = float32, dynamic = dynamic-range weights, int8 = full integer (needs calibration images)"
+        )
+        parser.add_argument('--calibration-dir', help="Directory of sample leaf images for int8 calibration")
+        parser.add_argument('--calibration-samples', type=int, default=200)
+        parser.add_argument('--output', help="Output .tflite path (default: ml_models/plant_disease_model[_<mode>].tflite)")
+
+    def representative_dataset(self, directory, limit):
+        paths = ml_predict.list_sample_images(directory, limit)
+        if not paths:
+            raise CommandError(f"No calibration images found in {directory}")
+        self.stdout.write(f"Calibrating on {len(paths)} images from {directory}")
+
+        def generator():
+            for path in paths:
+                img_array = ml_predict.preprocess_image(str(path))
+                if img_array is not None:
+                    yield [np.expand_dims(img_array.astype(np.float32), axis=0)]
+        return generator
+
+    def handle(self, *args, **options):
+        import tensorflow as tf
+
+        mode = options['quantize']
+        if mode == 'int8' and not options.get('calibration_dir'):
+            raise CommandError("--quantize int8 requires --calibration-dir")
+
+        model = tf.keras.models.load_model(str(ml_predict.MODEL_PATH))
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+        if mode in ('dynamic', 'int8'):
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if mode == 'int8':
+            converter.representative_dataset = self.representative_dataset(
+                options['calibration_dir'], options['calibration_samples']
+            )
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            converter.inference_input_type = tf.int8
+            converter.inference_output_type = tf.int8
+
+        tflite_model = converter.convert()
+
+        if options.get('output'):
+            output = Path(options['output'])
+        elif mode == 'dynamic':
+            output = ml_predict.TFLITE_MODEL_PATH
+        else:
+            output = ml_predict.TFLITE_MODEL_PATH.with_name(f"plant_disease_model_{mode}.tflite")
+        output.write_bytes(tflite_model)
+
+        h5_size = ml_predict.MODEL_PATH.stat().st_size
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {output} ({len(tflite_model) / 1e6:.1f} MB, {h5_size / max(len(tflite_model), 1):.1f}x smaller than .h5)"
+        ))
@@ -0,0 +1,78 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import ml_registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage versioned model releases: list them, publish files as a new release, "
+        "verify checksums and switch the active version (running workers hot-swap)"
+    )
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest='action', required=True)
+
+        listing = actions.add_parser('list', help="Active and available versions")
+        listing.add_argument('name', nargs='?', help="Only this model")
+        listing.add_argument('--json', action='store_true', help="Print as JSON")
+
+        publish = actions.add_parser('publish', help="Copy files/directories into a new release")
+        publish.add_argument('name', help="Model name, e.g. yield, yield_history, disease")
+        publish.add_argument('paths', nargs='+', help="Files or directories making up the release")
+        publish.add_argument('--version', help="Version label (default: content digest)")
+        publish.add_argument('--activate', action='store_true', help="Make it the active version")
+
+        activate = actions.add_parser('activate', help="Point a model at another version")
+        activate.add_argument('name')
+        activate.add_argument('version')
+
+        verify = actions.add_parser('verify', help="Check release files against their checksums")
+        verify.add_argument('name')
+        verify.add_argument('version', nargs='?', help="Default: the active version")
+
+    def handle(self, *args, **options):
+        try:
+            getattr(self, f"_{options['action']}")(options)
+        except ml_registry.RegistryError as e:
+            raise CommandError(str(e))
+
+    def _list(self, options):
+        status = ml_registry.registry_status()
+        if options['name']:
+            status = {options['name']: status.get(options['name'], {'active': None, 'versions': []})}
+        if options['json']:
+            self.stdout.write(json.dumps(status, indent=2))
+            return
+        if not status:
+            self.stdout.write(f"No models in {ml_registry.ML_REGISTRY_DIR}")
+        for name, model in status.items():
+            self.stdout.write(f"{name}:")
+            for release in model['versions']:
+                marker = '*' if release['version'] == model['active'] else ' '
+                self.stdout.write(
+                    f"  {marker} {release['version']}  {release['created_at']}  {release['bytes'] / 1024:.0f} KiB"
+                )
+
+    def _publish(self, options):
+        release = ml_registry.publish(
+            options['name'], options['paths'], version=options['version'], activate=options['activate']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Published {options['name']}/{release['version']} ({len(release['files'])} files)"
+            + (", now active" if options['activate'] else "")
+        ))
+
+    def _activate(self, options):
+        previous = ml_registry.activate_version(options['name'], options['version'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['name']}: {previous or '(none)'} -> {options['version']}; "
+            f"running workers switch within {ml_registry.ML_MODEL_RELOAD_INTERVAL:g}s"
+        ))
+
+    def _verify(self, options):
+        problems = ml_registry.verify(options['name'], options['version'])
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS("All checksums match"))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Load smoke check: loads the models in this manage.py process and reports
+    how long each took. Requests are served by the ML worker processes, which
+    load (and warm, with ML_WORKER_WARM=1) their own copies when they start, so
+    nothing loaded here is reused by the web server.
+    """
+    help = (
+        "Check that the disease and yield models load, and time it. Does not warm the "
+        "ML worker processes that serve requests; they warm themselves on start"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only', choices=['disease', 'yield'],
+            help="Warm a single model instead of all of them"
+        )
+
+    def handle(self, *args, **options):
+        only = options.get('only')
+        failed = []
+
+        if only in (None, 'disease'):
+            from app import ml_predict
+            started = time.perf_counter()
+            model, _ = ml_predict.load_model()
+            elapsed = time.perf_counter() - started
+            if model is None:
+                failed.append('disease')
+                self.stderr.write(f"Disease model failed to load: {ml_predict.model_status()['error']}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Disease model ready in {elapsed:.2f}s"))
+
+        if only in (None, 'yield'):
+            from app import yield_predict
+            started = time.perf_counter()
+            try:
+                yield_predict.load_models()
+            except Exception as e:
+                failed.append('yield')
+                self.stderr.write(f"Yield model failed to load: {e}")
+            else:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(self.style.SUCCESS(f"Yield model ready in {elapsed:.2f}s"))
+
+        if failed:
+            raise CommandError(f"Could not warm: {', '.join(failed)}")
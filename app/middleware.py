@@ -23,6 +23,7 @@ class LoginRequiredMiddleware:
             '/password-reset-confirm/',
             '/password-reset-complete/',
             '/admin/',
+            '/inference/ready/',
         ]
 
     def __call__(self, request):
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_predictionjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SoilReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image_sha256', models.CharField(max_length=64)),
+                ('ph', models.FloatField(blank=True, null=True)),
+                ('nitrogen', models.FloatField(blank=True, null=True)),
+                ('phosphorus', models.FloatField(blank=True, null=True)),
+                ('potassium', models.FloatField(blank=True, null=True)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='soil_reports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+                'indexes': [models.Index(fields=['user', '-updated_at'], name='app_soilrep_user_id_e057dc_idx'), models.Index(fields=['image_sha256'], name='app_soilrep_image_s_6a4b0d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'image_sha256'), name='unique_soil_report_image_per_user')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_predictionjob_payload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='soilreport',
+            name='parser_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,86 @@
+"""
+Inference backends for the plant disease model
+Keras (.h5) or TFLite interpreter, chosen at runtime
+"""
+import threading
+
+import numpy as np
+
+
+class KerasBackend:
+    """Full Keras model loaded from the .h5 file"""
+    name = 'keras'
+
+    def __init__(self, model_path):
+        import tensorflow as tf
+        self.model_path = str(model_path)
+        self.model = tf.keras.models.load_model(self.model_path)
+
+    def predict(self, batch):
+        return self.model.predict(np.asarray(batch, dtype=np.float32), verbose=0)
+
+
+class TFLiteBackend:
+    """
+    TFLite interpreter for float, dynamic-range or int8 exports.
+    Quantized inputs/outputs are (de)quantized with the tensor's scale and zero point.
+    """
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.model_path = str(model_path)
+        self.interpreter = Interpreter(model_path=self.model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # Interpreter instances are not thread-safe
+        self._lock = threading.Lock()
+
+    def _quantize(self, batch):
+        dtype = self._input['dtype']
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = self._input['quantization']
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+    def _dequantize(self, output):
+        if self._output['dtype'] == np.float32:
+            return output
+        scale, zero_point = self._output['quantization']
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch):
+        batch = self._quantize(np.asarray(batch))
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input['index'], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self._input['index'], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output['index']).copy()
+        return self._dequantize(output)
+
+
+BACKENDS = {
+    'keras': KerasBackend,
+    'tflite': TFLiteBackend,
+}
+
+
+def create_backend(name, model_path):
+    """Instantiate backend `name` ('keras' or 'tflite') for `model_path`"""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown disease model backend '{name}', expected one of {sorted(BACKENDS)}")
+    return backend_class(model_path)
@@ -0,0 +1,122 @@
+"""
+Micro-batching for model inference
+Collects concurrent single-item requests into one batched forward pass
+"""
+import threading
+import time
+import queue
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Groups items submitted from many request threads into batches.
+
+    A background thread waits for the first item, then keeps collecting
+    for up to `window_ms` milliseconds or until `max_batch_size` items are
+    queued, runs `predict_fn` once on the stacked batch and hands each
+    caller its own row of the output.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, window_ms=5.0, name='batcher'):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            'batches': 0,
+            'items': 0,
+            'errors': 0,
+            'occupancy': {},
+            'wait_ms_total': 0.0,
+            'predict_ms_total': 0.0,
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        """Queue a single item and return a Future for its output row"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def predict(self, item, timeout=None):
+        """Blocking helper: submit one item and wait for its result"""
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            items = [entry[0] for entry in batch]
+            futures = [entry[1] for entry in batch]
+            try:
+                outputs = self.predict_fn(np.stack(items))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                self._record(batch, started, error=True)
+                continue
+
+            for future, output in zip(futures, outputs):
+                future.set_result(output)
+            self._record(batch, started)
+
+    def _record(self, batch, started, error=False):
+        finished = time.perf_counter()
+        size = len(batch)
+        with self._lock:
+            stats = self._stats
+            stats['batches'] += 1
+            stats['items'] += size
+            if error:
+                stats['errors'] += 1
+            stats['occupancy'][size] = stats['occupancy'].get(size, 0) + 1
+            stats['wait_ms_total'] += sum(started - entry[2] for entry in batch) * 1000
+            stats['predict_ms_total'] += (finished - started) * 1000
+
+    def stats(self):
+        """Snapshot of batch occupancy and timing counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            occupancy = dict(stats.pop('occupancy'))
+        batches = stats['batches'] or 1
+        items = stats['items'] or 1
+        return {
+            'max_batch_size': self.max_batch_size,
+            'window_ms': round(self.window * 1000, 3),
+            'queued': self._queue.qsize(),
+            'batches': stats['batches'],
+            'items': stats['items'],
+            'errors': stats['errors'],
+            'mean_batch_size': round(stats['items'] / batches, 3),
+            'mean_occupancy': round(stats['items'] / batches / self.max_batch_size, 3),
+            'occupancy': {str(size): count for size, count in sorted(occupancy.items())},
+            'mean_queue_wait_ms': round(stats['wait_ms_total'] / items, 3),
+            'mean_predict_ms': round(stats['predict_ms_total'] / batches, 3),
+        }
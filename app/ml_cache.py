@@ -0,0 +1,109 @@
+"""
+In-process result caches for ML predictions
+LRU eviction, TTL expiry and hit/miss counters
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+class ResultCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def _alive(self, key, entry, now):
+        if self.ttl > 0 and now - entry[1] > self.ttl:
+            del self._entries[key]
+            self._counters['expired'] += 1
+            return False
+        return True
+
+    def get(self, key, count=True):
+        """Cached value for `key` or None; refreshes its LRU position"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._alive(key, entry, now):
+                self._entries.move_to_end(key)
+                if count:
+                    self._counters['hits'] += 1
+                return entry[0]
+            if count:
+                self._counters['misses'] += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+        lookups = counters['hits'] + counters['misses']
+        return {
+            'size': size,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            **counters,
+            'hit_rate': round(counters['hits'] / lookups, 4) if lookups else 0.0,
+        }
+
+
+class PerceptualCache(ResultCache):
+    """ResultCache keyed by 64-bit perceptual hashes, matched within a Hamming distance"""
+
+    def get_near(self, phash, max_distance):
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_distance = None, max_distance + 1
+            for key, entry in list(self._entries.items()):
+                if not self._alive(key, entry, now):
+                    continue
+                distance = (key ^ phash).bit_count()
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._counters['hits'] += 1
+            return self._entries[best_key][0]
+
+
+def tensor_digest(img_array):
+    """
+    Content hash of a normalized image tensor. Values are quantized back to
+    8 bits first, so the same upload always hashes identically.
+    """
+    quantized = np.clip(np.rint(np.asarray(img_array) * 255), 0, 255).astype(np.uint8)
+    digest = hashlib.blake2b(quantized.tobytes(), digest_size=16)
+    digest.update(str(quantized.shape).encode())
+    return digest.hexdigest()
+
+
+def dhash(img_array, hash_size=8):
+    """64-bit difference hash of a normalized (H, W, 3) tensor, robust to re-encoding"""
+    gray = np.asarray(img_array, dtype=np.float32).mean(axis=2)
+    small = Image.fromarray(np.clip(gray * 255, 0, 255).astype(np.uint8))
+    small = np.asarray(small.resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
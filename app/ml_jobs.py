@@ -0,0 +1,246 @@
+"""
+Asynchronous prediction jobs
+Requests enqueue a PredictionJob row (with its payload) and return immediately;
+dispatcher threads in any web process claim queued rows, hand the work to the
+ML worker pool and store the result for polling. Because the queue is the
+database, queued jobs survive restarts and rows left claimed by a dead process
+are re-queued (or failed) when dispatchers start.
+"""
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .ml_workers import ml_pool, PoolBusy
+
+# Threads feeding the ML worker pool from the job queue
+ML_JOB_THREADS = int(os.getenv('ML_JOB_THREADS', '2'))
+# Longest a single long-poll request may wait for a result (seconds)
+ML_JOB_MAX_WAIT = float(os.getenv('ML_JOB_MAX_WAIT', '30'))
+# Unfinished jobs older than this are reported failed instead of being run
+ML_JOB_STALE_AFTER = float(os.getenv('ML_JOB_STALE_AFTER', '900'))
+# Times a job is tried (claims, including ones lost with their process) before it fails
+ML_JOB_MAX_ATTEMPTS = int(os.getenv('ML_JOB_MAX_ATTEMPTS', '5'))
+# Retry delay after PoolBusy, doubled per attempt (seconds)
+ML_JOB_RETRY_DELAY = float(os.getenv('ML_JOB_RETRY_DELAY', '0.5'))
+# Longest an idle dispatcher waits before checking the table for new jobs (seconds)
+ML_JOB_POLL_INTERVAL = float(os.getenv('ML_JOB_POLL_INTERVAL', '1'))
+
+# Identifies this process's claims
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+_events = {}
+_events_lock = threading.Lock()
+_wakeup = threading.Event()
+_threads = []
+_start_lock = threading.Lock()
+
+
+def start():
+    """Recover jobs left claimed by a dead process and start this process's dispatchers"""
+    if _threads:
+        return
+    with _start_lock:
+        if _threads:
+            return
+        try:
+            recover_jobs()
+        except Exception as e:
+            print(f"❌ Prediction job recovery failed: {e}")
+        finally:
+            close_old_connections()
+        for i in range(max(1, ML_JOB_THREADS)):
+            thread = threading.Thread(target=_run, name=f'ml-jobs-{i}', daemon=True)
+            thread.start()
+            _threads.append(thread)
+
+
+def submit_job(user, kind, *args, upload=None, on_result=''):
+    """
+    Create a queued PredictionJob for ml_pool task `kind`, called as
+    task(upload, *args) (or task(*args) without an upload).
+    `upload` must be bytes: Django deletes spill files when the request ends.
+    `args` must be JSON-serializable. `on_result` is the dotted path of a
+    function(job, result), run by the dispatcher once the task succeeds.
+    """
+    from .models import PredictionJob
+    start()
+    job = PredictionJob.objects.create(
+        user=user if user and user.is_authenticated else None,
+        kind=kind, upload=upload, args=list(args), result_hook=on_result,
+    )
+    with _events_lock:
+        _events[job.id] = threading.Event()
+    _wakeup.set()
+    return job
+
+
+def claim_job():
+    """
+    Atomically move the oldest runnable queued job to running, for this process.
+    The conditional UPDATE is the claim: of several dispatchers racing for the
+    same row (in any process) exactly one sees it still queued.
+    """
+    from .models import PredictionJob
+    while True:
+        now = timezone.now()
+        job_id = (
+            PredictionJob.objects
+            .filter(status='queued', created_at__gte=now - timedelta(seconds=ML_JOB_STALE_AFTER))
+            .filter(Q(run_after__isnull=True) | Q(run_after__lte=now))
+            .order_by('created_at')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = PredictionJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', started_at=timezone.now(), claimed_by=WORKER_ID, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return PredictionJob.objects.get(pk=job_id)
+
+
+def recover_jobs(lease=None):
+    """
+    Re-queue jobs claimed longer ago than `lease` (default: the pool timeout plus
+    a margin, past which no live dispatcher can still be running them) and fail
+    the ones out of attempts. Returns (requeued, failed).
+    """
+    from .models import PredictionJob
+    lease = lease if lease is not None else ml_pool.timeout + 60
+    cutoff = timezone.now() - timedelta(seconds=lease)
+    lost = PredictionJob.objects.filter(status='running', started_at__lt=cutoff)
+    failed = lost.filter(attempts__gte=ML_JOB_MAX_ATTEMPTS).update(
+        status='failed', error='Job was lost before it finished, please resubmit',
+        finished_at=timezone.now(), upload=None,
+    )
+    requeued = lost.update(status='queued', started_at=None, claimed_by='')
+    if requeued or failed:
+        print(f"⚠️ Prediction jobs left claimed: {requeued} re-queued, {failed} failed")
+    return requeued, failed
+
+
+def _run():
+    while True:
+        close_old_connections()
+        try:
+            job = claim_job()
+        except Exception as e:
+            print(f"❌ Prediction job could not be claimed: {e}")
+            job = None
+        if job is None:
+            _wakeup.wait(ML_JOB_POLL_INTERVAL)
+            _wakeup.clear()
+            continue
+        try:
+            _execute(job)
+        except Exception as e:
+            print(f"❌ Prediction job {job.id} could not be recorded: {e}")
+            _notify(job.id)
+        finally:
+            close_old_connections()
+
+
+def _execute(job):
+    from .models import PredictionJob
+    args = ([bytes(job.upload)] if job.upload is not None else []) + list(job.args)
+    try:
+        result = ml_pool.run(job.kind, *args)
+    except PoolBusy as e:
+        if job.attempts >= ML_JOB_MAX_ATTEMPTS:
+            _finish(job, status='failed', error=str(e))
+        else:
+            # Accepted already: back off and let any dispatcher retry it
+            delay = ML_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            PredictionJob.objects.filter(pk=job.pk).update(
+                status='queued', started_at=None, claimed_by='',
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+        return
+    except Exception as e:
+        _finish(job, status='failed', error=str(e) or e.__class__.__name__)
+        return
+
+    if job.result_hook:
+        try:
+            import_string(job.result_hook)(job, result)
+        except Exception as e:
+            print(f"❌ Prediction job {job.id} result hook failed: {e}")
+    _finish(job, status='done', result=result)
+
+
+def _finish(job, **fields):
+    """Record the outcome and drop the payload"""
+    from .models import PredictionJob
+    PredictionJob.objects.filter(pk=job.pk).update(finished_at=timezone.now(), upload=None, **fields)
+    _notify(job.id)
+
+
+def _notify(job_id):
+    with _events_lock:
+        event = _events.pop(job_id, None)
+    if event is not None:
+        event.set()
+
+
+def wait_for_job(job_id, timeout):
+    """
+    Block up to `timeout` seconds (capped at ML_JOB_MAX_WAIT) until the job finishes.
+    Jobs this process runs wake the waiter directly; jobs claimed by another
+    process are noticed by polling the row.
+    """
+    from .models import PredictionJob
+    timeout = max(0.0, min(float(timeout), ML_JOB_MAX_WAIT))
+    with _events_lock:
+        event = _events.get(job_id) or threading.Event()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if event.wait(min(0.25, max(0.0, deadline - time.monotonic()))):
+            break
+        if PredictionJob.objects.filter(pk=job_id, status__in=['done', 'failed']).exists():
+            _notify(job_id)
+            break
+
+    job = PredictionJob.objects.filter(pk=job_id).first()
+    if job is not None and job.status == 'queued':
+        _expire_if_stale(job)
+    return job
+
+
+def _expire_if_stale(job):
+    """Queued jobs nobody claimed within ML_JOB_STALE_AFTER are not run any more"""
+    age = (timezone.now() - job.created_at).total_seconds()
+    if age > ML_JOB_STALE_AFTER:
+        from .models import PredictionJob
+        PredictionJob.objects.filter(pk=job.pk, status='queued').update(
+            status='failed', error='Job expired before it could run, please resubmit',
+            finished_at=timezone.now(), upload=None,
+        )
+        job.refresh_from_db()
+
+
+def job_payload(job):
+    """JSON shape returned by the polling endpoint"""
+    return {
+        'job_id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'result': job.result,
+        'error': job.error or None,
+        'attempts': job.attempts,
+        'created_at': job.created_at.isoformat(),
+        'queue_wait_seconds': job.queue_wait_seconds,
+        'duration_seconds': job.duration_seconds,
+    }
+
+
+def queue_depth():
+    from .models import PredictionJob
+    return PredictionJob.objects.filter(status='queued').count()
@@ -2,52 +2,233 @@
 Plant Disease Prediction Module
 """
 
-import tensorflow as tf
 import numpy as np
-from PIL import Image, ImageEnhance
 import json
 import os
+import threading
 from pathlib import Path
+from .ml_batching import MicroBatcher
+from .ml_backends import create_backend
+from .ml_cache import ResultCache, PerceptualCache, tensor_digest, dhash
+from .ml_registry import HotModel
+from .ml_preprocess import decode_into, preprocess_batch
 
 # Use absolute paths
 BASE_DIR = Path(__file__).resolve().parent
 MODEL_PATH = BASE_DIR / 'ml_models' / 'plant_disease_model.h5'
+TFLITE_MODEL_PATH = BASE_DIR / 'ml_models' / 'plant_disease_model.tflite'
 CLASSES_PATH = BASE_DIR / 'ml_models' / 'classes.json'
 IMG_SIZE = 224
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
 
-# Load model and classes
-try:
-    model = tf.keras.models.load_model(str(MODEL_PATH))
-    with open(str(CLASSES_PATH), 'r') as f:
+# Micro-batching: concurrent requests wait up to BATCH_WINDOW_MS for company.
+# Only where predictions share a process (ML_WORKER_PROCESSES=0); pool workers
+# run one task at a time and call disable_batching() on start
+BATCH_MAX_SIZE = int(os.getenv('DISEASE_BATCH_MAX_SIZE', '8'))
+BATCH_WINDOW_MS = float(os.getenv('DISEASE_BATCH_WINDOW_MS', '5'))
+
+# Multi-image diagnosis: images per forward pass and preprocessing threads
+BULK_BATCH_SIZE = int(os.getenv('DISEASE_BULK_BATCH_SIZE', '32'))
+BULK_PREPROCESS_WORKERS = int(os.getenv('DISEASE_BULK_PREPROCESS_WORKERS', '4'))
+
+# Contrast/sharpness enhancement before inference (1 = on, 0 = off)
+ENHANCE = os.getenv('DISEASE_ENHANCE', '1') == '1'
+
+# Result cache for repeated uploads; near-duplicate matching (perceptual hash,
+# max Hamming distance out of 64 bits) is off when DISEASE_CACHE_PHASH_DISTANCE=0
+CACHE_SIZE = int(os.getenv('DISEASE_CACHE_SIZE', '1024'))
+CACHE_TTL = float(os.getenv('DISEASE_CACHE_TTL', '3600'))
+CACHE_PHASH_DISTANCE = int(os.getenv('DISEASE_CACHE_PHASH_DISTANCE', '0'))
+
+_result_cache = ResultCache(max_entries=CACHE_SIZE, ttl=CACHE_TTL)
+_near_cache = PerceptualCache(max_entries=CACHE_SIZE, ttl=CACHE_TTL)
+
+# Inference backend: 'keras' (.h5) or 'tflite' (see `manage.py export_tflite`)
+BACKEND = os.getenv('DISEASE_MODEL_BACKEND', 'keras')
+
+# Model and classes are loaded on first use (or when an ML worker process starts),
+# so importing this module does not pull in TensorFlow. An active 'disease'
+# registry release (model file + classes.json) takes precedence over the files above.
+# 'release' is the (backend, class names) pair, replaced in one assignment so a
+# prediction never pairs one release's outputs with another's class names.
+_state = {'release': (None, []), 'error': None, 'load_seconds': None, 'model_path': None}
+
+def model_path_for(backend):
+    """Default model file for a backend name"""
+    if backend == 'tflite':
+        return Path(os.getenv('DISEASE_TFLITE_PATH', str(TFLITE_MODEL_PATH)))
+    return MODEL_PATH
+
+def _load_release(path):
+    """(backend, class names) from a registry release directory, or the default files if None"""
+    model_path = Path(path) / model_path_for(BACKEND).name if path else model_path_for(BACKEND)
+    with open(str(Path(path) / CLASSES_PATH.name if path else CLASSES_PATH), 'r') as f:
         class_names = json.load(f)
-    MODEL_LOADED = True
-    print(f"✅ Model loaded successfully from {MODEL_PATH}")
-except Exception as e:
-    MODEL_LOADED = False
-    model = None
-    class_names = []
-    print(f"❌ Model loading failed: {e}")
-
-def enhance_image_pil(image_path):
-    """Enhance image using PIL for better prediction"""
+    return create_backend(BACKEND, model_path), class_names
+
+def _use_release(loaded, info):
+    """Publish a newly loaded model; cached diagnoses came from the previous one"""
+    model, class_names = loaded
+    _result_cache.clear()
+    _near_cache.clear()
+    _state.update(
+        release=(model, class_names), error=None,
+        load_seconds=info['load_seconds'], model_path=model.model_path,
+    )
+    print(f"✅ Model loaded successfully from {model.model_path} ({BACKEND})")
+
+_release = HotModel('disease', _load_release, on_swap=_use_release)
+
+def load_model():
+    """
+    Load the disease model backend and class names once, thread-safely, and
+    pick up newly activated registry releases without blocking predictions.
+    
+    Returns:
+        tuple: (backend, class_names), backend is None if loading failed
+    """
+    try:
+        _release.get()
+    except Exception as e:
+        _state['error'] = str(e)
+    return _state['release']
+
+def is_ready():
+    """True once the model is loaded; never triggers a load"""
+    return _state['release'][0] is not None
+
+def model_status():
+    """Readiness details for the probe endpoint"""
+    return {
+        'ready': is_ready(),
+        'error': _state['error'],
+        'load_seconds': _state['load_seconds'],
+        'backend': BACKEND,
+        'model_path': _state['model_path'] or str(model_path_for(BACKEND)),
+        'release': _release.status(),
+    }
+
+def _run_model(batch):
+    """
+    Single batched forward pass, shape (n, IMG_SIZE, IMG_SIZE, 3).
+    Returns (probabilities, class names of the release that produced them).
+    """
+    model, class_names = load_model()
+    return model.predict(batch), class_names
+
+def _run_batched(batch):
+    """MicroBatcher predict_fn: one (probabilities row, class names) pair per item"""
+    probabilities, class_names = _run_model(batch)
+    return [(row, class_names) for row in probabilities]
+
+_batcher = None
+_batcher_lock = threading.Lock()
+_batching = True
+
+def disable_batching():
+    """
+    Predict each image directly instead of through the MicroBatcher. For processes
+    that handle one request at a time, where the batcher never gets a second item
+    and every prediction would just wait out the window.
+    """
+    global _batching
+    _batching = False
+
+def get_batcher():
+    """Shared MicroBatcher for disease inference"""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    _run_batched,
+                    max_batch_size=BATCH_MAX_SIZE,
+                    window_ms=BATCH_WINDOW_MS,
+                    name='disease-batcher'
+                )
+    return _batcher
+
+def batch_stats():
+    """Per-batch occupancy counters for tuning the batch window"""
+    if _batcher is None:
+        stats = {'max_batch_size': BATCH_MAX_SIZE, 'window_ms': BATCH_WINDOW_MS, 'batches': 0, 'items': 0}
+    else:
+        stats = _batcher.stats()
+    return dict(stats, enabled=_batching)
+
+def cache_stats():
+    """Hit/miss counters for the exact and near-duplicate result caches"""
+    stats = {'exact': _result_cache.stats()}
+    if CACHE_PHASH_DISTANCE > 0:
+        stats['near_duplicate'] = _near_cache.stats()
+    return stats
+
+def _cached_result(img_array):
+    """Return (cached result or None, digest, phash)"""
+    digest = tensor_digest(img_array)
+    result = _result_cache.get(digest)
+    if result is not None:
+        return result, digest, None
+    if CACHE_PHASH_DISTANCE > 0:
+        phash = dhash(img_array)
+        return _near_cache.get_near(phash, CACHE_PHASH_DISTANCE), digest, phash
+    return None, digest, None
+
+def _store_result(result, digest, phash):
+    _result_cache.set(digest, result)
+    if phash is not None:
+        _near_cache.set(phash, result)
+
+def preprocess_image(image_path):
+    """
+    Decode, (optionally) enhance, resize and normalize one image into a
+    (IMG_SIZE, IMG_SIZE, 3) float32 array. `image_path` may be a path or a
+    file-like object. Returns None if the image cannot be decoded.
+    """
+    img_array = np.empty((IMG_SIZE, IMG_SIZE, 3), dtype=np.float32)
     try:
-        img = Image.open(image_path)
-        # Enhance contrast
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.2)
-        # Enhance sharpness
-        enhancer = ImageEnhance.Sharpness(img)
-        img = enhancer.enhance(1.3)
-        return img
-    except:
+        decode_into(img_array, image_path, IMG_SIZE, enhance=ENHANCE)
+    except Exception:
         return None
+    return img_array
+
+def format_prediction(probabilities, class_names):
+    """Turn one row of class probabilities into the API response dict, using the classes of the release that produced it"""
+    predicted_class = np.argmax(probabilities)
+    confidence = float(probabilities[predicted_class])
+    
+    # Parse disease name
+    disease_full = class_names[predicted_class]
+    parts = disease_full.split('___')
+    plant = parts[0].replace('_', ' ')
+    disease = parts[1].replace('_', ' ') if len(parts) > 1 else 'Unknown'
+    
+    # Get recommendations
+    recommendations = get_recommendations(disease, plant)
+    
+    return {
+        'disease': disease,
+        'confidence': round(confidence * 100, 2),
+        'plant': plant,
+        'recommendations': recommendations,
+        'enhanced': ENHANCE,
+        'all_predictions': [
+            {
+                'disease': class_names[i].split('___')[1].replace('_', ' '),
+                'confidence': round(float(probabilities[i]) * 100, 2)
+            }
+            for i in np.argsort(probabilities)[-5:][::-1]
+        ]
+    }
 
 def predict_disease(image_path):
     """
-    Predict plant disease from image with OpenCV enhancement
+    Predict plant disease from image with contrast/sharpness enhancement.
+    Repeat images are served from the result cache; concurrent misses are
+    grouped into one forward pass by the micro-batcher (unless disabled).
     
     Args:
-        image_path: Path to image file
+        image_path: Path to image file or file-like object (e.g. an uploaded file)
         
     Returns:
         dict: {
@@ -58,51 +239,145 @@ def predict_disease(image_path):
             'quality_check': str
         }
     """
-    if not MODEL_LOADED:
+    model, _ = load_model()
+    if model is None:
         return {'error': 'Model not loaded'}
     
     try:
-        # Enhance image with PIL
-        img = enhance_image_pil(image_path)
-        if img is None:
+        img_array = preprocess_image(image_path)
+        if img_array is None:
             return {'error': 'Failed to process image'}
         
-        # Preprocess
-        img = img.resize((IMG_SIZE, IMG_SIZE))
-        img_array = np.array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-        
-        # Predict
-        predictions = model.predict(img_array)
-        predicted_class = np.argmax(predictions[0])
-        confidence = float(predictions[0][predicted_class])
-        
-        # Parse disease name
-        disease_full = class_names[predicted_class]
-        parts = disease_full.split('___')
-        plant = parts[0].replace('_', ' ')
-        disease = parts[1].replace('_', ' ') if len(parts) > 1 else 'Unknown'
-        
-        # Get recommendations
-        recommendations = get_recommendations(disease, plant)
+        # Repeat uploads are answered from the cache without touching the model
+        cached, digest, phash = _cached_result(img_array)
+        if cached is not None:
+            return dict(cached, cached=True)
         
-        return {
-            'disease': disease,
-            'confidence': round(confidence * 100, 2),
-            'plant': plant,
-            'recommendations': recommendations,
-            'enhanced': True,
-            'all_predictions': [
-                {
-                    'disease': class_names[i].split('___')[1].replace('_', ' '),
-                    'confidence': round(float(predictions[0][i]) * 100, 2)
-                }
-                for i in np.argsort(predictions[0])[-5:][::-1]
-            ]
-        }
+        if _batching:
+            probabilities, class_names = get_batcher().predict(img_array)
+        else:
+            probabilities, class_names = _run_model(img_array[np.newaxis])
+            probabilities = probabilities[0]
+        result = format_prediction(probabilities, class_names)
+        _store_result(result, digest, phash)
+        return result
     except Exception as e:
         return {'error': str(e)}
 
+def predict_disease_batch(sources, names=None):
+    """
+    Diagnose many images of one plot in a single call.
+    Images are handled BULK_BATCH_SIZE at a time: each chunk is decoded in
+    parallel threads into a reusable float32 buffer (so the buffer never grows
+    past one chunk) and its cache misses go through the model in one pass.
+    
+    Args:
+        sources: list of paths or file-like objects
+        names: optional list of display names (e.g. upload filenames)
+        
+    Returns:
+        dict: {'results': [per-image predict_disease dicts + 'filename'], 'summary': dict}
+    """
+    names = names or [f'image_{i + 1}' for i in range(len(sources))]
+    model, _ = load_model()
+    if model is None:
+        return {'error': 'Model not loaded'}
+    
+    results = [None] * len(sources)
+    for offset in range(0, len(sources), BULK_BATCH_SIZE):
+        _predict_chunk(sources[offset:offset + BULK_BATCH_SIZE], results, offset)
+    
+    # Copies, so filenames never leak into cached entries
+    results = [dict(result, filename=name) for name, result in zip(names, results)]
+    
+    return {'results': results, 'summary': summarize_plot(results)}
+
+def _predict_chunk(sources, results, offset):
+    """Diagnose up to BULK_BATCH_SIZE images into results[offset:]; repeats of earlier chunks hit the cache"""
+    # Decoded straight into this thread's reusable float32 buffer
+    arrays, ok = preprocess_batch(
+        sources, IMG_SIZE, enhance=ENHANCE, workers=BULK_PREPROCESS_WORKERS
+    )
+    
+    pending = []
+    duplicates = {}
+    for i, img_array in enumerate(arrays):
+        if not ok[i]:
+            results[offset + i] = {'error': 'Failed to process image'}
+            continue
+        cached, digest, phash = _cached_result(img_array)
+        if cached is not None:
+            results[offset + i] = dict(cached, cached=True)
+        elif digest in duplicates:
+            duplicates[digest].append(offset + i)
+        else:
+            duplicates[digest] = []
+            pending.append((i, digest, phash))
+    if not pending:
+        return
+    
+    # Compact the rows that still need inference to the front of the buffer
+    # (in order, so no row is overwritten before it is moved)
+    for k, (i, _, _) in enumerate(pending):
+        if k != i:
+            arrays[k] = arrays[i]
+    
+    try:
+        probabilities, class_names = _run_model(arrays[:len(pending)])
+    except Exception as e:
+        for i, digest, _ in pending:
+            for j in [offset + i] + duplicates[digest]:
+                results[j] = {'error': str(e)}
+        return
+    for (i, digest, phash), row in zip(pending, probabilities):
+        result = results[offset + i] = format_prediction(row, class_names)
+        _store_result(result, digest, phash)
+        for j in duplicates[digest]:
+            results[j] = dict(result, cached=True)
+
+def summarize_plot(results):
+    """Plot-level summary over per-image diagnoses"""
+    diagnosed = [r for r in results if 'error' not in r]
+    diseased = [r for r in diagnosed if 'healthy' not in r['disease'].lower()]
+    
+    counts = {}
+    for r in diseased:
+        key = (r['plant'], r['disease'])
+        counts[key] = counts.get(key, 0) + 1
+    breakdown = [
+        {'plant': plant, 'disease': disease, 'images': n}
+        for (plant, disease), n in sorted(counts.items(), key=lambda item: -item[1])
+    ]
+    
+    summary = {
+        'images': len(results),
+        'diagnosed': len(diagnosed),
+        'failed': len(results) - len(diagnosed),
+        'healthy': len(diagnosed) - len(diseased),
+        'diseased': len(diseased),
+        'infected_fraction': round(len(diseased) / len(diagnosed), 3) if diagnosed else 0.0,
+        'mean_confidence': round(sum(r['confidence'] for r in diagnosed) / len(diagnosed), 2) if diagnosed else 0.0,
+        'diseases': breakdown,
+    }
+    
+    if breakdown:
+        top = breakdown[0]
+        summary['dominant_disease'] = top['disease']
+        summary['recommendations'] = get_recommendations(top['disease'], top['plant'])
+    elif diagnosed:
+        summary['dominant_disease'] = 'healthy'
+        summary['recommendations'] = get_recommendations('healthy', diagnosed[0]['plant'])
+    else:
+        summary['dominant_disease'] = None
+        summary['recommendations'] = []
+    
+    return summary
+
+def list_sample_images(directory, limit=None):
+    """Image files under `directory` (recursively), sorted for reproducible runs"""
+    paths = sorted(p for p in Path(directory).rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+    return paths[:limit] if limit else paths
+
 def get_recommendations(disease, plant):
     """Get treatment recommendations for disease"""
     
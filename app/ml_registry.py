@@ -0,0 +1,344 @@
+"""
+Versioned model registry
+Every model name has immutable release directories and an ACTIVE pointer:
+
+    registry/<name>/<version>/...      artifact files + release.json (sha256 per file)
+    registry/<name>/ACTIVE             version being served
+
+Releases are staged in a temporary directory and renamed into place; ACTIVE is
+rewritten with os.replace. HotModel follows the pointer in running processes, so
+activating a release swaps models without a restart. No Django imports: the
+Flask app and train_yield_model.py use this module too.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+ML_REGISTRY_DIR = os.getenv('ML_REGISTRY_DIR', os.path.join(os.path.dirname(__file__), 'ml_models', 'registry'))
+# Seconds between checks of a model's ACTIVE pointer (0 checks on every use, -1 never)
+ML_MODEL_RELOAD_INTERVAL = float(os.getenv('ML_MODEL_RELOAD_INTERVAL', '5'))
+# First retry of a release that failed to load (seconds), doubled per failure up to the max
+ML_MODEL_RETRY_DELAY = float(os.getenv('ML_MODEL_RETRY_DELAY', '5'))
+ML_MODEL_RETRY_MAX = float(os.getenv('ML_MODEL_RETRY_MAX', '300'))
+
+RELEASE_NAME = 'release.json'
+ACTIVE_NAME = 'ACTIVE'
+
+
+class RegistryError(Exception):
+    """Unknown model or version, or a release whose files do not match their checksums"""
+
+
+def _model_dir(name, root=None):
+    return os.path.join(root or ML_REGISTRY_DIR, name)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _source_files(sources):
+    """(relative path, absolute path) for files and the contents of directories"""
+    for source in sources:
+        if os.path.isdir(source):
+            for dirpath, _, filenames in os.walk(source):
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    yield os.path.relpath(path, source).replace(os.sep, '/'), path
+        elif os.path.isfile(source):
+            yield os.path.basename(source), source
+        else:
+            raise RegistryError(f"No such file or directory: {source}")
+
+
+def release(name, version, root=None):
+    """release.json of one version"""
+    path = os.path.join(_model_dir(name, root), version, RELEASE_NAME)
+    if not os.path.exists(path):
+        raise RegistryError(f"Model '{name}' has no version '{version}'")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def versions(name, root=None):
+    """Releases of a model, oldest first"""
+    directory = _model_dir(name, root)
+    if not os.path.isdir(directory):
+        return []
+    releases = [
+        release(name, entry, root) for entry in os.listdir(directory)
+        if os.path.exists(os.path.join(directory, entry, RELEASE_NAME))
+    ]
+    return sorted(releases, key=lambda r: r['created_at'])
+
+
+def models(root=None):
+    root = root or ML_REGISTRY_DIR
+    if not os.path.isdir(root):
+        return []
+    return sorted(entry for entry in os.listdir(root) if os.path.isdir(os.path.join(root, entry)))
+
+
+def active_version(name, root=None):
+    """Version named by ACTIVE, or None if the model has never been activated"""
+    try:
+        with open(os.path.join(_model_dir(name, root), ACTIVE_NAME), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def active_path(name, root=None):
+    """Directory of the active release, or None"""
+    version = active_version(name, root)
+    return os.path.join(_model_dir(name, root), version) if version else None
+
+
+def publish(name, sources, version=None, metadata=None, activate=False, root=None):
+    """
+    Copy files (and directory contents) into a new release of `name`.
+    The version defaults to a digest of the files, so publishing the same
+    artifact twice returns the existing release instead of a duplicate.
+
+    Returns:
+        dict: the release.json contents
+    """
+    directory = _model_dir(name, root)
+    os.makedirs(directory, exist_ok=True)
+    staging = os.path.join(directory, f'.staging-{os.getpid()}-{threading.get_ident()}')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        files = {}
+        for relpath, path in _source_files(sources):
+            if relpath == RELEASE_NAME:
+                continue
+            target = os.path.join(staging, relpath)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(path, target)
+            files[relpath] = {'sha256': _sha256(target), 'bytes': os.path.getsize(target)}
+        if not files:
+            raise RegistryError(f"Nothing to publish for '{name}'")
+
+        content = hashlib.sha256(
+            ''.join(f"{relpath}:{spec['sha256']}\n" for relpath, spec in sorted(files.items())).encode()
+        ).hexdigest()
+        version = version or content[:16]
+        final = os.path.join(directory, version)
+        if os.path.exists(final):
+            existing = release(name, version, root)
+            if existing['content_sha256'] != content:
+                raise RegistryError(f"Model '{name}' already has a different version '{version}'")
+            shutil.rmtree(staging)
+            manifest = existing
+        else:
+            manifest = {
+                'name': name,
+                'version': version,
+                'created_at': datetime.now(timezone.utc).isoformat(timespec='microseconds'),
+                'content_sha256': content,
+                'files': files,
+                'metadata': metadata or {},
+            }
+            _write_atomic(os.path.join(staging, RELEASE_NAME), json.dumps(manifest, indent=2))
+            os.rename(staging, final)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if activate:
+        activate_version(name, version, root)
+    return manifest
+
+
+def verify(name, version=None, root=None):
+    """List of problems with a release's files (empty when every checksum matches)"""
+    version = version or active_version(name, root)
+    if version is None:
+        raise RegistryError(f"Model '{name}' has no active version")
+    manifest = release(name, version, root)
+    directory = os.path.join(_model_dir(name, root), version)
+    problems = []
+    for relpath, spec in manifest['files'].items():
+        path = os.path.join(directory, relpath)
+        if not os.path.exists(path):
+            problems.append(f"{relpath}: missing")
+        elif _sha256(path) != spec['sha256']:
+            problems.append(f"{relpath}: checksum mismatch")
+    return problems
+
+
+def activate_version(name, version, root=None):
+    """
+    Point ACTIVE at a verified release. Returns the previously active version.
+    Running HotModels load it in the background within ML_MODEL_RELOAD_INTERVAL.
+    """
+    problems = verify(name, version, root)
+    if problems:
+        raise RegistryError(f"Refusing to activate {name}/{version}: {'; '.join(problems)}")
+    previous = active_version(name, root)
+    _write_atomic(os.path.join(_model_dir(name, root), ACTIVE_NAME), version + '\n')
+    return previous
+
+
+def registry_status(root=None):
+    """Active and available versions of every registered model"""
+    return {
+        name: {
+            'active': active_version(name, root),
+            'versions': [
+                {'version': r['version'], 'created_at': r['created_at'],
+                 'bytes': sum(spec['bytes'] for spec in r['files'].values()), 'metadata': r['metadata']}
+                for r in versions(name, root)
+            ],
+        }
+        for name in models(root)
+    }
+
+
+class HotModel:
+    """
+    A loaded model that follows its registry pointer.
+
+    get() returns the current object. At most every `interval` seconds it reads
+    ACTIVE; a new version is loaded in a background thread while callers keep
+    getting the old object, then swapped in with one assignment, so predictions
+    already running finish on the model they started with. Only the very first
+    load blocks. A release that fails to load is retried after
+    ML_MODEL_RETRY_DELAY seconds, doubling per consecutive failure up to
+    ML_MODEL_RETRY_MAX, or as soon as the pointer moves.
+
+    Args:
+        name: registry model name
+        loader: callable(path) -> model; path is None if there is neither an
+            active release nor an existing `fallback` directory
+        fallback: directory used while the registry has no active release
+        on_swap: optional callable(model, info) run after each successful load
+    """
+
+    def __init__(self, name, loader, fallback=None, on_swap=None, interval=None, root=None):
+        self.name = name
+        self.loader = loader
+        self.fallback = fallback
+        self.on_swap = on_swap
+        self.interval = ML_MODEL_RELOAD_INTERVAL if interval is None else interval
+        self.root = root
+        self._current = None        # (model, info)
+        self._failed = None         # (target, message, failures, retry_at)
+        self._loading = None
+        self._next_check = 0.0
+        self._reloads = 0
+        self._lock = threading.Lock()
+
+    def _target(self):
+        """(version, path) that should be served now"""
+        version = active_version(self.name, self.root)
+        if version is not None:
+            return version, os.path.join(_model_dir(self.name, self.root), version)
+        if self.fallback and os.path.exists(self.fallback):
+            return None, self.fallback
+        return None, None
+
+    def _load(self, target):
+        version, path = target
+        started = time.perf_counter()
+        try:
+            model = self.loader(path)
+        except Exception as e:
+            failures = self._failed[2] + 1 if self._failed is not None and self._failed[0] == target else 1
+            delay = min(ML_MODEL_RETRY_DELAY * 2 ** (failures - 1), ML_MODEL_RETRY_MAX)
+            self._failed = (target, str(e) or e.__class__.__name__, failures, time.monotonic() + delay)
+            print(f"❌ Loading {self.name} {version or path or '(default)'} failed: {e}")
+            raise
+        info = {
+            'version': version,
+            'path': path,
+            'source': 'registry' if version else ('fallback' if path else None),
+            'loaded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'load_seconds': round(time.perf_counter() - started, 4),
+        }
+        if self.on_swap is not None:
+            self.on_swap(model, info)
+        swapped = self._current is not None
+        self._current = (model, info)
+        self._failed = None
+        if swapped:
+            self._reloads += 1
+            print(f"🔄 {self.name} switched to {version or path} ({info['load_seconds']}s)")
+        return model
+
+    def _load_in_background(self, target):
+        try:
+            self._load(target)
+        except Exception:
+            pass
+        finally:
+            self._loading = None
+
+    def _check(self):
+        with self._lock:
+            if self._current is not None and time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + max(self.interval, 0)
+            target = self._target()
+            if self._current is not None and self._current[1]['path'] == target[1]:
+                return
+            if self._loading is not None:
+                return
+            if self._failed is not None and self._failed[0] == target and time.monotonic() < self._failed[3]:
+                return
+            if self._current is None:
+                self._load(target)
+                return
+            self._loading = threading.Thread(
+                target=self._load_in_background, args=(target,), name=f'reload-{self.name}', daemon=True
+            )
+            self._loading.start()
+
+    def get(self):
+        current = self._current
+        if current is None or (self.interval >= 0 and time.monotonic() >= self._next_check):
+            self._check()
+            current = self._current
+        if current is None:
+            raise RegistryError(self._failed[1] if self._failed else f"Model '{self.name}' is not loaded")
+        return current[0]
+
+    def reload(self):
+        """Load whatever the pointer names now, in the calling thread"""
+        with self._lock:
+            self._next_check = time.monotonic() + max(self.interval, 0)
+            return self._load(self._target())
+
+    @property
+    def loaded(self):
+        return self._current is not None
+
+    def status(self):
+        info = dict(self._current[1]) if self._current is not None else {}
+        return {
+            'name': self.name,
+            'loaded': self._current is not None,
+            **info,
+            'reloads': self._reloads,
+            'reloading': self._loading is not None,
+            'error': self._failed[1] if self._failed else None,
+            'failures': self._failed[2] if self._failed else 0,
+        }
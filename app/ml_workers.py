@@ -0,0 +1,344 @@
+"""
+Local pool of ML worker processes
+Disease inference, yield prediction and OCR run here instead of inside the
+gunicorn request worker, so a slow prediction never blocks other pages.
+"""
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+# 0 runs tasks inline in the request thread (development / tests)
+ML_WORKER_PROCESSES = int(os.getenv('ML_WORKER_PROCESSES', '1'))
+# Seconds a request waits for its result before giving up
+ML_WORKER_TIMEOUT = float(os.getenv('ML_WORKER_TIMEOUT', '60'))
+# Tasks queued or running before new ones are rejected with PoolBusy
+ML_WORKER_MAX_PENDING = int(os.getenv('ML_WORKER_MAX_PENDING', '16'))
+# Load models when a worker process starts rather than on its first task
+ML_WORKER_WARM = os.getenv('ML_WORKER_WARM', '1') == '1'
+
+
+class PoolBusy(Exception):
+    """Raised when the pool already has ML_WORKER_MAX_PENDING tasks in flight"""
+
+
+# ---------------------------------------------------------------------------
+# Worker-process side
+# ---------------------------------------------------------------------------
+
+# Set in each worker process: where it reports its status to the web process
+_status_queue = None
+
+
+def _init_worker(warm, status_queue=None):
+    global _status_queue
+    _status_queue = status_queue
+    if os.getenv('DJANGO_SETTINGS_MODULE'):
+        import django
+        django.setup()
+    from . import ml_predict
+    # One task at a time per process: the micro-batch window would only add latency
+    ml_predict.disable_batching()
+    if warm:
+        from . import yield_predict
+        ml_predict.load_model()
+        try:
+            yield_predict.load_models()
+        except Exception as e:
+            print(f"❌ Yield model warm-up failed: {e}")
+        from .ocr_engines import check_engine, get_engine
+        try:
+            get_engine().warm()
+        except Exception as e:
+            print(f"❌ OCR engine warm-up failed: {e}")
+        # Same check as `check --deploy` (app.W001): soil scans fail without it, nothing else does
+        engine, problems = check_engine(refresh=True)
+        for problem in problems:
+            print(f"⚠️ Soil report OCR ({engine.get('engine')}) is unavailable: {problem}")
+    _status_task()
+
+
+def _as_source(payload):
+    """Uploads arrive as raw bytes or as the path of Django's spill file"""
+    return io.BytesIO(payload) if isinstance(payload, (bytes, bytearray)) else payload
+
+
+def _disease_task(payload):
+    from .ml_predict import predict_disease
+    return predict_disease(_as_source(payload))
+
+
+def _disease_batch_task(payloads, names):
+    from .ml_predict import predict_disease_batch
+    return predict_disease_batch([_as_source(p) for p in payloads], names)
+
+
+def _yield_task(*args):
+    from .yield_predict import predict_yield
+    return predict_yield(*args)
+
+
+def _yield_batch_task(rows):
+    from .yield_predict import predict_yield_batch
+    return predict_yield_batch(rows)
+
+
+def _yield_sweep_task(*args):
+    from .yield_predict import sweep_scenarios
+    return sweep_scenarios(*args)
+
+
+def _yield_rank_task(*args):
+    from .yield_predict import rank_crops
+    return rank_crops(*args)
+
+
+def _soil_task(payload):
+    from .soil_report_scanner import extract_soil_data_from_image
+    return extract_soil_data_from_image(_as_source(payload))
+
+
+def _soil_page_task(path, kind, ref):
+    from .soil_batch import load_page
+    from .soil_report_scanner import extract_soil_data_from_image
+    return extract_soil_data_from_image(load_page(path, kind, ref))
+
+
+def _status_task():
+    from . import ml_predict, yield_predict
+    from .ocr_engines import check_engine
+    ocr, ocr_problems = check_engine()
+    status = {
+        'pid': os.getpid(),
+        'disease_model': ml_predict.model_status(),
+        'yield_model': yield_predict.model_status(),
+        'batching': ml_predict.batch_stats(),
+        'cache': ml_predict.cache_stats(),
+        'ocr': {**ocr, 'problems': ocr_problems},
+    }
+    # Also sent straight to the web process, so readiness never waits behind queued work
+    if _status_queue is not None:
+        try:
+            _status_queue.put_nowait(status)
+        except Exception:
+            pass
+    return status
+
+
+TASKS = {
+    'status': _status_task,
+    'disease': _disease_task,
+    'disease_batch': _disease_batch_task,
+    'yield': _yield_task,
+    'yield_batch': _yield_batch_task,
+    'yield_sweep': _yield_sweep_task,
+    'yield_rank': _yield_rank_task,
+    'soil': _soil_task,
+    'soil_page': _soil_page_task,
+}
+
+
+def _execute(task, args):
+    started = time.perf_counter()
+    result = TASKS[task](*args)
+    return result, time.perf_counter() - started
+
+
+# ---------------------------------------------------------------------------
+# Web-process side
+# ---------------------------------------------------------------------------
+
+def upload_payload(upload):
+    """Picklable form of an uploaded file: spill-file path if Django wrote one, else bytes"""
+    if hasattr(upload, 'temporary_file_path'):
+        return upload.temporary_file_path()
+    upload.seek(0)
+    return upload.read()
+
+
+class MLWorkerPool:
+    """
+    Bounded dispatcher over a ProcessPoolExecutor.
+    Each worker process loads its own models; the web process never imports TensorFlow.
+    """
+
+    def __init__(self, processes=ML_WORKER_PROCESSES, max_pending=ML_WORKER_MAX_PENDING,
+                 timeout=ML_WORKER_TIMEOUT, warm=ML_WORKER_WARM):
+        self.processes = processes
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout
+        self.warm = warm
+        self._executor = None
+        self._lock = threading.Lock()
+        self._status_queue = None
+        self._worker_status = {}
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._started_at = time.monotonic()
+        self._counters = {
+            'in_flight': 0, 'submitted': 0, 'completed': 0, 'failed': 0, 'cancelled': 0,
+            'timeouts': 0, 'rejected': 0, 'restarts': 0, 'busy_seconds': 0.0,
+        }
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: never fork a web process that may hold TF/thread state
+                context = multiprocessing.get_context('spawn')
+                if self._status_queue is None:
+                    self._status_queue = context.Queue()
+                    threading.Thread(target=self._collect_status, name='ml-worker-status', daemon=True).start()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.warm, self._status_queue),
+                )
+            return self._executor
+
+    def _collect_status(self):
+        """Keep the latest status each worker process reported (after warm-up and on every status task)"""
+        while True:
+            status = self._status_queue.get()
+            with self._lock:
+                self._worker_status[status['pid']] = dict(status, reported_at=time.time())
+
+    def _reset_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            if executor is not None:
+                self._counters['restarts'] += 1
+                self._worker_status.clear()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                self._counters[key] += delta
+
+    def _finished(self, future):
+        """Done callback: a task's slot is only freed once it has finished or been cancelled"""
+        if future.cancelled():
+            self._count(cancelled=1)
+        elif future.exception() is not None:
+            self._count(failed=1)
+        else:
+            self._count(completed=1, busy_seconds=future.result()[1])
+        self._count(in_flight=-1)
+        self._slots.release()
+
+    def start(self):
+        """Spawn (and warm) the worker processes without waiting for them"""
+        if self.processes > 0:
+            executor = self._get_executor()
+            for _ in range(self.processes):
+                executor.submit(_execute, 'status', ())
+
+    def submit(self, task, *args):
+        """
+        Queue TASKS[task](*args) for a worker process and return its Future,
+        whose result is (task result, seconds spent in the worker); use result()
+        to wait for it. The task holds one of the max_pending slots until it
+        finishes or is cancelled, so cancel futures that are no longer wanted.
+        Without worker processes the task runs here before submit() returns.
+
+        Raises:
+            PoolBusy: too many tasks already pending
+        """
+        if task not in TASKS:
+            raise ValueError(f"Unknown ML task '{task}'")
+        if self.processes <= 0:
+            future = Future()
+            self._count(submitted=1)
+            try:
+                result = _execute(task, args)
+            except Exception as e:
+                self._count(failed=1)
+                future.set_exception(e)
+            else:
+                self._count(completed=1, busy_seconds=result[1])
+                future.set_result(result)
+            return future
+
+        if not self._slots.acquire(blocking=False):
+            self._count(rejected=1)
+            raise PoolBusy('ML workers are busy, please retry shortly')
+
+        self._count(in_flight=1, submitted=1)
+        try:
+            future = self._get_executor().submit(_execute, task, args)
+        except BaseException as e:
+            self._count(in_flight=-1, failed=1)
+            self._slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._reset_executor()
+            raise
+        future.add_done_callback(self._finished)
+        return future
+
+    def result(self, future, timeout=None):
+        """
+        Wait up to `timeout` seconds (default: the pool timeout) for a future from
+        submit() and return the task's result. On timeout a task that has not
+        started yet is cancelled, so abandoned work does not keep a worker busy.
+
+        Raises:
+            TimeoutError: result not ready in time
+        """
+        try:
+            result, _ = future.result(timeout=self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            # A task already running cannot be stopped; it keeps its slot until it ends
+            future.cancel()
+            self._count(timeouts=1)
+            raise
+        except BrokenProcessPool:
+            self._reset_executor()
+            raise
+        return result
+
+    def run(self, task, *args, timeout=None):
+        """
+        Run TASKS[task](*args) in a worker process and return its result.
+
+        Raises:
+            PoolBusy: too many tasks already pending
+            TimeoutError: result not ready within `timeout` seconds
+        """
+        return self.result(self.submit(task, *args), timeout=timeout or self.timeout)
+
+    def worker_status(self):
+        """
+        Last status reported by each worker process, without queueing a task.
+        Inline (no worker processes) the status is computed here.
+        """
+        if self.processes <= 0:
+            return [_status_task()]
+        with self._lock:
+            return list(self._worker_status.values())
+
+    def stats(self):
+        """Queue depth and utilization since the pool was created"""
+        with self._lock:
+            counters = dict(self._counters)
+            started = self._executor is not None
+        uptime = time.monotonic() - self._started_at
+        capacity = max(self.processes, 1) * uptime
+        in_flight = counters.pop('in_flight')
+        return {
+            'processes': self.processes,
+            'started': started,
+            'max_pending': self.max_pending,
+            'timeout_seconds': self.timeout,
+            'in_flight': in_flight,
+            'queue_depth': max(0, in_flight - self.processes),
+            **counters,
+            'busy_seconds': round(counters['busy_seconds'], 3),
+            'utilization': round(counters['busy_seconds'] / capacity, 4) if capacity else 0.0,
+        }
+
+
+ml_pool = MLWorkerPool()
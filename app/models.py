@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+import uuid
 
 # Create your models here.
 
@@ -189,3 +190,95 @@ class Newsletter(models.Model):
     
     def __str__(self):
         return self.email
+
+
+class PredictionJob(models.Model):
+    """Asynchronous disease / soil-scan / yield prediction, polled by the client"""
+    KIND_CHOICES = [
+        ('disease', 'Disease detection'),
+        ('soil', 'Soil report scan'),
+        ('yield', 'Yield prediction'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    # Task input, kept until the job finishes so any process can run it after a restart
+    upload = models.BinaryField(null=True, blank=True)
+    args = models.JSONField(default=list, blank=True)
+    # Dotted path of a function(job, result) run once the task succeeds
+    result_hook = models.CharField(max_length=200, blank=True, default='')
+    attempts = models.PositiveIntegerField(default=0)
+    # Queued jobs are not claimed before this (retry backoff)
+    run_after = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    @property
+    def queue_wait_seconds(self):
+        if self.started_at:
+            return round((self.started_at - self.created_at).total_seconds(), 3)
+        return None
+
+    @property
+    def duration_seconds(self):
+        if self.started_at and self.finished_at:
+            return round((self.finished_at - self.started_at).total_seconds(), 3)
+        return None
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
+
+
+class SoilReport(models.Model):
+    """
+    Values read from a user's soil report, keyed by the image's SHA-256 so
+    re-uploading the same photo reuses the stored scan instead of re-running OCR
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='soil_reports')
+    image_sha256 = models.CharField(max_length=64)
+    ph = models.FloatField(null=True, blank=True)
+    nitrogen = models.FloatField(null=True, blank=True)
+    phosphorus = models.FloatField(null=True, blank=True)
+    potassium = models.FloatField(null=True, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    # soil_reports.CACHE_VERSION of the scanner that read the values; older rows are rescanned
+    parser_version = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'image_sha256'], name='unique_soil_report_image_per_user'),
+        ]
+        indexes = [
+            # Latest report of a user: one index range scan
+            models.Index(fields=['user', '-updated_at']),
+            models.Index(fields=['image_sha256']),
+        ]
+
+    def values(self):
+        return {'ph': self.ph, 'nitrogen': self.nitrogen, 'phosphorus': self.phosphorus, 'potassium': self.potassium}
+
+    def __str__(self):
+        return f"Soil report of {self.user} ({self.updated_at:%Y-%m-%d})"
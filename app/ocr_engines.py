@@ -0,0 +1,330 @@
+"""
+OCR engines for the soil report scanner
+The engine is picked by SOIL_OCR_ENGINE:
+
+    auto        tesserocr if installed, else the tesseract command line
+    tesserocr   pool of in-process Tesseract instances (traineddata loaded once
+                per instance, no process spawn per page)
+    cli         one tesseract process per page-segmentation pass
+    fake        FakeOCREngine returning SOIL_OCR_FAKE_TEXT (tests, demos)
+
+The tesseract binary comes from settings/env TESSERACT_CMD, else PATH, else the
+usual install locations; traineddata from TESSDATA_PREFIX as Tesseract itself
+reads it. check_engine() backs the `check --deploy` system check, the ML worker
+warm-up log and the ml_ready probe.
+"""
+import io
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+SOIL_OCR_ENGINE = os.getenv('SOIL_OCR_ENGINE', 'auto')
+SOIL_OCR_LANG = os.getenv('SOIL_OCR_LANG', 'eng')
+# In-process Tesseract instances per worker process (tesserocr engine)
+SOIL_OCR_ENGINE_POOL = int(os.getenv('SOIL_OCR_ENGINE_POOL', '2'))
+
+# Tried after TESSERACT_CMD and PATH
+TESSERACT_LOCATIONS = (
+    '/usr/bin/tesseract',
+    '/usr/local/bin/tesseract',
+    '/opt/homebrew/bin/tesseract',
+    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
+)
+
+
+class OCRError(Exception):
+    """The OCR engine is missing, misconfigured or failed on a page"""
+
+
+def _setting(name, default=''):
+    """Django setting when settings are configured, else the environment"""
+    try:
+        from django.conf import settings
+        if settings.configured:
+            return getattr(settings, name, None) or os.getenv(name, default)
+    except ImportError:
+        pass
+    return os.getenv(name, default)
+
+
+def resolve_tesseract_cmd():
+    """Path of the tesseract executable, or None if it cannot be found"""
+    configured = _setting('TESSERACT_CMD')
+    if configured:
+        return shutil.which(configured) or (configured if os.path.isfile(configured) else None)
+    found = shutil.which('tesseract')
+    if found:
+        return found
+    return next((path for path in TESSERACT_LOCATIONS if os.path.isfile(path)), None)
+
+
+class OCRPass(threading.Thread):
+    """
+    One page-segmentation pass running in the background; posts
+    (psm, text, error, seconds) to `results`. cancel() stops it where the engine can.
+    """
+
+    def __init__(self, engine, image_png, psm, timeout, results):
+        super().__init__(name=f'ocr-psm{psm}', daemon=True)
+        self.engine = engine
+        self.image_png = image_png
+        self.psm = psm
+        self.timeout = timeout
+        self.results = results
+        self.cancelled = False
+
+    def run(self):
+        started = time.perf_counter()
+        try:
+            text = self.engine.recognize(self.image_png, self.psm, self.timeout, self)
+        except Exception as e:
+            self.results.put((self.psm, None, str(e) or e.__class__.__name__, time.perf_counter() - started))
+        else:
+            self.results.put((self.psm, text, None, time.perf_counter() - started))
+
+    def cancel(self):
+        self.cancelled = True
+        self.engine.cancel(self)
+
+
+class TesseractCLIEngine:
+    """Runs `tesseract stdin stdout --psm N` per pass; cancelled passes are killed"""
+    name = 'cli'
+    cancellable = True
+
+    def __init__(self, cmd=None, lang=SOIL_OCR_LANG):
+        self.cmd = cmd or resolve_tesseract_cmd()
+        self.lang = lang
+        self._processes = {}
+        self._lock = threading.Lock()
+
+    def recognize(self, image_png, psm, timeout, job=None):
+        if self.cmd is None:
+            raise OCRError('Tesseract not found: install tesseract-ocr or set TESSERACT_CMD')
+        try:
+            process = subprocess.Popen(
+                [self.cmd, 'stdin', 'stdout', '-l', self.lang, '--psm', str(psm)],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+        except OSError as e:
+            raise OCRError(f'Tesseract could not be started: {e}')
+        with self._lock:
+            self._processes[job] = process
+        try:
+            if job is not None and job.cancelled:
+                process.kill()
+            stdout, stderr = process.communicate(image_png, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            # Do not wait for children that may still hold the pipes
+            process.stdout.close()
+            process.stderr.close()
+            raise OCRError(f'psm {psm} timed out after {timeout:g}s')
+        except (OSError, ValueError) as e:
+            # Killed after another pass already found everything
+            raise OCRError(str(e))
+        finally:
+            with self._lock:
+                self._processes.pop(job, None)
+        if process.returncode != 0:
+            raise OCRError(stderr.decode('utf-8', 'replace').strip() or f'exit code {process.returncode}')
+        return stdout.decode('utf-8', 'replace')
+
+    def cancel(self, job):
+        with self._lock:
+            process = self._processes.get(job)
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    def warm(self):
+        pass
+
+    def check(self):
+        if self.cmd is None:
+            return ['Tesseract not found on PATH or in the usual locations; install tesseract-ocr or set TESSERACT_CMD']
+        try:
+            listed = subprocess.run([self.cmd, '--list-langs'], capture_output=True, timeout=15)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            return [f'{self.cmd} could not be run: {e}']
+        languages = listed.stdout.decode('utf-8', 'replace').split()
+        if self.lang not in languages:
+            return [f"Tesseract has no '{self.lang}' traineddata (set TESSDATA_PREFIX or install tesseract-ocr-{self.lang})"]
+        return []
+
+    def describe(self):
+        return {'engine': self.name, 'cmd': self.cmd, 'lang': self.lang}
+
+
+class TesserocrEngine:
+    """
+    Bounded pool of tesserocr.PyTessBaseAPI instances. Each loads the traineddata
+    once and is reused for every page, so no process is spawned per pass.
+    tesserocr has no way to interrupt Recognize() (only its own deadline), so
+    the engine is not cancellable: passes run one after another instead of
+    racing, and a pass that would lose never takes an instance.
+    """
+    name = 'tesserocr'
+    cancellable = False
+
+    def __init__(self, size=SOIL_OCR_ENGINE_POOL, lang=SOIL_OCR_LANG):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.size = max(1, size)
+        self.lang = lang
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._tesserocr.PyTessBaseAPI(lang=self.lang)
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise OCRError(f'All {self.size} OCR engines are busy')
+
+    def recognize(self, image_png, psm, timeout, job=None):
+        from PIL import Image
+
+        api = self._acquire(timeout)
+        try:
+            api.SetPageSegMode(psm)
+            api.SetImage(Image.open(io.BytesIO(image_png)))
+            if not api.Recognize(int(timeout * 1000)):
+                raise OCRError(f'psm {psm} timed out after {timeout:g}s')
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+            self._idle.put(api)
+
+    def cancel(self, job):
+        pass
+
+    def warm(self):
+        """Create every instance now, loading the traineddata before the first scan"""
+        apis = [self._acquire(60) for _ in range(self.size)]
+        for api in apis:
+            self._idle.put(api)
+
+    def check(self):
+        path, languages = self._tesserocr.get_languages()
+        if self.lang not in languages:
+            return [f"tesserocr finds no '{self.lang}' traineddata in {path} (set TESSDATA_PREFIX)"]
+        return []
+
+    def describe(self):
+        return {
+            'engine': self.name, 'lang': self.lang, 'pool_size': self.size,
+            'instances': self._created, 'idle': self._idle.qsize(),
+            'tesseract_version': self._tesserocr.tesseract_version().split()[1],
+        }
+
+
+class FakeOCREngine:
+    """
+    Returns fixed text instead of running Tesseract: `text` for every pass, or
+    `texts` per page-segmentation mode, after `delay` seconds. Records the calls.
+    `cancellable` selects how ocr_passes schedules it (concurrent or one by one).
+    """
+    name = 'fake'
+
+    def __init__(self, text='', texts=None, delay=0.0, cancellable=True):
+        self.text = text
+        self.texts = texts or {}
+        self.delay = delay
+        self.cancellable = cancellable
+        self.calls = []
+
+    def recognize(self, image_png, psm, timeout, job=None):
+        self.calls.append((psm, len(image_png)))
+        if self.delay:
+            time.sleep(min(self.delay, timeout))
+        return self.texts.get(psm, self.text)
+
+    def cancel(self, job):
+        pass
+
+    def warm(self):
+        pass
+
+    def check(self):
+        return []
+
+    def describe(self):
+        return {'engine': self.name, 'calls': len(self.calls)}
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def create_engine(name=None):
+    name = name or _setting('SOIL_OCR_ENGINE', SOIL_OCR_ENGINE)
+    if name == 'fake':
+        return FakeOCREngine(_setting('SOIL_OCR_FAKE_TEXT').replace('\\n', '\n'))
+    if name == 'cli':
+        return TesseractCLIEngine()
+    if name == 'tesserocr':
+        return TesserocrEngine()
+    if name == 'auto':
+        try:
+            return TesserocrEngine()
+        except ImportError:
+            return TesseractCLIEngine()
+    raise OCRError(f"Unknown SOIL_OCR_ENGINE '{name}' (auto, tesserocr, cli or fake)")
+
+
+def get_engine():
+    """The process-wide engine, created on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine()
+    return _engine
+
+
+def set_engine(engine):
+    """Replace the process-wide engine (e.g. with a FakeOCREngine in tests); returns the old one"""
+    global _engine, _checked
+    with _engine_lock:
+        previous, _engine = _engine, engine
+        _checked = None
+    return previous
+
+
+_checked = None
+
+
+def check_engine(refresh=False):
+    """
+    (engine description, [problems]) for the configured engine. The check runs
+    tesseract, so its outcome is kept until refresh=True or the engine changes.
+    """
+    global _checked
+    try:
+        engine = get_engine()
+    except Exception as e:
+        return {'engine': _setting('SOIL_OCR_ENGINE', SOIL_OCR_ENGINE)}, [str(e)]
+    if refresh or _checked is None or _checked[0] is not engine:
+        try:
+            problems = engine.check()
+        except Exception as e:
+            problems = [str(e) or e.__class__.__name__]
+        _checked = (engine, problems)
+    return engine.describe(), list(_checked[1])
@@ -0,0 +1,148 @@
+"""
+Bulk soil report ingestion
+A lab's PDF (one report per page) or a zip of report photos is split into pages
+that are rasterized and OCR'd inside the ML worker processes, at most
+SOIL_BATCH_CONCURRENCY pages at a time. Results are yielded as pages finish, so
+the view can stream them and memory stays bounded by the window, not the batch.
+"""
+import io
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, TimeoutError, wait
+
+# Pages OCR'd at the same time (0: one per ML worker process)
+SOIL_BATCH_CONCURRENCY = int(os.getenv('SOIL_BATCH_CONCURRENCY', '0'))
+SOIL_BATCH_MAX_PAGES = int(os.getenv('SOIL_BATCH_MAX_PAGES', '300'))
+# PDF pages are rendered at this resolution, capped at SOIL_BATCH_MAX_SIDE pixels
+SOIL_BATCH_RENDER_DPI = int(os.getenv('SOIL_BATCH_RENDER_DPI', '300'))
+SOIL_BATCH_MAX_SIDE = 5000
+# Zip entries larger than this (uncompressed) are reported as errors, not read
+SOIL_BATCH_MAX_IMAGE_BYTES = 25 * 1024 * 1024
+# Seconds between attempts to get a worker slot while the pool is full
+SOIL_BATCH_BUSY_RETRY = 0.2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
+
+# pdfium is not thread-safe; inline mode (ML_WORKER_PROCESSES=0) renders from threads
+_pdfium_lock = threading.Lock()
+
+
+class BatchError(ValueError):
+    """Unreadable or unsupported batch upload"""
+
+
+def batch_kind(path):
+    """'pdf' or 'zip' from the file's signature"""
+    with open(path, 'rb') as f:
+        head = f.read(5)
+    if head == b'%PDF-':
+        return 'pdf'
+    if zipfile.is_zipfile(path):
+        return 'zip'
+    raise BatchError('Upload a PDF or a zip of report images')
+
+
+def list_pages(path, kind):
+    """Page references: 0-based page numbers of a PDF, image entry names of a zip"""
+    if kind == 'pdf':
+        import pypdfium2 as pdfium
+        try:
+            with _pdfium_lock:
+                document = pdfium.PdfDocument(path)
+                try:
+                    return list(range(len(document)))
+                finally:
+                    document.close()
+        except pdfium.PdfiumError as e:
+            raise BatchError(f'Unreadable PDF: {e}')
+    with zipfile.ZipFile(path) as archive:
+        return sorted(
+            info.filename for info in archive.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+            and not info.filename.startswith('__MACOSX/')
+            and not os.path.basename(info.filename).startswith('.')
+        )
+
+
+def load_page(path, kind, ref):
+    """One page as a grayscale PIL image (PDF) or an image file object (zip)"""
+    if kind == 'pdf':
+        import pypdfium2 as pdfium
+        with _pdfium_lock:
+            document = pdfium.PdfDocument(path)
+            try:
+                page = document[ref]
+                scale = min(SOIL_BATCH_RENDER_DPI / 72, SOIL_BATCH_MAX_SIDE / max(page.get_size()))
+                return page.render(scale=scale, grayscale=True).to_pil()
+            finally:
+                document.close()
+    with zipfile.ZipFile(path) as archive:
+        if archive.getinfo(ref).file_size > SOIL_BATCH_MAX_IMAGE_BYTES:
+            raise BatchError(f'{ref} is larger than {SOIL_BATCH_MAX_IMAGE_BYTES // (1024 * 1024)} MB')
+        return io.BytesIO(archive.read(ref))
+
+
+def _entry(kind, number, ref, outcome):
+    return {'page': number, 'source': ref + 1 if kind == 'pdf' else ref, **outcome}
+
+
+def scan_batch(path, kind, refs, pool, concurrency=None):
+    """
+    Yield one result dict per page, in completion order. At most `concurrency`
+    pages are in the worker pool at once; while other requests fill it, pages
+    wait for a free slot. A page that fails, or is not done within pool.timeout,
+    yields an error entry and the batch goes on. When the consumer stops (the
+    client went away) pages that have not started are cancelled.
+    """
+    from .ml_workers import PoolBusy
+
+    if concurrency is None:
+        concurrency = SOIL_BATCH_CONCURRENCY or max(1, pool.processes)
+    refs = list(enumerate(refs, start=1))
+    pending = {}
+    busy_since = None
+    try:
+        while refs or pending:
+            while refs and len(pending) < concurrency:
+                number, ref = refs[0]
+                try:
+                    future = pool.submit('soil_page', path, kind, ref)
+                except PoolBusy as e:
+                    busy_since = busy_since or time.monotonic()
+                    if time.monotonic() - busy_since < pool.timeout:
+                        break
+                    refs.pop(0)
+                    busy_since = None
+                    yield _entry(kind, number, ref, {'success': False, 'message': str(e)})
+                    continue
+                refs.pop(0)
+                busy_since = None
+                pending[future] = (number, ref, time.monotonic() + pool.timeout)
+            if not pending:
+                time.sleep(SOIL_BATCH_BUSY_RETRY)
+                continue
+
+            wait_for = min(deadline for _, _, deadline in pending.values()) - time.monotonic()
+            if busy_since is not None:
+                wait_for = min(wait_for, SOIL_BATCH_BUSY_RETRY)
+            done, _ = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in list(pending):
+                number, ref, deadline = pending[future]
+                if future not in done and now < deadline:
+                    continue
+                del pending[future]
+                try:
+                    # Returns at once for a finished page; cancels one still queued at its deadline
+                    outcome = pool.result(future, timeout=0)
+                except TimeoutError:
+                    outcome = {'success': False, 'message': 'Scan timed out'}
+                except Exception as e:
+                    outcome = {'success': False, 'message': str(e)}
+                yield _entry(kind, number, ref, outcome)
+    finally:
+        for future in pending:
+            future.cancel()
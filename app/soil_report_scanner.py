@@ -1,103 +1,189 @@
 """
 Soil Report Scanner using Tesseract OCR with improved accuracy
+Pages are normalized first (see ocr_preprocess: rescaled to the text height
+Tesseract reads best, adaptively binarized, cropped to the table). Both
+page-segmentation passes run concurrently on the configured OCR engine (see
+ocr_engines) with one PNG encoding of the page; once a finished pass has yielded
+all four values the other is stopped. Text is parsed in one scan with a single
+precompiled pattern.
 """
-import pytesseract
-from PIL import Image, ImageEnhance, ImageFilter
+import io
+import os
+import queue
 import re
+import time
+
+from PIL import Image, ImageEnhance, ImageFilter
+
+from .ocr_engines import OCRPass, get_engine
+from .ocr_preprocess import prepare_page
+
+# Large JPEGs are decoded at reduced scale, but never below this on either side
+OCR_DRAFT_SIZE = 2000
+
+# Page-segmentation modes, in order of preference when both find a value (run in
+# parallel where the OCR engine can cancel a pass, else one after another)
+OCR_PSM_MODES = tuple(int(m) for m in os.getenv('SOIL_OCR_PSM_MODES', '6,4').split(',') if m.strip())
+# Seconds before a single OCR pass is stopped
+OCR_PASS_TIMEOUT = float(os.getenv('SOIL_OCR_PASS_TIMEOUT', '20'))
+# Page preparation: 'adaptive' (ocr_preprocess) or 'basic' (fixed contrast/sharpness boost)
+OCR_PREPROCESS = os.getenv('SOIL_OCR_PREPROCESS', 'adaptive')
+
+SOIL_FIELDS = ('ph', 'nitrogen', 'phosphorus', 'potassium')
+
+# Labels per value, most specific first; each is followed by separators, optionally a
+# unit in parentheses such as '(kg/ha)' or '(1:2.5)', and a number.
+# A bare letter only counts at the start of a line or after whitespace or '('.
+_SEPARATOR = r'[:\s\-_=]*(?:\([^()\n]{1,12}\)[:\s\-_=]*)?'
+_LABELS = {
+    'ph': [r'pH', r'pH\s*value', r'Soil[\s_]pH'],
+    'nitrogen': [r'Nitrogen', r'(?<![^\s(])N', r'Available[\s_]N', r'N[\s_]content'],
+    'phosphorus': [r'Phosphorus', r'(?<![^\s(])P', r'Available[\s_]P', r'P2O5', r'P[\s_]content'],
+    'potassium': [r'Potassium', r'(?<![^\s(])K', r'Available[\s_]K', r'K2O', r'K[\s_]content'],
+}
+# One pass over the text finds every label: the alternation sits in a lookahead so matches
+# may overlap (e.g. 'Available N: 40' also yields 'N: 40'), positions that cannot start a
+# label are skipped by the leading character class, and the named group that matched
+# (<field>_<label index>) tells which value and label it was. Labels of different values
+# never match at the same position, so none hides another.
+SOIL_PATTERN = re.compile(
+    r'(?=[pskna])(?='
+    + '|'.join(
+        f'{label}{_SEPARATOR}(?P<{field}_{i}>[0-9]+\\.?[0-9]*)'
+        for field, labels in _LABELS.items()
+        for i, label in enumerate(labels)
+    )
+    + ')',
+    re.IGNORECASE | re.MULTILINE,
+)
+VALUE_RANGES = {'ph': (0, 14)}
 
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
-def extract_soil_data_from_image(image_path):
-    """Extract pH, N, P, K values from soil report image"""
+def parse_soil_values(text):
+    """
+    pH, N, P, K found in OCR text (None where missing). A value found by a more
+    specific label wins over one found by a later label, then earlier text wins.
+    """
+    best = {}
+    for match in SOIL_PATTERN.finditer(text):
+        field, rank = match.lastgroup.rsplit('_', 1)
+        rank = int(rank)
+        if field in best and rank >= best[field][0]:
+            continue
+        value = float(match.group(match.lastgroup))
+        low, high = VALUE_RANGES.get(field, (value, value))
+        if low <= value <= high:
+            best[field] = (rank, value)
+    return {field: best[field][1] if field in best else None for field in SOIL_FIELDS}
+
+
+def _all_found(values):
+    return all(values[field] is not None for field in SOIL_FIELDS)
+
+
+def ocr_passes(image_png, modes=OCR_PSM_MODES, timeout=OCR_PASS_TIMEOUT, engine=None):
+    """
+    Run the page-segmentation modes on PNG bytes (default engine: get_engine()),
+    stopping once every value is found. Engines that can cancel a pass run all
+    modes concurrently and cancel the losers; the others run them in order, so
+    an unneeded pass never starts instead of holding the engine until it ends.
+
+    Returns:
+        tuple: (values parsed from the finished passes, {psm: text}, [errors],
+        {psm: seconds} for the passes that finished)
+    """
+    engine = engine or get_engine()
+    results = queue.Queue()
+    concurrent = getattr(engine, 'cancellable', True)
+    passes = [OCRPass(engine, image_png, psm, timeout, results) for psm in modes]
+    if concurrent:
+        for ocr_pass in passes:
+            ocr_pass.start()
+
+    texts, errors, seconds = {}, [], {}
+    values = dict.fromkeys(SOIL_FIELDS)
     try:
-        img = Image.open(image_path)
-        
-        # Enhance image for better OCR
-        img = img.convert('L')  # Convert to grayscale
-        img = ImageEnhance.Contrast(img).enhance(2)  # Increase contrast
-        img = ImageEnhance.Sharpness(img).enhance(2)  # Sharpen
-        
-        # Extract text with multiple configs for better accuracy
-        text = pytesseract.image_to_string(img, config='--psm 6')
-        text += ' ' + pytesseract.image_to_string(img, config='--psm 4')
-        
-        ph = None
-        nitrogen = None
-        phosphorus = None
-        potassium = None
-        
-        # Find ALL numbers in text
-        all_numbers = re.findall(r'([0-9]+\.?[0-9]*)', text)
-        
-        # pH patterns - very flexible
-        ph_patterns = [
-            r'pH[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'pH\s*value[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'Soil[\s_]pH[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'(?:^|\s)pH[:\s\-_=]*([0-9]+\.?[0-9]*)'
-        ]
-        for pattern in ph_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-            for match in matches:
-                val = float(match)
-                if 0 <= val <= 14:
-                    ph = val
-                    break
-            if ph:
-                break
-        
-        # Nitrogen patterns - find N, Nitrogen, N2
-        n_patterns = [
-            r'Nitrogen[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'(?:^|\s|\()N[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'Available[\s_]N[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'N[\s_]content[:\s\-_=]*([0-9]+\.?[0-9]*)'
-        ]
-        for pattern in n_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-            if matches:
-                nitrogen = float(matches[0])
+        for ocr_pass in passes:
+            if not concurrent:
+                ocr_pass.run()
+            psm, text, error, seconds[psm] = results.get()
+            if error:
+                errors.append(error)
+                continue
+            texts[psm] = text
+            # Same precedence as one combined text: earlier modes first
+            values = parse_soil_values(' '.join(texts[m] for m in modes if m in texts))
+            if _all_found(values):
                 break
-        
-        # Phosphorus patterns - find P, Phosphorus, P2O5
-        p_patterns = [
-            r'Phosphorus[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'(?:^|\s|\()P[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'Available[\s_]P[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'P2O5[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'P[\s_]content[:\s\-_=]*([0-9]+\.?[0-9]*)'
-        ]
-        for pattern in p_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-            if matches:
-                phosphorus = float(matches[0])
-                break
-        
-        # Potassium patterns - find K, Potassium, K2O
-        k_patterns = [
-            r'Potassium[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'(?:^|\s|\()K[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'Available[\s_]K[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'K2O[:\s\-_=]*([0-9]+\.?[0-9]*)',
-            r'K[\s_]content[:\s\-_=]*([0-9]+\.?[0-9]*)'
-        ]
-        for pattern in k_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-            if matches:
-                potassium = float(matches[0])
-                break
-        
-        if ph or nitrogen or phosphorus or potassium:
+    finally:
+        for ocr_pass in passes:
+            if ocr_pass.is_alive():
+                ocr_pass.cancel()
+        # Reap killed processes so their CPU time is accounted to this one
+        for ocr_pass in passes:
+            if ocr_pass.ident is not None:
+                ocr_pass.join(timeout=1)
+    return values, texts, errors, seconds
+
+
+def basic_page(source):
+    """The original fixed preparation: grayscale, 2x contrast, 2x sharpness, as PNG"""
+    started = time.perf_counter()
+    img = source if isinstance(source, Image.Image) else Image.open(source)
+    original = img.size
+    if img.format == 'JPEG':
+        # Decode straight to grayscale, downscaled in the JPEG decoder
+        img.draft('L', (OCR_DRAFT_SIZE, OCR_DRAFT_SIZE))
+
+    # Enhance image for better OCR
+    img = img.convert('L')  # Convert to grayscale
+    img = ImageEnhance.Contrast(img).enhance(2)  # Increase contrast
+    img = ImageEnhance.Sharpness(img).enhance(2)  # Sharpen
+
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    info = {
+        'original_size': list(original),
+        'output_size': list(img.size),
+        'timings_ms': {'prepare': round((time.perf_counter() - started) * 1000, 2)},
+    }
+    return buffer.getvalue(), info
+
+
+def extract_soil_data_from_image(image_path, preprocess=None):
+    """
+    Extract pH, N, P, K values from soil report image (path, file-like object or PIL image).
+    `preprocess` overrides SOIL_OCR_PREPROCESS ('adaptive' or 'basic'). Results
+    include the page preparation details and per-stage timings in milliseconds.
+    """
+    try:
+        if hasattr(image_path, 'seek'):
+            image_path.seek(0)
+        started = time.perf_counter()
+        if (preprocess or OCR_PREPROCESS) == 'basic':
+            page, info = basic_page(image_path)
+        else:
+            page, info = prepare_page(image_path)
+
+        # Encoded once, shared by every pass
+        values, texts, errors, seconds = ocr_passes(page)
+        timings = dict(info.pop('timings_ms'))
+        timings.update({f'ocr_psm{psm}': round(s * 1000, 2) for psm, s in seconds.items()})
+        timings['total'] = round((time.perf_counter() - started) * 1000, 2)
+        details = {'preprocessing': info, 'timings_ms': timings}
+
+        if not texts and errors:
+            return {'success': False, 'message': f'Error: {errors[0]}', **details}
+
+        if any(value is not None for value in values.values()):
             return {
-                'ph': ph,
-                'nitrogen': nitrogen,
-                'phosphorus': phosphorus,
-                'potassium': potassium,
+                **values,
                 'success': True,
-                'message': 'Values extracted successfully'
+                'message': 'Values extracted successfully',
+                **details,
             }
         else:
-            return {'success': False, 'message': 'No values found. Try clearer image.'}
-            
+            return {'success': False, 'message': 'No values found. Try clearer image.', **details}
+
     except Exception as e:
         return {'success': False, 'message': f'Error: {str(e)}'}
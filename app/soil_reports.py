@@ -0,0 +1,110 @@
+"""
+Soil report scan cache and store
+Scans are keyed by the SHA-256 of the image bytes. A repeat upload is answered
+from the user's own stored SoilReport, then the Django cache (the OCR output for
+those exact bytes), and only then sent to OCR; other users' reports are never
+read. Reports and cache entries carry CACHE_VERSION, so a scanner change
+rescans instead of serving values the old parser read. Successful scans are
+saved per user so the yield form can prefill from the latest report without
+scanning again.
+"""
+import hashlib
+import os
+
+from django.core.cache import cache
+
+# Seconds a scan result stays in the Django cache (stored reports outlive it)
+SOIL_OCR_CACHE_TTL = int(os.getenv('SOIL_OCR_CACHE_TTL', '86400'))
+# Bumped when scanner changes make older results stale (stored on SoilReport.parser_version)
+CACHE_VERSION = 1
+# Same as soil_report_scanner.SOIL_FIELDS; the web process does not import the OCR stack
+SOIL_FIELDS = ('ph', 'nitrogen', 'phosphorus', 'potassium')
+
+
+def image_digest(upload):
+    """SHA-256 of an uploaded file, read in chunks (works for spill files too)"""
+    digest = hashlib.sha256()
+    upload.seek(0)
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def _cache_key(digest):
+    return f'soil-ocr:{CACHE_VERSION}:{digest}'
+
+
+def cached_scan(user, digest):
+    """
+    The user's SoilReport for this image if the current scanner read it before
+    (their own stored report, or a cached scan of the same bytes); None means
+    OCR is needed.
+    """
+    from .models import SoilReport
+
+    report = SoilReport.objects.filter(
+        user=user, image_sha256=digest, parser_version=CACHE_VERSION
+    ).first()
+    if report is not None:
+        # Re-uploading an old photo makes it the latest report again
+        report.save(update_fields=['updated_at'])
+        return report
+    result = cache.get(_cache_key(digest))
+    if result is None:
+        return None
+    return save_scan(user, digest, result)
+
+
+def save_scan(user, digest, result):
+    """Cache a successful scan and store it as the user's latest SoilReport"""
+    from .models import SoilReport
+
+    if not result.get('success'):
+        return None
+    cache.set(_cache_key(digest), result, SOIL_OCR_CACHE_TTL)
+    report, _ = SoilReport.objects.update_or_create(
+        user=user, image_sha256=digest,
+        defaults={
+            **{field: result.get(field) for field in SOIL_FIELDS},
+            'result': {k: v for k, v in result.items() if k not in SOIL_FIELDS},
+            'parser_version': CACHE_VERSION,
+        },
+    )
+    return report
+
+
+def remember_scan(user, digest, result):
+    """Store a scan for `user` and mark the result with its report id"""
+    report = save_scan(user, digest, result)
+    if report is not None:
+        result.update(report_id=report.id, cached=False)
+    return report
+
+
+def remember_job_scan(job, result):
+    """PredictionJob result hook for asynchronous scans (the digest is recomputed from the stored upload)"""
+    if job.user is None:
+        return None
+    return remember_scan(job.user, hashlib.sha256(bytes(job.upload)).hexdigest(), result)
+
+
+def latest_report(user):
+    """The user's most recently scanned or re-used SoilReport read by the current scanner, or None"""
+    from .models import SoilReport
+
+    if not user.is_authenticated:
+        return None
+    return SoilReport.objects.filter(user=user, parser_version=CACHE_VERSION).order_by('-updated_at').first()
+
+
+def report_payload(report, cached=False):
+    """Scan response for a stored report: the original result plus its id and age"""
+    return {
+        **report.result,
+        **report.values(),
+        'success': True,
+        'report_id': report.id,
+        'scanned_at': report.created_at.isoformat(),
+        'cached': cached,
+    }
@@ -169,6 +169,7 @@ function displaySeverity(disease, confidence) {
 
 // 7. BATCH UPLOAD (Multiple Images)
 let batchImages = [];
+let batchSummary = null;
 
 function handleBatchUpload(files) {
   batchImages = Array.from(files);
@@ -176,18 +177,41 @@ function handleBatchUpload(files) {
 }
 
 async function analyzeBatch() {
-  const results = [];
+  const formData = new FormData();
   for (const file of batchImages) {
-    const formData = new FormData();
-    formData.append('image', file);
-    const response = await fetch('/predict-disease/', {
-      method: 'POST',
-      body: formData,
-      headers: { 'X-CSRFToken': getCookie('csrftoken') }
-    });
-    results.push(await response.json());
+    formData.append('images', file);
   }
-  return results;
+  const response = await fetch('/predict-disease/batch/', {
+    method: 'POST',
+    body: formData,
+    headers: { 'X-CSRFToken': getCookie('csrftoken') }
+  });
+  const data = await response.json();
+  if (data.error) {
+    return batchImages.map(() => ({ error: data.error }));
+  }
+  batchSummary = data.summary;
+  return data.results;
+}
+
+function displayBatchSummary(summary) {
+  if (!summary) return '';
+  const infected = Math.round(summary.infected_fraction * 100);
+  const color = infected >= 50 ? '#f44336' : infected > 0 ? '#ff9800' : '#4caf50';
+  const diseases = summary.diseases.map(d => `
+    <li>${d.disease} (${d.plant}): ${d.images} of ${summary.diagnosed} images</li>
+  `).join('');
+  return `
+    <div class="batch-summary p-3 rounded mb-3" style="background:${color}15;border-left:4px solid ${color}">
+      <strong style="color:${color}">🌾 Plot summary: ${summary.diseased} of ${summary.diagnosed} images diseased (${infected}%)</strong>
+      <small class="d-block text-muted mb-2">
+        Healthy: ${summary.healthy} • Failed: ${summary.failed} • Mean confidence: ${summary.mean_confidence}%
+      </small>
+      ${diseases ? `<ul class="small mb-2">${diseases}</ul>` : ''}
+      ${summary.recommendations.length ? `<div class="small"><strong>Plot treatment:</strong>
+        <ul class="mb-0 mt-1">${summary.recommendations.map(r => `<li>${r}</li>`).join('')}</ul></div>` : ''}
+    </div>
+  `;
 }
 
 // 8. EXPERT CONSULTATION
@@ -1,3 +1,361 @@
-from django.test import TestCase
+import io
+import json
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from . import ml_workers
+from .ml_batching import MicroBatcher
+from .ml_cache import ResultCache
+from .ml_workers import MLWorkerPool, PoolBusy
+from .ocr_engines import FakeOCREngine
+from .soil_report_scanner import ocr_passes, parse_soil_values
+
+REPORT_TEXT = "Soil pH: 6.8\nAvailable N (kg/ha): 280\nPhosphorus - 22.5\nK = 310"
+
+
+class ParseSoilValuesTests(SimpleTestCase):
+    def test_reads_every_value(self):
+        self.assertEqual(
+            parse_soil_values(REPORT_TEXT),
+            {'ph': 6.8, 'nitrogen': 280.0, 'phosphorus': 22.5, 'potassium': 310.0},
+        )
+
+    def test_missing_values_are_none(self):
+        self.assertEqual(
+            parse_soil_values("pH 7.1"),
+            {'ph': 7.1, 'nitrogen': None, 'phosphorus': None, 'potassium': None},
+        )
+
+    def test_more_specific_label_wins(self):
+        # 'Nitrogen' is listed before the bare 'N', whatever the order in the text
+        self.assertEqual(parse_soil_values("N: 12\nNitrogen: 240")['nitrogen'], 240.0)
+
+    def test_out_of_range_ph_is_ignored(self):
+        self.assertIsNone(parse_soil_values("pH 65")['ph'])
+
+    def test_bare_letter_needs_word_start(self):
+        self.assertIsNone(parse_soil_values("Iron 4.2")['nitrogen'])
+
+
+class OCRPassesTests(SimpleTestCase):
+    def test_first_complete_pass_stops_the_rest(self):
+        engine = FakeOCREngine(texts={6: REPORT_TEXT, 4: "pH 5.0"}, cancellable=False)
+        values, texts, errors, seconds = ocr_passes(b'png', modes=(6, 4), engine=engine)
+        self.assertEqual(values['nitrogen'], 280.0)
+        self.assertEqual([psm for psm, _ in engine.calls], [6])
+        self.assertEqual(list(texts), [6])
+        self.assertEqual(errors, [])
+
+    def test_passes_are_combined_in_mode_order(self):
+        engine = FakeOCREngine(texts={6: "pH 6.1\nNitrogen 100", 4: "pH 7.9\nPotassium 50"})
+        values, texts, _, _ = ocr_passes(b'png', modes=(6, 4), engine=engine)
+        self.assertEqual(values, {'ph': 6.1, 'nitrogen': 100.0, 'phosphorus': None, 'potassium': 50.0})
+        self.assertEqual(set(texts), {6, 4})
+
+    def test_failed_pass_is_reported(self):
+        engine = FakeOCREngine(texts={4: REPORT_TEXT}, cancellable=False)
+        with mock.patch.object(engine, 'recognize', side_effect=[RuntimeError('psm 6 broke'), REPORT_TEXT]):
+            values, texts, errors, _ = ocr_passes(b'png', modes=(6, 4), engine=engine)
+        self.assertEqual(errors, ['psm 6 broke'])
+        self.assertEqual(values['potassium'], 310.0)
+
+
+class ThreadPoolWorkers(MLWorkerPool):
+    """MLWorkerPool running tasks on threads, so tests can patch TASKS and block tasks"""
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.processes)
+            return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+class MLWorkerPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        tasks = {
+            'echo': lambda *args: list(args),
+            'fail': mock.Mock(side_effect=ValueError('bad input')),
+            'block': lambda: self.release.wait(5),
+        }
+        patcher = mock.patch.dict(ml_workers.TASKS, tasks)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_inline_runs_in_the_caller(self):
+        pool = MLWorkerPool(processes=0)
+        self.assertEqual(pool.run('echo', 1, 'a'), [1, 'a'])
+        stats = pool.stats()
+        self.assertEqual((stats['submitted'], stats['completed'], stats['started']), (1, 1, False))
+
+    def test_inline_propagates_task_errors(self):
+        pool = MLWorkerPool(processes=0)
+        with self.assertRaisesMessage(ValueError, 'bad input'):
+            pool.run('fail')
+        self.assertEqual(pool.stats()['failed'], 1)
+
+    def test_unknown_task(self):
+        with self.assertRaises(ValueError):
+            MLWorkerPool(processes=0).submit('nope')
+
+    def test_inline_never_reports_busy(self):
+        pool = MLWorkerPool(processes=0, max_pending=1)
+        for _ in range(3):
+            pool.run('echo')
+        self.assertEqual(pool.stats()['rejected'], 0)
+
+    def test_busy_when_all_slots_are_taken(self):
+        pool = ThreadPoolWorkers(processes=1, max_pending=1)
+        self.addCleanup(pool.close)
+        self.addCleanup(self.release.set)
+        future = pool.submit('block')
+        with self.assertRaises(PoolBusy):
+            pool.submit('echo')
+        self.assertEqual(pool.stats()['rejected'], 1)
+
+        self.release.set()
+        self.assertTrue(pool.result(future))
+        self.assertEqual(pool.run('echo', 2), [2])
+
+    def test_timeout_cancels_queued_task_and_frees_its_slot(self):
+        pool = ThreadPoolWorkers(processes=1, max_pending=2, timeout=0.05)
+        self.addCleanup(pool.close)
+        self.addCleanup(self.release.set)
+        running = pool.submit('block')
+        with self.assertRaises(TimeoutError):
+            pool.run('echo', 1)
+        stats = pool.stats()
+        self.assertEqual((stats['timeouts'], stats['cancelled'], stats['in_flight']), (1, 1, 1))
+
+        self.release.set()
+        pool.result(running)
+        self.assertEqual(pool.stats()['in_flight'], 0)
+
+    def test_inline_worker_status_without_queueing(self):
+        with mock.patch.object(ml_workers, '_status_task', return_value={'pid': 1}):
+            self.assertEqual(MLWorkerPool(processes=0).worker_status(), [{'pid': 1}])
+        self.assertEqual(MLWorkerPool(processes=2).worker_status(), [])
+
+
+class CompiledYieldModelTests(SimpleTestCase):
+    def fit(self, regressor):
+        from sklearn.compose import ColumnTransformer
+        from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+        rng = np.random.default_rng(0)
+        n = 400
+        areas = rng.choice(['Albania', 'India', 'Kenya'], n)
+        items = rng.choice(['Maize', 'Wheat', 'Potatoes'], n)
+        numeric = np.column_stack([
+            rng.integers(1990, 2014, n), rng.uniform(50, 3000, n),
+            rng.uniform(0, 400000, n), rng.uniform(1, 30, n),
+        ])
+        X = np.empty((n, 6), dtype=object)
+        X[:, :4] = numeric
+        X[:, 4], X[:, 5] = areas, items
+        y = numeric[:, 1] * 3 + numeric[:, 3] * 100 + (areas == 'India') * 5000 + (items == 'Potatoes') * 9000
+        preprocesser = ColumnTransformer(transformers=[
+            ('StandardScale', StandardScaler(), [0, 1, 2, 3]),
+            ('OneHotEncode', OneHotEncoder(drop='first'), [4, 5]),
+        ], remainder='passthrough')
+        regressor.fit(preprocesser.fit_transform(X), y)
+        return regressor, preprocesser, numeric, list(areas), list(items)
+
+    def assertMatchesSklearn(self, regressor):
+        from .yield_compiled import compare, compile_model
+
+        estimator, preprocesser, numeric, areas, items = self.fit(regressor)
+        report = compare(compile_model(estimator, preprocesser), estimator, preprocesser, numeric, areas, items)
+        self.assertEqual(report['rows'], len(areas))
+        self.assertEqual(report['batch_mismatches'], 0)
+        self.assertEqual(report['single_mismatches'], 0)
+
+    def test_decision_tree(self):
+        from sklearn.tree import DecisionTreeRegressor
+        self.assertMatchesSklearn(DecisionTreeRegressor(random_state=0))
+
+    def test_random_forest(self):
+        from sklearn.ensemble import RandomForestRegressor
+        self.assertMatchesSklearn(RandomForestRegressor(n_estimators=5, random_state=0))
+
+    def test_unknown_categories_are_skipped(self):
+        from sklearn.tree import DecisionTreeRegressor
+        from .yield_compiled import compare, compile_model
+
+        estimator, preprocesser, numeric, areas, items = self.fit(DecisionTreeRegressor(random_state=0))
+        areas[0] = 'Narnia'
+        report = compare(compile_model(estimator, preprocesser), estimator, preprocesser, numeric, areas, items)
+        self.assertEqual((report['skipped_unknown'], report['batch_mismatches']), (1, 0))
+
+
+class ResultCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResultCache(max_entries=2, ttl=0)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_entries_expire_after_ttl(self):
+        cache = ResultCache(ttl=10)
+        with mock.patch('app.ml_cache.time.monotonic', return_value=100.0):
+            cache.set('a', 1)
+        with mock.patch('app.ml_cache.time.monotonic', return_value=109.0):
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('app.ml_cache.time.monotonic', return_value=111.0):
+            self.assertIsNone(cache.get('a'))
+        stats = cache.stats()
+        self.assertEqual((stats['expired'], stats['hits'], stats['misses'], stats['size']), (1, 1, 1, 0))
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_concurrent_items_share_one_forward_pass(self):
+        sizes = []
+
+        def predict(batch):
+            sizes.append(len(batch))
+            return batch * 2
+
+        batcher = MicroBatcher(predict, max_batch_size=8, window_ms=200)
+        futures = [batcher.submit(np.full(3, i, dtype=float)) for i in range(4)]
+        outputs = [future.result(timeout=5) for future in futures]
+        self.assertEqual(sizes, [4])
+        for i, output in enumerate(outputs):
+            np.testing.assert_array_equal(output, np.full(3, 2 * i))
+        self.assertEqual(batcher.stats()['occupancy'], {'4': 1})
+
+    def test_batches_are_capped(self):
+        release = threading.Event()
+        sizes = []
+
+        def predict(batch):
+            release.wait(5)
+            sizes.append(len(batch))
+            return batch
+
+        batcher = MicroBatcher(predict, max_batch_size=2, window_ms=200)
+        futures = [batcher.submit(np.zeros(1)) for _ in range(5)]
+        release.set()
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(sizes, [2, 2, 1])
+
+    def test_errors_reach_every_caller(self):
+        batcher = MicroBatcher(mock.Mock(side_effect=RuntimeError('model gone')), window_ms=0)
+        with self.assertRaisesMessage(RuntimeError, 'model gone'):
+            batcher.predict(np.zeros(1), timeout=5)
+        self.assertEqual(batcher.stats()['errors'], 1)
+
+
+class InferenceViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('farmer', password='pw')
+        self.client.force_login(self.user)
+        patcher = mock.patch('app.views.ml_pool', MLWorkerPool(processes=0))
+        self.pool = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_json(self, name, body):
+        return self.client.post(reverse(name), json.dumps(body), content_type='application/json')
+
+    def test_scenarios_reject_non_object_body(self):
+        response = self.post_json('app:yield_scenarios', [1])
+        self.assertEqual(response.status_code, 400)
+
+    def test_scenarios_reject_unknown_state(self):
+        response = self.post_json('app:yield_scenarios', {
+            'crop': 'Maize', 'state': 'Narnia', 'rainfall': 1000, 'temperature': 25, 'npk': 100,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], "Unknown state 'Narnia'")
+
+    def test_rank_rejects_missing_numbers(self):
+        response = self.client.post(reverse('app:rank_crops'), {'state': 'India'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_yield_batch_without_rows(self):
+        response = self.post_json('app:predict_yield_batch', {'rows': []})
+        self.assertEqual(response.status_code, 400)
+
+    def test_disease_batch_rejects_bad_archive(self):
+        archive = SimpleUploadedFile('leaves.zip', b'not a zip', content_type='application/zip')
+        response = self.client.post(reverse('app:predict_disease_batch'), {'archive': archive})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'archive is not a valid zip file')
+
+    def test_disease_batch_without_images(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('notes.txt', 'no leaves here')
+        upload = SimpleUploadedFile('leaves.zip', archive.getvalue(), content_type='application/zip')
+        response = self.client.post(reverse('app:predict_disease_batch'), {'archive': upload})
+        self.assertEqual(response.status_code, 400)
+
+    def test_soil_batch_needs_a_file(self):
+        response = self.client.post(reverse('app:scan_soil_report_batch'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_job_of_another_user_is_not_found(self):
+        from .models import PredictionJob
+
+        other = User.objects.create_user('neighbour', password='pw')
+        job = PredictionJob.objects.create(user=other, kind='yield')
+        response = self.client.get(reverse('app:prediction_job', args=[job.id]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('app:prediction_job', args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_job_wait_must_be_a_number(self):
+        from .models import PredictionJob
+
+        job = PredictionJob.objects.create(user=self.user, kind='yield')
+        response = self.client.get(reverse('app:prediction_job', args=[job.id]), {'wait': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_busy_pool_returns_503_with_retry_after(self):
+        with mock.patch.object(self.pool, 'run', side_effect=PoolBusy('ML workers are busy')):
+            response = self.client.post(reverse('app:rank_crops'), {
+                'state': 'India', 'rainfall': 1000, 'temperature': 25,
+                'nitrogen': 50, 'phosphorus': 30, 'potassium': 20,
+            })
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '2')
+
+    def test_ready_is_503_until_a_worker_reports(self):
+        with mock.patch('app.views.ml_pool', MLWorkerPool(processes=2)) as pool:
+            response = self.client.get(reverse('app:ml_ready'))
+            self.assertEqual(response.status_code, 503)
+            self.assertFalse(pool.stats()['started'])
+
+    def test_ready_but_busy(self):
+        worker = {
+            'disease_model': {'ready': True}, 'yield_model': {}, 'ocr': {}, 'reported_at': time.time(),
+        }
+        pool = MLWorkerPool(processes=1, max_pending=1)
+        pool._counters['in_flight'] = 1
+        with mock.patch('app.views.ml_pool', pool), mock.patch.object(pool, 'worker_status', return_value=[worker]):
+            response = self.client.get(reverse('app:ml_ready'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['ready'], response.json()['busy']), (True, True))
+
+    def test_model_versions_needs_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('app:ml_model_versions'))
+        self.assertEqual(response.status_code, 302)
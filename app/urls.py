@@ -132,12 +132,25 @@ path("prediction/", views.prediction, name="prediction"),
     # Disease Prediction
     path('disease-detection/', views.disease_detection, name='disease_detection'),
     path('predict-disease/', views.predict_disease, name='predict_disease'),
+    path('predict-disease/batch/', views.predict_disease_batch, name='predict_disease_batch'),
+    path('predict-disease/stats/', views.disease_batch_stats, name='disease_batch_stats'),
+    path('inference/ready/', views.ml_ready, name='ml_ready'),
+    path('inference/workers/', views.ml_worker_stats, name='ml_worker_stats'),
+    path('inference/models/', views.ml_model_versions, name='ml_model_versions'),
+    path('inference/jobs/<uuid:job_id>/', views.prediction_job, name='prediction_job'),
     path('download-disease-pdf/', views.download_disease_pdf, name='download_disease_pdf'),
     path('weather-disease-alert/', views.weather_disease_alert, name='weather_disease_alert'),
     
     # Yield Prediction
     path('predict-yield/', views.predict_yield, name='predict_yield'),
+    path('predict-yield/batch/', views.predict_yield_batch, name='predict_yield_batch'),
+    path('predict-yield/scenarios/', views.yield_scenarios, name='yield_scenarios'),
+    path('predict-yield/rank/', views.rank_crops, name='rank_crops'),
+    path('predict-yield/stats/', views.yield_cache_stats, name='yield_cache_stats'),
+    path('predict-yield/history/', views.yield_history, name='yield_history'),
     path('scan-soil-report/', views.scan_soil_report, name='scan_soil_report'),
+    path('scan-soil-report/batch/', views.scan_soil_report_batch, name='scan_soil_report_batch'),
+    path('scan-soil-report/latest/', views.latest_soil_report, name='latest_soil_report'),
     
     # Newsletter
     path('subscribe-newsletter/', views.subscribe_newsletter, name='subscribe_newsletter'),
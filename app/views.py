@@ -8,11 +8,12 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import JsonResponse, HttpResponse
 from django.conf import settings
-from django.urls import reverse_lazy
+from django.urls import reverse_lazy, reverse
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.core.cache import cache
 from django.core.mail import send_mail
 import json
+import os
 import requests
 import google.generativeai as genai
 from deep_translator import GoogleTranslator
@@ -20,7 +21,9 @@ import threading
 from .models import Product, Customer, Cart, OrderPlaced, Payment, CommunityGroup
 from .forms import CustomerProfileForm, CustomerRegistrationForm, CommunityGroupForm
 from .utils import STATE_CHOICES, DISTRICTS_BY_STATE
-from .ml_predict import predict_disease as ml_predict
+from .ml_workers import ml_pool, upload_payload, PoolBusy
+from .ml_jobs import submit_job, wait_for_job, job_payload, queue_depth as ml_job_queue_depth
+from .ml_registry import registry_status
 
 # Configure Gemini AI
 try:
@@ -208,53 +211,183 @@ def search(request):
 
 @login_required(login_url=reverse_lazy("app:login"))
 def prediction(request):
-    """Render crop yield prediction page"""
-    return render(request, "app/yield_prediction.html")
+    """Render crop yield prediction page, prefilled from the user's latest soil report"""
+    from .soil_reports import latest_report
+    
+    return render(request, "app/yield_prediction.html", {'soil_report': latest_report(request.user)})
+
+
+def _wants_async(request):
+    """Clients opt in to job mode with async=1 (form field or query string)"""
+    return (request.POST.get('async') or request.GET.get('async') or '').lower() in ('1', 'true', 'yes')
+
+
+def _upload_bytes(upload):
+    """Job payloads outlive the request, so read the upload instead of passing a spill-file path"""
+    upload.seek(0)
+    return upload.read()
+
+
+def _job_accepted(job):
+    return JsonResponse({
+        'job_id': str(job.id),
+        'status': job.status,
+        'poll_url': reverse('app:prediction_job', args=[job.id]),
+    }, status=202)
+
+
+@login_required(login_url=reverse_lazy("app:login"))
+def prediction_job(request, job_id):
+    """Poll an async prediction job; ?wait=<seconds> long-polls until it finishes"""
+    from .models import PredictionJob
+    
+    # Not get_object_or_404: ErrorHandlerMiddleware renders any raised Http404 as a 500 page
+    job = PredictionJob.objects.filter(pk=job_id, user=request.user).first()
+    if job is None:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    wait = request.GET.get('wait')
+    if wait and not job.is_finished:
+        try:
+            job = wait_for_job(job.id, float(wait)) or job
+        except ValueError:
+            return JsonResponse({'error': 'wait must be a number of seconds'}, status=400)
+    return JsonResponse(job_payload(job))
 
 
 @login_required(login_url=reverse_lazy("app:login"))
 def scan_soil_report(request):
-    """API endpoint to scan soil report photo and extract data"""
+    """
+    API endpoint to scan soil report photo and extract data.
+    An image scanned before (same bytes) is answered from the stored report
+    without OCR; successful scans become the user's latest SoilReport.
+    """
+    from .soil_reports import cached_scan, image_digest, remember_scan, report_payload
+    
     if request.method == "POST" and request.FILES.get('image'):
         try:
-            import os
-            from .soil_report_scanner import extract_soil_data_from_image
-            
             image = request.FILES['image']
+            digest = image_digest(image)
+            report = cached_scan(request.user, digest)
+            if report is not None:
+                return JsonResponse(report_payload(report, cached=True))
             
-            # Save temporarily
-            temp_dir = 'media/temp'
-            os.makedirs(temp_dir, exist_ok=True)
-            image_path = os.path.join(temp_dir, image.name)
-            
-            with open(image_path, 'wb+') as f:
-                for chunk in image.chunks():
-                    f.write(chunk)
+            if _wants_async(request):
+                job = submit_job(request.user, 'soil', upload=_upload_bytes(image), on_result='app.soil_reports.remember_job_scan')
+                return _job_accepted(job)
             
-            # Extract data
-            result = extract_soil_data_from_image(image_path)
-            
-            # Clean up
-            try:
-                os.remove(image_path)
-            except:
-                pass
+            # OCR runs in an ML worker process, from the upload bytes or Django's spill file
+            result = ml_pool.run('soil', upload_payload(image))
+            remember_scan(request.user, digest, result)
             
             return JsonResponse(result)
             
+        except PoolBusy as e:
+            return _pool_busy_response(e, {'success': False, 'message': str(e)})
+        except TimeoutError:
+            return JsonResponse({'success': False, 'message': 'Scan timed out, please retry'}, status=504)
         except Exception as e:
             return JsonResponse({'success': False, 'message': str(e)}, status=500)
     
     return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
 
 
+@login_required(login_url=reverse_lazy("app:login"))
+def latest_soil_report(request):
+    """The user's most recent soil report values, for prefilling forms without OCR"""
+    from .soil_reports import latest_report, report_payload
+    
+    report = latest_report(request.user)
+    if report is None:
+        return JsonResponse({'success': False, 'message': 'No soil report scanned yet'}, status=404)
+    return JsonResponse(report_payload(report, cached=True))
+
+
+def _batch_upload_path(upload):
+    """
+    Path workers can read the batch from: Django's spill file, or a temp copy of an
+    in-memory upload. Returns (path, is_temp_copy).
+    """
+    import shutil
+    import tempfile
+
+    if hasattr(upload, 'temporary_file_path'):
+        return upload.temporary_file_path(), False
+    upload.seek(0)
+    with tempfile.NamedTemporaryFile(prefix='soil-batch-', delete=False) as f:
+        shutil.copyfileobj(upload, f)
+    return f.name, True
+
+
+def _stream_soil_batch(path, kind, refs):
+    """NDJSON lines: batch header, one line per page as it finishes, then a summary"""
+    import time
+    from .soil_batch import scan_batch
+
+    started = time.perf_counter()
+    found = failed = 0
+    yield json.dumps({'type': 'batch', 'kind': kind, 'pages': len(refs)}) + '\n'
+    for entry in scan_batch(path, kind, refs, ml_pool):
+        if entry.get('success'):
+            found += 1
+        else:
+            failed += 1
+        yield json.dumps({'type': 'page', **entry}) + '\n'
+    yield json.dumps({
+        'type': 'summary',
+        'pages': len(refs),
+        'extracted': found,
+        'failed': failed,
+        'seconds': round(time.perf_counter() - started, 2),
+    }) + '\n'
+
+
+@login_required(login_url=reverse_lazy("app:login"))
+def scan_soil_report_batch(request):
+    """
+    Bulk soil report scanning: a multi-page PDF or a zip of report images (`file`).
+    Pages are OCR'd in parallel in the ML workers and streamed back as NDJSON,
+    one line per page in completion order, so large lab batches never block on
+    a single response.
+    """
+    from django.http import StreamingHttpResponse
+    from .soil_batch import SOIL_BATCH_MAX_PAGES, BatchError, batch_kind, list_pages
+
+    upload = request.FILES.get('file')
+    if request.method != "POST" or upload is None:
+        return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+
+    path, is_temp = _batch_upload_path(upload)
+    try:
+        kind = batch_kind(path)
+        refs = list_pages(path, kind)
+        if not refs:
+            raise BatchError('No pages or report images found')
+        if len(refs) > SOIL_BATCH_MAX_PAGES:
+            raise BatchError(f'At most {SOIL_BATCH_MAX_PAGES} pages per batch')
+    except Exception as e:
+        if is_temp:
+            os.remove(path)
+        status = 400 if isinstance(e, (BatchError, ImportError)) else 500
+        return JsonResponse({'success': False, 'message': str(e)}, status=status)
+
+    response = StreamingHttpResponse(
+        _stream_soil_batch(path, kind, refs), content_type='application/x-ndjson'
+    )
+    if is_temp:
+        # The server closes every response, even one whose body is never iterated
+        # (client gone before the first byte); a generator's finally would not run then
+        response._resource_closers.append(lambda: os.remove(path))
+    # Let a proxy pass each page through as soon as it is written
+    response['X-Accel-Buffering'] = 'no'
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 @login_required(login_url=reverse_lazy("app:login"))
 def predict_yield(request):
     """API endpoint for yield prediction"""
     if request.method == "POST":
         try:
-            from .yield_predict import predict_yield as ml_predict_yield
-            
             crop = request.POST.get('crop')
             state = request.POST.get('state')
             rainfall = float(request.POST.get('rainfall'))
@@ -266,19 +399,175 @@ def predict_yield(request):
             potassium = float(request.POST.get('potassium'))
             area = float(request.POST.get('area'))
             
-            result = ml_predict_yield(
-                crop, state, rainfall, temperature, humidity,
-                ph, nitrogen, phosphorus, potassium, area
-            )
+            args = (crop, state, rainfall, temperature, humidity, ph, nitrogen, phosphorus, potassium, area)
+            if _wants_async(request):
+                return _job_accepted(submit_job(request.user, 'yield', *args))
+            
+            result = ml_pool.run('yield', *args)
             
             return JsonResponse(result)
             
+        except PoolBusy as e:
+            return _pool_busy_response(e)
+        except TimeoutError:
+            return JsonResponse({'error': 'Prediction timed out, please retry'}, status=504)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+MAX_YIELD_BATCH_ROWS = 10000
+
+
+def _yield_rows_from_request(request):
+    """Rows for batch yield prediction from a CSV upload (`file`), a text/csv body or JSON"""
+    import csv
+    import io
+    
+    upload = request.FILES.get('file')
+    if upload is not None:
+        text = upload.read().decode('utf-8-sig')
+    elif request.content_type == 'text/csv':
+        text = request.body.decode('utf-8-sig')
+    else:
+        data = json.loads(request.body or b'null')
+        rows = data.get('rows') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            raise ValueError('Expected a JSON list of rows or {"rows": [...]}')
+        text = None
+    
+    if text is not None:
+        reader = csv.DictReader(io.StringIO(text))
+        rows = [{(k or '').strip().lower(): v for k, v in row.items()} for row in reader]
+    
+    if len(rows) > MAX_YIELD_BATCH_ROWS:
+        raise ValueError(f'At most {MAX_YIELD_BATCH_ROWS} rows per batch')
+    return rows
+
+
+@login_required(login_url=reverse_lazy("app:login"))
+def predict_yield_batch(request):
+    """API endpoint for predicting yield of many plots (JSON rows or CSV)"""
+    if request.method == "POST":
+        try:
+            rows = _yield_rows_from_request(request)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if not rows:
+            return JsonResponse({'error': 'No rows found'}, status=400)
+        
+        try:
+            result = ml_pool.run('yield_batch', rows)
+            return JsonResponse(result)
+        except PoolBusy as e:
+            return _pool_busy_response(e)
+        except TimeoutError:
+            return JsonResponse({'error': 'Batch prediction timed out, please retry'}, status=504)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Invalid request'}, status=400)
+
+
+@login_required(login_url=reverse_lazy("app:login"))
+def yield_scenarios(request):
+    """
+    API endpoint for what-if sweeps. JSON body: crop, state, area and axis specs
+    for rainfall, temperature and npk (number, list, or {min, max, steps}).
+    Without npk, the total of nitrogen, phosphorus and potassium is used.
+    """
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body or b'{}')
+            if not isinstance(data, dict):
+                raise ValueError('body must be a JSON object')
+            npk = data.get('npk')
+            if npk is None:
+                npk = sum(float(data.get(k) or 0) for k in ('nitrogen', 'phosphorus', 'potassium'))
+            args = (
+                data.get('crop'), data.get('state'),
+                data['rainfall'], data['temperature'], npk,
+                float(data.get('area') or 1),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            return JsonResponse({'error': f'Invalid scenario request: {e}'}, status=400)
+        
+        try:
+            return JsonResponse(ml_pool.run('yield_sweep', *args))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except PoolBusy as e:
+            return _pool_busy_response(e)
+        except TimeoutError:
+            return JsonResponse({'error': 'Scenario sweep timed out, please retry'}, status=504)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Invalid request'}, status=400)
+
+
+@login_required(login_url=reverse_lazy("app:login"))
+def rank_crops(request):
+    """API endpoint ranking every supported crop for a state and conditions"""
+    if request.method == "POST":
+        try:
+            args = (
+                request.POST.get('state'),
+                float(request.POST.get('rainfall')),
+                float(request.POST.get('temperature')),
+                float(request.POST.get('nitrogen')),
+                float(request.POST.get('phosphorus')),
+                float(request.POST.get('potassium')),
+                float(request.POST.get('area') or 1),
+            )
+        except (TypeError, ValueError) as e:
+            return JsonResponse({'error': f'Invalid input: {e}'}, status=400)
+        
+        try:
+            return JsonResponse(ml_pool.run('yield_rank', *args))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except PoolBusy as e:
+            return _pool_busy_response(e)
+        except TimeoutError:
+            return JsonResponse({'error': 'Crop ranking timed out, please retry'}, status=504)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Invalid request'}, status=400)
+
+
+@login_required(login_url=reverse_lazy("app:login"))
+def yield_history(request):
+    """
+    Historical yield aggregates for a state and crop: ?state=&crop=&start=&end=
+    Answered in the web process from the memory-mapped store (no worker round trip).
+    """
+    from .yield_predict import historical_summary, load_history_store, CROP_MAPPING
+    
+    state = request.GET.get('state')
+    crop = request.GET.get('crop')
+    if not state or not crop:
+        return JsonResponse({'error': 'state and crop are required'}, status=400)
+    try:
+        start = int(request.GET['start']) if request.GET.get('start') else None
+        end = int(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return JsonResponse({'error': 'start and end must be years'}, status=400)
+    
+    history = load_history_store()
+    if history is None:
+        return JsonResponse({'error': 'Historical data is not available'}, status=503)
+    summary = historical_summary(crop, state, start, end)
+    if summary is None:
+        return JsonResponse({'error': f'No history for {crop} in {state}'}, status=404)
+    
+    years, yields = history.series(state, CROP_MAPPING.get(crop, crop), start, end)
+    summary['series'] = {'years': years.tolist(), 'yield': [round(y, 2) for y in yields.tolist()]}
+    return JsonResponse(summary)
+
+
 @login_required(login_url=reverse_lazy("app:login"))
 def disease_detection(request):
     """Render disease prediction page"""
@@ -290,36 +579,196 @@ def predict_disease(request):
     """API endpoint for disease prediction"""
     if request.method == "POST" and request.FILES.get('image'):
         try:
-            import os
-            
             image = request.FILES['image']
             
-            # Save temporarily
-            temp_dir = 'media/temp'
-            os.makedirs(temp_dir, exist_ok=True)
-            image_path = os.path.join(temp_dir, image.name)
+            if _wants_async(request):
+                return _job_accepted(submit_job(request.user, 'disease', upload=_upload_bytes(image)))
             
-            with open(image_path, 'wb+') as f:
-                for chunk in image.chunks():
-                    f.write(chunk)
-            
-            # Predict
-            result = ml_predict(image_path)
-            
-            # Clean up
-            try:
-                os.remove(image_path)
-            except:
-                pass
+            # Inference runs in an ML worker process, from the upload bytes or Django's spill file
+            result = ml_pool.run('disease', upload_payload(image))
             
             return JsonResponse(result)
             
+        except PoolBusy as e:
+            return _pool_busy_response(e)
+        except TimeoutError:
+            return JsonResponse({'error': 'Prediction timed out, please retry'}, status=504)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+def _pool_busy_response(error, body=None):
+    response = JsonResponse(body or {'error': str(error)}, status=503)
+    response['Retry-After'] = '2'
+    return response
+
+
+MAX_BATCH_IMAGES = 100
+MAX_ARCHIVE_MEMBER_BYTES = 25 * 1024 * 1024
+# Total size of one batch (uploads plus uncompressed archive members)
+MAX_BATCH_BYTES = int(os.getenv('DISEASE_BATCH_MAX_BYTES', str(100 * 1024 * 1024)))
+
+
+def _spill(source, spill_dir, name):
+    """Copy a file object into spill_dir; workers read the path instead of pickled bytes"""
+    import shutil
+    import tempfile
+    
+    suffix = os.path.splitext(name)[1].lower()
+    with tempfile.NamedTemporaryFile(dir=spill_dir, suffix=suffix, delete=False) as out:
+        shutil.copyfileobj(source, out, 1024 * 1024)
+    return out.name
+
+
+def _batch_images_from_request(request, spill_dir):
+    """
+    Collect (name, path) pairs from `images` uploads and/or an `archive` zip.
+    Sizes are checked from the upload sizes and the zip directory before anything
+    is read, and every image is streamed to a file in spill_dir, so the web
+    process never holds the batch in memory.
+    """
+    import zipfile
+    from .ml_predict import IMAGE_SUFFIXES
+    
+    uploads = request.FILES.getlist('images')
+    members = []
+    archive = request.FILES.get('archive')
+    if archive:
+        try:
+            zf = zipfile.ZipFile(archive)
+        except zipfile.BadZipFile:
+            raise ValueError('archive is not a valid zip file')
+        members = [
+            info for info in zf.infolist()
+            if not info.is_dir() and os.path.splitext(info.filename)[1].lower() in IMAGE_SUFFIXES
+        ]
+    
+    if len(uploads) + len(members) > MAX_BATCH_IMAGES:
+        raise ValueError(f'At most {MAX_BATCH_IMAGES} images per batch')
+    for info in members:
+        if info.file_size > MAX_ARCHIVE_MEMBER_BYTES:
+            raise ValueError(f'{info.filename} is too large')
+    total = sum(f.size for f in uploads) + sum(info.file_size for info in members)
+    if total > MAX_BATCH_BYTES:
+        raise ValueError(f'Batch is larger than {MAX_BATCH_BYTES // (1024 * 1024)} MB')
+    
+    images = []
+    for f in uploads:
+        if hasattr(f, 'temporary_file_path'):
+            images.append((f.name, f.temporary_file_path()))
+        else:
+            f.seek(0)
+            images.append((f.name, _spill(f, spill_dir, f.name)))
+    for info in members:
+        # ZipExtFile never yields more than the directory's file_size
+        with zf.open(info) as member:
+            images.append((os.path.basename(info.filename), _spill(member, spill_dir, info.filename)))
+    return images
+
+
+@login_required(login_url=reverse_lazy("app:login"))
+def predict_disease_batch(request):
+    """API endpoint for diagnosing many leaf images (multipart `images` or a zip `archive`)"""
+    import tempfile
+    
+    if request.method == "POST" and (request.FILES.getlist('images') or request.FILES.get('archive')):
+        with tempfile.TemporaryDirectory(prefix='disease-batch-') as spill_dir:
+            try:
+                images = _batch_images_from_request(request, spill_dir)
+            except Exception as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            if not images:
+                return JsonResponse({'error': 'No images found'}, status=400)
+            
+            try:
+                names = [name for name, _ in images]
+                result = ml_pool.run('disease_batch', [path for _, path in images], names)
+                return JsonResponse(result)
+            except PoolBusy as e:
+                return _pool_busy_response(e)
+            except TimeoutError:
+                return JsonResponse({'error': 'Batch diagnosis timed out, please retry'}, status=504)
+            except Exception as e:
+                return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Invalid request'}, status=400)
+
+
+@login_required(login_url=reverse_lazy("app:login"))
+def disease_batch_stats(request):
+    """Micro-batch occupancy and result-cache hit rates for the disease model"""
+    try:
+        status = ml_pool.run('status', timeout=5)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    return JsonResponse({'batching': status['batching'], 'cache': status['cache']})
+
+
+@login_required(login_url=reverse_lazy("app:login"))
+def yield_cache_stats(request):
+    """Yield model version plus prediction- and ranking-cache hit rates"""
+    try:
+        status = ml_pool.run('status', timeout=5)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    return JsonResponse(status['yield_model'])
+
+
+@login_required(login_url=reverse_lazy("app:login"))
+def ml_worker_stats(request):
+    """Queue depth and utilization of the ML worker pool and the async job queue"""
+    return JsonResponse(dict(ml_pool.stats(), job_queue_depth=ml_job_queue_depth()))
+
+
+@login_required(login_url=reverse_lazy("app:login"))
+def ml_model_versions(request):
+    """
+    Model registry contents (active and available versions) next to what a
+    worker process is actually serving, with its load time.
+    """
+    payload = {'registry': registry_status()}
+    try:
+        worker = ml_pool.run('status', timeout=2)
+    except Exception as e:
+        payload['worker'] = {'error': str(e) or 'workers busy'}
+    else:
+        payload['worker'] = {
+            'pid': worker['pid'],
+            'disease': worker['disease_model']['release'],
+            'yield': worker['yield_model']['release'],
+            'yield_history': worker['yield_model']['history_release'],
+        }
+    return JsonResponse(payload)
+
+
+def ml_ready(request):
+    """
+    Readiness probe for ML workers. Answers from the status each worker process
+    reported after warming up, never through the task queue, so busy workers
+    read as ready (with busy=true) rather than failing the probe. Returns 503
+    until a worker has the disease model loaded. The pool is started by the
+    web server (gunicorn_config.post_worker_init), not by this probe.
+    """
+    pool = ml_pool.stats()
+    workers = ml_pool.worker_status()
+    if not workers:
+        return JsonResponse({'ready': False, 'workers': pool, 'error': 'No ML worker has reported yet'}, status=503)
+    
+    worker = max(workers, key=lambda w: (w['disease_model']['ready'], w.get('reported_at', 0)))
+    status = {
+        'ready': worker['disease_model']['ready'],
+        'busy': pool['in_flight'] >= pool['max_pending'],
+        'disease_model': worker['disease_model'],
+        'yield_model': worker['yield_model'],
+        'ocr': worker['ocr'],
+        'reporting_workers': len(workers),
+        'workers': pool,
+    }
+    return JsonResponse(status, status=200 if status['ready'] else 503)
+
+
 @login_required(login_url=reverse_lazy("app:login"))
 def weather_disease_alert(request):
     """Get weather-based disease risk alert"""
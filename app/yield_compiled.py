@@ -0,0 +1,436 @@
+"""
+Compiled yield model
+Flattens the fitted ColumnTransformer (StandardScaler + OneHotEncoder) and the
+regressor (a decision tree, random forest or histogram gradient boosting) into
+plain NumPy arrays, so predictions are a scale, a couple of dict lookups and
+walks down the trees. Has no Django dependency.
+
+On disk the model is a directory of .npy arrays plus manifest.json (encoders
+and metadata). Arrays are opened with mmap_mode='r', so every process that
+loads the same artifact shares one copy in the page cache.
+"""
+import csv
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Raw feature order expected by the preprocessor
+FEATURES = ['Year', 'average_rain_fall_mm_per_year', 'pesticides_tonnes', 'avg_temp', 'Area', 'Item']
+NUMERIC = 4
+
+ARTIFACT_FORMAT = 'yield-tree'
+ARTIFACT_FORMAT_VERSION = 2
+MANIFEST_NAME = 'manifest.json'
+# Name -> on-disk dtype; node indices fit comfortably in int32
+ARRAY_DTYPES = {
+    'mean': '<f8',
+    'scale': '<f8',
+    'roots': '<i4',
+    'feature': '<i4',
+    'threshold': '<f8',
+    'left': '<i4',
+    'right': '<i4',
+    'value': '<f8',
+}
+# How tree outputs combine: 'mean' (single tree, random forest) or baseline + 'sum' (boosting)
+AGGREGATES = ('mean', 'sum')
+
+
+class CompiledYieldModel:
+    """
+    Array form of preprocesser.pkl + dtr.pkl.
+
+    All trees share one set of node arrays; `roots` holds each tree's first node
+    and leaves have left == -1. sklearn trees and forests compare float32-cast
+    features with float64 thresholds, boosting compares float64 features
+    (`input_dtype`). Every path here casts, traverses and accumulates in the
+    same order as sklearn, so outputs are bit-identical to
+    `estimator.predict(preprocesser.transform(X))`.
+    """
+
+    def __init__(self, mean, scale, categories, drop_idx, feature, threshold, left, right, value,
+                 roots=None, aggregate='mean', baseline=0.0, input_dtype='float32', kind='decision_tree',
+                 version=None, manifest=None):
+        # No dtype conversion for arrays that are already usable, so memory maps stay memory maps
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.categories = [[str(c) for c in cats] for cats in categories]
+        self.drop_idx = [None if d is None else int(d) for d in drop_idx]
+        self.feature = _index_array(feature)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = _index_array(left)
+        self.right = _index_array(right)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = _index_array(roots if roots is not None else [0])
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{aggregate}'")
+        self.aggregate = aggregate
+        self.baseline = float(baseline)
+        self.input_dtype = np.dtype(input_dtype)
+        self.kind = kind
+        self.version = version or self.fingerprint()
+        self.manifest = manifest or {}
+        self.memory_mapped = False
+
+        # category -> output column (-1 for the dropped reference category)
+        self.columns = []
+        offset = NUMERIC
+        for cats, drop in zip(self.categories, self.drop_idx):
+            mapping = {}
+            for i, cat in enumerate(cats):
+                if drop is not None and i == drop:
+                    mapping[cat] = -1
+                else:
+                    mapping[cat] = offset + i - (1 if drop is not None and i > drop else 0)
+            self.columns.append(mapping)
+            offset += len(cats) - (0 if drop is None else 1)
+        self.n_features = offset
+
+    def arrays(self):
+        return {
+            'mean': self.mean, 'scale': self.scale, 'roots': self.roots, 'feature': self.feature,
+            'threshold': self.threshold, 'left': self.left, 'right': self.right, 'value': self.value,
+        }
+
+    def fingerprint(self):
+        """Content hash of encoders and arrays; identifies the model across processes and restarts"""
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(json.dumps(
+            [self.categories, self.drop_idx, self.aggregate, self.baseline, self.input_dtype.str]
+        ).encode())
+        for name, array in self.arrays().items():
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(array, dtype=ARRAY_DTYPES[name]).tobytes())
+        return digest.hexdigest()
+
+    @property
+    def node_count(self):
+        return len(self.threshold)
+
+    @property
+    def tree_count(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays().values())
+
+    def category_columns(self, position, values):
+        """Output columns for categorical feature `position` (0 = Area, 1 = Item)"""
+        mapping = self.columns[position]
+        try:
+            return np.fromiter((mapping[v] for v in values), dtype=np.intp, count=len(values))
+        except KeyError as e:
+            raise ValueError(
+                f"Found unknown categories [{e.args[0]!r}] in column {position} during transform"
+            ) from None
+
+    def transform(self, numeric, areas, items):
+        """
+        Dense feature matrix (input_dtype), equal to the preprocessor output cast as sklearn does.
+
+        Args:
+            numeric: (n, 4) Year, rainfall, pesticides, temperature
+            areas, items: n category names each
+        """
+        numeric = np.asarray(numeric, dtype=np.float64).reshape(-1, NUMERIC)
+        n = numeric.shape[0]
+        X = np.zeros((n, self.n_features), dtype=self.input_dtype)
+        X[:, :NUMERIC] = (numeric - self.mean) / self.scale
+        rows = np.arange(n)
+        for position, values in enumerate((areas, items)):
+            cols = self.category_columns(position, values)
+            hot = cols >= 0
+            X[rows[hot], cols[hot]] = 1.0
+        return X
+
+    def predict_features(self, X):
+        """Walk every (row, tree) pair of a transformed matrix down its tree, level by level"""
+        n, trees = X.shape[0], len(self.roots)
+        node = np.tile(np.asarray(self.roots, dtype=np.intp), n)
+        rows = np.repeat(np.arange(n), trees)
+        active = np.flatnonzero(self.left[node] >= 0)
+        while active.size:
+            current = node[active]
+            go_left = X[rows[active], self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            node[active] = current
+            active = active[self.left[current] >= 0]
+
+        # Accumulate tree by tree, in sklearn's order, so rounding matches exactly
+        leaves = self.value[node].reshape(n, trees)
+        out = np.full(n, self.baseline)
+        for t in range(trees):
+            out += leaves[:, t]
+        if self.aggregate == 'mean':
+            out /= trees
+        return out
+
+    def predict(self, numeric, areas, items):
+        """Predicted yield (hg/ha) for many rows"""
+        return self.predict_features(self.transform(numeric, areas, items))
+
+    def predict_one(self, year, rainfall, pesticides, temperature, area, item):
+        """Predicted yield (hg/ha) for a single row without building a matrix"""
+        x = [0.0] * self.n_features
+        cast = self.input_dtype.type
+        for i, v in enumerate((year, rainfall, pesticides, temperature)):
+            # Rounded like sklearn's cast of the float64 scaled value
+            x[i] = float(cast((float(v) - self.mean[i]) / self.scale[i]))
+        for position, v in enumerate((area, item)):
+            col = self.category_columns(position, [v])[0]
+            if col >= 0:
+                x[col] = 1.0
+
+        feature, threshold, left, right, value = self.feature, self.threshold, self.left, self.right, self.value
+        total = self.baseline
+        for node in self.roots.tolist():
+            while left[node] >= 0:
+                node = left[node] if x[feature[node]] <= threshold[node] else right[node]
+            total += float(value[node])
+        if self.aggregate == 'mean':
+            total /= len(self.roots)
+        return total
+
+
+def _index_array(array):
+    array = np.asarray(array)
+    return array if array.dtype.kind == 'i' else array.astype(np.intp)
+
+
+def _tree_arrays(estimator):
+    """
+    Per-tree node arrays (feature, threshold, left, right, value) plus how to combine them.
+
+    Returns:
+        tuple: (list of per-tree array dicts, aggregate, baseline, input_dtype, kind)
+    """
+    def sklearn_tree(tree):
+        return {
+            'feature': tree.feature,
+            'threshold': tree.threshold,
+            'left': tree.children_left,
+            'right': tree.children_right,
+            'value': tree.value.reshape(tree.node_count, -1)[:, 0],
+        }
+
+    if hasattr(estimator, 'tree_'):
+        return [sklearn_tree(estimator.tree_)], 'mean', 0.0, 'float32', 'decision_tree'
+
+    if hasattr(estimator, 'estimators_') and all(hasattr(e, 'tree_') for e in estimator.estimators_):
+        if getattr(estimator, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+        trees = [sklearn_tree(e.tree_) for e in estimator.estimators_]
+        return trees, 'mean', 0.0, 'float32', 'random_forest'
+
+    if hasattr(estimator, '_predictors'):
+        if estimator.n_trees_per_iteration_ != 1 or estimator.loss not in ('squared_error', 'absolute_error'):
+            raise ValueError("Only identity-link single-output boosting can be compiled")
+        if estimator.is_categorical_ is not None and np.any(estimator.is_categorical_):
+            raise ValueError("Native categorical splits are not supported; one-hot encode instead")
+        trees = []
+        for (predictor,) in estimator._predictors:
+            nodes = predictor.nodes
+            leaf = nodes['is_leaf'].astype(bool)
+            trees.append({
+                'feature': nodes['feature_idx'].astype(np.int64),
+                'threshold': nodes['num_threshold'],
+                # Child indices are uint32: widen before marking leaves with -1
+                'left': np.where(leaf, -1, nodes['left'].astype(np.int64)),
+                'right': np.where(leaf, -1, nodes['right'].astype(np.int64)),
+                'value': nodes['value'],
+            })
+        baseline = float(np.ravel(estimator._baseline_prediction)[0])
+        return trees, 'sum', baseline, 'float64', 'hist_gradient_boosting'
+
+    raise ValueError(f"Cannot compile {type(estimator).__name__}")
+
+
+def compile_model(estimator, preprocesser):
+    """Build a CompiledYieldModel from the fitted preprocessor and regressor"""
+    scaler = preprocesser.named_transformers_['StandardScale']
+    encoder = preprocesser.named_transformers_['OneHotEncode']
+    if scaler.mean_ is None or scaler.scale_ is None:
+        raise ValueError("Scaler must be fitted with both with_mean and with_std")
+    if len(scaler.mean_) != NUMERIC or len(encoder.categories_) != 2:
+        raise ValueError("Preprocessor layout differs from [4 numeric, Area, Item]")
+
+    drop_idx = encoder.drop_idx_ if encoder.drop_idx_ is not None else [None] * len(encoder.categories_)
+    trees, aggregate, baseline, input_dtype, kind = _tree_arrays(estimator)
+
+    # Concatenate trees, shifting child indices by each tree's offset
+    roots, offset = [], 0
+    merged = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'value')}
+    for tree in trees:
+        roots.append(offset)
+        for name in ('feature', 'threshold', 'value'):
+            merged[name].append(np.asarray(tree[name]))
+        for name in ('left', 'right'):
+            children = np.asarray(tree[name], dtype=np.int64)
+            merged[name].append(np.where(children >= 0, children + offset, -1))
+        offset += len(tree['threshold'])
+
+    compiled = CompiledYieldModel(
+        mean=scaler.mean_,
+        scale=scaler.scale_,
+        categories=encoder.categories_,
+        drop_idx=drop_idx,
+        roots=roots,
+        aggregate=aggregate,
+        baseline=baseline,
+        input_dtype=input_dtype,
+        kind=kind,
+        **{name: np.concatenate(parts) for name, parts in merged.items()},
+    )
+    expected = getattr(estimator, 'n_features_in_', compiled.n_features)
+    if compiled.n_features != expected:
+        raise ValueError(f"Preprocessor emits {compiled.n_features} features, model expects {expected}")
+    return compiled
+
+
+def save_artifact(compiled, directory, metadata=None):
+    """
+    Write `compiled` as <directory>/*.npy plus manifest.json.
+    The manifest is replaced last and atomically, so readers never see a half-written model.
+
+    Returns:
+        dict: the manifest
+    """
+    os.makedirs(directory, exist_ok=True)
+    arrays = {}
+    for name, array in compiled.arrays().items():
+        filename = f'{name}.npy'
+        np.save(os.path.join(directory, filename), np.ascontiguousarray(array, dtype=ARRAY_DTYPES[name]))
+        arrays[name] = {'file': filename, 'dtype': ARRAY_DTYPES[name], 'shape': list(array.shape)}
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'version': compiled.version,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'features': FEATURES,
+        'n_features': compiled.n_features,
+        'model': {
+            'kind': compiled.kind,
+            'trees': compiled.tree_count,
+            'nodes': compiled.node_count,
+            'aggregate': compiled.aggregate,
+            'baseline': compiled.baseline,
+            'input_dtype': compiled.input_dtype.name,
+        },
+        'encoders': {
+            'numeric': {'columns': FEATURES[:NUMERIC], 'mean': 'mean', 'scale': 'scale'},
+            'categorical': [
+                {'column': column, 'categories': cats, 'drop_idx': drop}
+                for column, cats, drop in zip(FEATURES[NUMERIC:], compiled.categories, compiled.drop_idx)
+            ],
+        },
+        'arrays': arrays,
+        'metadata': metadata or {},
+    }
+    tmp_path = os.path.join(directory, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_NAME))
+    return manifest
+
+
+def load_artifact(directory, mmap=True):
+    """Open a saved artifact; arrays are memory-mapped read-only unless mmap=False"""
+    with open(os.path.join(directory, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"{directory} is not a {ARTIFACT_FORMAT} artifact")
+    if manifest.get('format_version', 0) > ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"Artifact format {manifest['format_version']} is newer than supported ({ARTIFACT_FORMAT_VERSION})"
+        )
+
+    arrays = {}
+    for name, spec in manifest['arrays'].items():
+        array = np.load(os.path.join(directory, spec['file']), mmap_mode='r' if mmap else None)
+        if array.dtype != np.dtype(spec['dtype']) or list(array.shape) != spec['shape']:
+            raise ValueError(f"Array '{name}' does not match the manifest")
+        arrays[name] = array
+
+    # Format 1 artifacts hold a single float32 tree with no 'model' section
+    model = manifest.get('model', {})
+    categorical = manifest['encoders']['categorical']
+    compiled = CompiledYieldModel(
+        categories=[c['categories'] for c in categorical],
+        drop_idx=[c['drop_idx'] for c in categorical],
+        aggregate=model.get('aggregate', 'mean'),
+        baseline=model.get('baseline', 0.0),
+        input_dtype=model.get('input_dtype', 'float32'),
+        kind=model.get('kind', 'decision_tree'),
+        version=manifest['version'],
+        manifest=manifest,
+        **arrays,
+    )
+    if compiled.n_features != manifest['n_features']:
+        raise ValueError("Encoders do not match the manifest feature count")
+    compiled.memory_mapped = mmap
+    return compiled
+
+
+def read_dataset(csv_path):
+    """Rows of yield_df.csv as (numeric (n, 4) float64, areas, items)"""
+    numeric, areas, items = [], [], []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            numeric.append([float(row[name]) for name in FEATURES[:NUMERIC]])
+            areas.append(row['Area'])
+            items.append(row['Item'])
+    return np.array(numeric, dtype=np.float64), areas, items
+
+
+def verify(compiled, estimator, preprocesser, csv_path):
+    """Compare compiled predictions with sklearn over every row of `csv_path`"""
+    return compare(compiled, estimator, preprocesser, *read_dataset(csv_path))
+
+
+def compare(compiled, estimator, preprocesser, numeric, areas, items):
+    """
+    Compare compiled batch and single-row predictions with sklearn on raw rows.
+    Rows whose categories the preprocessor never saw are skipped (sklearn rejects them).
+    Equality is checked on the raw float64 bits.
+    """
+    known = np.array([a in compiled.columns[0] and i in compiled.columns[1] for a, i in zip(areas, items)])
+    numeric = numeric[known]
+    areas = [a for a, k in zip(areas, known) if k]
+    items = [i for i, k in zip(items, known) if k]
+
+    features = np.empty((len(areas), len(FEATURES)), dtype=object)
+    features[:, :NUMERIC] = numeric
+    features[:, NUMERIC] = areas
+    features[:, NUMERIC + 1] = items
+
+    started = time.perf_counter()
+    expected = estimator.predict(preprocesser.transform(features))
+    sklearn_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = compiled.predict(numeric, areas, items)
+    batch_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    single = np.array([
+        compiled.predict_one(*row, area, item) for row, area, item in zip(numeric.tolist(), areas, items)
+    ])
+    single_s = time.perf_counter() - started
+
+    expected_bits = expected.view(np.uint64)
+    return {
+        'rows': int(known.size),
+        'skipped_unknown': int((~known).sum()),
+        'batch_mismatches': int((batch.view(np.uint64) != expected_bits).sum()),
+        'single_mismatches': int((single.view(np.uint64) != expected_bits).sum()),
+        'max_abs_diff': float(max(np.abs(batch - expected).max(initial=0), np.abs(single - expected).max(initial=0))),
+        'sklearn_ms': round(sklearn_s * 1000, 2),
+        'compiled_batch_ms': round(batch_s * 1000, 2),
+        'compiled_single_ms': round(single_s * 1000, 2),
+    }
@@ -0,0 +1,209 @@
+"""
+Historical yield store
+yield_df.csv as typed columns with categorical codes, collapsed to one row per
+(Area, Item, Year) and sorted so each (Area, Item) pair is a contiguous slice.
+Aggregates touch only that slice, so they take microseconds and never need pandas.
+Saved like the yield model: .npy columns plus manifest.json, memory-mapped on load.
+"""
+import csv
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+HISTORY_FORMAT = 'yield-history'
+HISTORY_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+COLUMN_DTYPES = {
+    'year': '<i2',
+    'yield_hg': '<f8',       # mean hg/ha over the dataset's rows for that year
+    'rainfall': '<f4',
+    'pesticides': '<f4',
+    'temperature': '<f4',
+    'samples': '<i2',        # dataset rows collapsed into this year
+}
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class YieldHistory:
+    """
+    Per-year history for every (Area, Item) pair.
+    Rows of pair k = area_code * len(items) + item_code are offsets[k]:offsets[k + 1].
+    """
+
+    def __init__(self, areas, items, columns, offsets, manifest=None):
+        self.areas = [str(a) for a in areas]
+        self.items = [str(i) for i in items]
+        self.columns = columns
+        self.offsets = offsets
+        self.manifest = manifest or {}
+        self._area_codes = {a: i for i, a in enumerate(self.areas)}
+        self._item_codes = {item: i for i, item in enumerate(self.items)}
+
+    def __len__(self):
+        return len(self.columns['year'])
+
+    def _rows(self, area, item, start_year=None, end_year=None):
+        area_code = self._area_codes.get(area)
+        item_code = self._item_codes.get(item)
+        if area_code is None or item_code is None:
+            return None
+        pair = area_code * len(self.items) + item_code
+        start, stop = int(self.offsets[pair]), int(self.offsets[pair + 1])
+        if start_year is not None or end_year is not None:
+            years = self.columns['year'][start:stop]
+            if start_year is not None:
+                start += int(np.searchsorted(years, start_year, side='left'))
+            if end_year is not None:
+                stop = int(self.offsets[pair]) + int(np.searchsorted(years, end_year, side='right'))
+        return slice(start, stop) if stop > start else None
+
+    def series(self, area, item, start_year=None, end_year=None):
+        """(years, yields in quintals/ha), or None if there is no history"""
+        rows = self._rows(area, item, start_year, end_year)
+        if rows is None:
+            return None
+        return np.asarray(self.columns['year'][rows]), self.columns['yield_hg'][rows] / 10
+
+    def summary(self, area, item, start_year=None, end_year=None, percentiles=DEFAULT_PERCENTILES):
+        """
+        Year range, mean, spread, percentiles and linear trend of yield (quintals/ha),
+        plus average growing conditions. None if the pair has no history in range.
+        """
+        rows = self._rows(area, item, start_year, end_year)
+        if rows is None:
+            return None
+        years = np.asarray(self.columns['year'][rows], dtype=np.float64)
+        yields = self.columns['yield_hg'][rows] / 10
+        mean = float(yields.mean())
+
+        slope = 0.0
+        if len(years) > 1:
+            centered = years - years.mean()
+            slope = float((centered * (yields - mean)).sum() / (centered * centered).sum())
+
+        values = _percentiles(np.sort(yields), percentiles)
+        return {
+            'area': area,
+            'item': item,
+            'start_year': int(years[0]),
+            'end_year': int(years[-1]),
+            'years': len(years),
+            'mean': round(mean, 2),
+            'min': round(float(yields.min()), 2),
+            'max': round(float(yields.max()), 2),
+            'std': round(float(yields.std()), 2),
+            'latest': round(float(yields[-1]), 2),
+            'percentiles': {f'p{p}': round(float(v), 2) for p, v in zip(percentiles, values)},
+            'trend_per_year': round(slope, 2),
+            'trend_percent_per_year': round(slope / mean * 100, 2) if mean else 0.0,
+            'conditions': {
+                'rainfall': round(float(self.columns['rainfall'][rows].mean()), 1),
+                'pesticides': round(float(self.columns['pesticides'][rows].mean()), 1),
+                'temperature': round(float(self.columns['temperature'][rows].mean()), 2),
+            },
+        }
+
+    def percentile_rank(self, area, item, value):
+        """Share (0-100) of historical years with yield (quintals/ha) at or below value"""
+        rows = self._rows(area, item)
+        if rows is None:
+            return None
+        yields = self.columns['yield_hg'][rows] / 10
+        return round(float((yields <= value).mean() * 100), 1)
+
+
+def _percentiles(ordered, percentiles):
+    """np.percentile's default linear interpolation on already-sorted values, minus its overhead"""
+    last = len(ordered) - 1
+    values = []
+    for p in percentiles:
+        position = last * p / 100
+        low = int(position)
+        high = min(low + 1, last)
+        values.append(ordered[low] + (ordered[high] - ordered[low]) * (position - low))
+    return values
+
+
+def build_history(csv_path):
+    """Read yield_df.csv into a YieldHistory (per-year means of duplicated station rows)"""
+    areas, items, years, yields, rainfall, pesticides, temperature = [], [], [], [], [], [], []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            areas.append(row['Area'])
+            items.append(row['Item'])
+            years.append(int(row['Year']))
+            yields.append(float(row['hg/ha_yield']))
+            rainfall.append(float(row['average_rain_fall_mm_per_year']))
+            pesticides.append(float(row['pesticides_tonnes']))
+            temperature.append(float(row['avg_temp']))
+
+    area_names, area_codes = np.unique(np.array(areas), return_inverse=True)
+    item_names, item_codes = np.unique(np.array(items), return_inverse=True)
+    years = np.array(years, dtype=np.int64)
+    first_year = years.min()
+    span = years.max() - first_year + 1
+
+    # One group per (area, item, year); sorting the key sorts by pair, then year
+    pair = area_codes * len(item_names) + item_codes
+    keys, group, samples = np.unique(pair * span + (years - first_year), return_inverse=True, return_counts=True)
+
+    def group_mean(values):
+        return np.bincount(group, weights=np.asarray(values, dtype=np.float64)) / samples
+
+    columns = {
+        'year': (keys % span) + first_year,
+        'yield_hg': group_mean(yields),
+        'rainfall': group_mean(rainfall),
+        'pesticides': group_mean(pesticides),
+        'temperature': group_mean(temperature),
+        'samples': samples,
+    }
+    columns = {name: values.astype(COLUMN_DTYPES[name]) for name, values in columns.items()}
+    offsets = np.searchsorted(keys // span, np.arange(len(area_names) * len(item_names) + 1)).astype('<i4')
+    return YieldHistory(area_names, item_names, columns, offsets)
+
+
+def save_history(history, directory, metadata=None):
+    """Write .npy columns, then manifest.json atomically"""
+    os.makedirs(directory, exist_ok=True)
+    arrays = dict(history.columns, offsets=history.offsets)
+    files = {}
+    for name, array in arrays.items():
+        filename = f'{name}.npy'
+        np.save(os.path.join(directory, filename), np.ascontiguousarray(array))
+        files[name] = {'file': filename, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+
+    manifest = {
+        'format': HISTORY_FORMAT,
+        'format_version': HISTORY_FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'rows': len(history),
+        'areas': history.areas,
+        'items': history.items,
+        'arrays': files,
+        'metadata': metadata or {},
+    }
+    tmp_path = os.path.join(directory, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_NAME))
+    return manifest
+
+
+def load_history(directory, mmap=True):
+    with open(os.path.join(directory, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != HISTORY_FORMAT:
+        raise ValueError(f"{directory} is not a {HISTORY_FORMAT} store")
+
+    arrays = {}
+    for name, spec in manifest['arrays'].items():
+        array = np.load(os.path.join(directory, spec['file']), mmap_mode='r' if mmap else None)
+        if array.dtype != np.dtype(spec['dtype']) or list(array.shape) != spec['shape']:
+            raise ValueError(f"Column '{name}' does not match the manifest")
+        # Plain ndarray views of the mapping: slicing np.memmap objects is several times slower
+        arrays[name] = np.asarray(array)
+    offsets = arrays.pop('offsets')
+    return YieldHistory(manifest['areas'], manifest['items'], arrays, offsets, manifest)
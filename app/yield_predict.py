@@ -5,22 +5,228 @@ Uses trained ML model for yield estimation
 import numpy as np
 import pickle
 import os
+import time
 
-# Model cache
-_models = {'dtr': None, 'preprocesser': None}
+from .ml_cache import ResultCache
+from .ml_registry import HotModel
+from .yield_compiled import compile_model, load_artifact, MANIFEST_NAME
+from .yield_history import load_history
+
+# Map crop names to dataset format
+CROP_MAPPING = {
+    'Rice': 'Rice, paddy',
+    'Wheat': 'Wheat',
+    'Cotton': 'Cotton',
+    'Sugarcane': 'Sugar cane',
+    'Maize': 'Maize',
+    'Soybean': 'Soybeans',
+    'Potato': 'Potatoes',
+    'Tomato': 'Tomatoes'
+}
+
+# Model inputs not collected from the user
+DEFAULT_YEAR = 2020
+
+# Columns accepted by predict_yield_batch; humidity and pH only feed recommendations
+BATCH_FIELDS = ['crop', 'state', 'rainfall', 'temperature', 'humidity', 'ph',
+                'nitrogen', 'phosphorus', 'potassium', 'area']
+OPTIONAL_FIELDS = {'humidity', 'ph'}
+
+# Scenario sweeps: grid axes and the largest grid evaluated in one call
+SWEEP_AXES = ['rainfall', 'temperature', 'npk']
+YIELD_SWEEP_MAX_POINTS = int(os.getenv('YIELD_SWEEP_MAX_POINTS', '20000'))
+
+# Crop ranking: inputs are snapped to these buckets and rankings cached per bucket
+RANK_RAINFALL_STEP = float(os.getenv('YIELD_RANK_RAINFALL_STEP', '10'))
+RANK_TEMPERATURE_STEP = float(os.getenv('YIELD_RANK_TEMPERATURE_STEP', '0.5'))
+RANK_NPK_STEP = float(os.getenv('YIELD_RANK_NPK_STEP', '5'))
+_rank_cache = ResultCache(
+    max_entries=int(os.getenv('YIELD_RANK_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('YIELD_RANK_CACHE_TTL', '3600')),
+)
+
+ML_MODELS_DIR = os.path.join(os.path.dirname(__file__), 'ml_models')
+# Served from the model registry ('yield' and 'yield_history' releases, see
+# `manage.py model_registry`); these directories are only used while a model
+# has no active release
+YIELD_MODEL_DIR = os.getenv('YIELD_MODEL_DIR', os.path.join(ML_MODELS_DIR, 'yield_model'))
+YIELD_HISTORY_DIR = os.getenv('YIELD_HISTORY_DIR', os.path.join(ML_MODELS_DIR, 'yield_history'))
+
+# Single predictions are memoized per rainfall/temperature/pesticides rounded to
+# these steps; only the cache key is rounded, the model always sees the raw inputs
+CACHE_RAINFALL_STEP = float(os.getenv('YIELD_CACHE_RAINFALL_STEP', '1'))
+CACHE_TEMPERATURE_STEP = float(os.getenv('YIELD_CACHE_TEMPERATURE_STEP', '0.1'))
+CACHE_PESTICIDES_STEP = float(os.getenv('YIELD_CACHE_PESTICIDES_STEP', '0.1'))
+_prediction_cache = ResultCache(
+    max_entries=int(os.getenv('YIELD_CACHE_SIZE', '4096')),
+    ttl=float(os.getenv('YIELD_CACHE_TTL', '3600')),
+)
+
+def load_sklearn_models():
+    """The original pickled sklearn objects, for compiling and verification only"""
+    with open(os.path.join(ML_MODELS_DIR, 'dtr.pkl'), 'rb') as f:
+        dtr = pickle.load(f)
+    with open(os.path.join(ML_MODELS_DIR, 'preprocesser.pkl'), 'rb') as f:
+        preprocesser = pickle.load(f)
+    return dtr, preprocesser
+
+def _load_compiled(path):
+    """Memory-map a compiled artifact; compile the pickles if none has been exported yet"""
+    if path and os.path.exists(os.path.join(path, MANIFEST_NAME)):
+        return load_artifact(path)
+    print("⚠️ No yield model artifact, compiling from pickles")
+    return compile_model(*load_sklearn_models())
+
+def _load_history(path):
+    if path and os.path.exists(os.path.join(path, MANIFEST_NAME)):
+        return load_history(path)
+    return None
+
+# Swapped in place when a new release is activated; caches are keyed by model.version
+_compiled = HotModel('yield', _load_compiled, fallback=YIELD_MODEL_DIR)
+_history = HotModel('yield_history', _load_history, fallback=YIELD_HISTORY_DIR)
 
 def load_models():
-    if _models['dtr'] is None:
-        model_path = os.path.join(os.path.dirname(__file__), 'ml_models', 'dtr.pkl')
-        preprocesser_path = os.path.join(os.path.dirname(__file__), 'ml_models', 'preprocesser.pkl')
-        
-        with open(model_path, 'rb') as f:
-            _models['dtr'] = pickle.load(f)
-        
-        with open(preprocesser_path, 'rb') as f:
-            _models['preprocesser'] = pickle.load(f)
+    """CompiledYieldModel of the active 'yield' release"""
+    return _compiled.get()
+
+def load_history_store():
+    """Memory-mapped YieldHistory, or None if the store has not been built"""
+    return _history.get()
+
+def historical_summary(crop, state, start_year=None, end_year=None):
+    """Aggregates for a UI crop name and state, or None without history"""
+    history = load_history_store()
+    if history is None:
+        return None
+    return history.summary(state, CROP_MAPPING.get(crop, crop), start_year, end_year)
+
+def historical_context(state, item, yield_per_hectare):
+    """How a predicted yield compares with the recorded years for the same state and crop"""
+    history = load_history_store()
+    summary = history.summary(state, item) if history is not None else None
+    if summary is None:
+        return None
+    return {
+        'start_year': summary['start_year'],
+        'end_year': summary['end_year'],
+        'mean': summary['mean'],
+        'latest': summary['latest'],
+        'percentiles': summary['percentiles'],
+        'trend_per_year': summary['trend_per_year'],
+        'prediction_percentile': history.percentile_rank(state, item, yield_per_hectare),
+        'vs_mean_percent': round((yield_per_hectare - summary['mean']) / summary['mean'] * 100, 1) if summary['mean'] else None,
+    }
+
+def model_version():
+    return load_models().version
+
+def model_status():
+    model = load_models() if _compiled.loaded else None
+    return {
+        'ready': model is not None,
+        'version': model.version if model is not None else None,
+        'memory_mapped': model.memory_mapped if model is not None else False,
+        'release': _compiled.status(),
+        'history_release': _history.status(),
+        'prediction_cache': prediction_cache_stats(),
+        'rank_cache': rank_cache_stats(),
+    }
+
+def estimate_pesticides(total_nutrients):
+    """Pesticide input estimated from total N + P + K (works on scalars and arrays)"""
+    return total_nutrients / 10
+
+def build_recommendations(rainfall, temperature, humidity, ph, total_nutrients, total_yield):
+    """
+    Recommendation messages for many rows at once.
+    Every argument is an array with one entry per row; NaN humidity/pH skip their rule.
+    
+    Returns:
+        list: one list of messages per row
+    """
+    rainfall, temperature, humidity, ph, total_nutrients = (
+        np.asarray(c, dtype=float) for c in (rainfall, temperature, humidity, ph, total_nutrients)
+    )
+    columns = [
+        np.select(
+            [rainfall < 600, rainfall > 2000],
+            ['💧 Low rainfall detected - ensure adequate irrigation',
+             '🌊 High rainfall - ensure proper drainage to prevent waterlogging'],
+            '✅ Rainfall levels are optimal for crop growth'
+        ),
+        np.select(
+            [temperature < 15, temperature > 35],
+            ['❄️ Low temperature - consider protective measures',
+             '🌡️ High temperature - ensure adequate water supply'],
+            '🌡️ Temperature is ideal for crop cultivation'
+        ),
+        np.select(
+            [np.isnan(humidity), humidity < 40, humidity > 80],
+            ['', '🌵 Low humidity - increase irrigation frequency',
+             '💨 High humidity - monitor for fungal diseases'],
+            '✅ Humidity levels are good'
+        ),
+        np.select(
+            [np.isnan(ph), (ph < 5.5) | (ph > 8.0)],
+            ['', '🧪 Soil pH not optimal - consider soil amendment'],
+            '🌿 Soil pH is within acceptable range'
+        ),
+        np.select(
+            [total_nutrients < 100, total_nutrients > 300],
+            ['🧪 Low nutrient levels - apply balanced fertilizers',
+             '✅ Nutrient levels are good - maintain current fertilization'],
+            '📊 Moderate nutrient levels - consider supplemental fertilization'
+        ),
+    ]
+    production = [f'📈 Expected total production: {round(t, 2)} quintals' for t in np.asarray(total_yield).tolist()]
     
-    return _models['dtr'], _models['preprocesser']
+    return [
+        [msg for msg in row if msg] + [last]
+        for row, last in zip(zip(*(c.tolist() for c in columns)), production)
+    ]
+
+def model_features(rainfall, temperature, pesticides):
+    """
+    Year, rainfall, pesticides, temperature feature columns as every path feeds
+    them to the model. Arguments may be scalars or arrays; returns an (n, 4) float array.
+    """
+    rainfall, temperature, pesticides = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (rainfall, temperature, pesticides))
+    )
+    return np.column_stack([
+        np.full(rainfall.size, DEFAULT_YEAR, dtype=float),
+        rainfall.ravel(),
+        pesticides.ravel(),
+        temperature.ravel(),
+    ])
+
+def _predict_cached(state, item, rainfall, temperature, pesticides):
+    """
+    Model output (hg/ha), memoized per input rounded to the CACHE_*_STEP grid:
+    a miss predicts from the exact inputs, a hit returns the prediction made for
+    the first request in the same rounding cell.
+    The model version is part of the key, so a newly loaded model never serves old numbers.
+    
+    Returns:
+        tuple: (prediction, whether it came from the cache)
+    """
+    model = load_models()
+    key = (
+        model.version, state, item,
+        quantize(rainfall, CACHE_RAINFALL_STEP),
+        quantize(temperature, CACHE_TEMPERATURE_STEP),
+        quantize(pesticides, CACHE_PESTICIDES_STEP),
+    )
+    
+    predicted = _prediction_cache.get(key)
+    if predicted is not None:
+        return predicted, True
+    
+    # Features: Year, rainfall, pesticides, temperature, Area (state), Item (crop)
+    predicted = model.predict_one(DEFAULT_YEAR, rainfall, pesticides, temperature, state, item)
+    _prediction_cache.set(key, predicted)
+    return predicted, False
 
 def predict_yield(crop, state, rainfall, temperature, humidity, ph, nitrogen, phosphorus, potassium, area):
     """
@@ -30,81 +236,280 @@ def predict_yield(crop, state, rainfall, temperature, humidity, ph, nitrogen, ph
         dict: {
             'yield': float (quintals per hectare),
             'total_yield': float (total quintals),
-            'recommendations': list
+            'recommendations': list,
+            'cached': bool (model output came from the prediction cache),
+            'historical': dict or None (recorded yields for this state and crop)
         }
     """
-    dtr, preprocesser = load_models()
-    
-    # Map crop names to dataset format
-    crop_mapping = {
-        'Rice': 'Rice, paddy',
-        'Wheat': 'Wheat',
-        'Cotton': 'Cotton',
-        'Sugarcane': 'Sugar cane',
-        'Maize': 'Maize',
-        'Soybean': 'Soybeans',
-        'Potato': 'Potatoes',
-        'Tomato': 'Tomatoes'
+    mapped_crop = CROP_MAPPING.get(crop, crop)
+    pesticides = estimate_pesticides(nitrogen + phosphorus + potassium)
+    predicted_yield_hg, cached = _predict_cached(state, mapped_crop, rainfall, temperature, pesticides)
+    
+    # Convert from hg/ha to quintals/ha (1 quintal = 100 kg, 1 hg = 0.1 kg)
+    yield_per_hectare = predicted_yield_hg / 10
+    total_yield = yield_per_hectare * area
+    
+    recommendations = build_recommendations(
+        [rainfall], [temperature], [humidity], [ph],
+        [nitrogen + phosphorus + potassium], [total_yield]
+    )[0]
+    
+    return {
+        'yield': round(yield_per_hectare, 2),
+        'total_yield': round(total_yield, 2),
+        'recommendations': recommendations,
+        'cached': cached,
+        'historical': historical_context(state, mapped_crop, yield_per_hectare)
     }
+
+def _float_column(values):
+    """Column of floats; unparseable entries become NaN and are flagged"""
+    try:
+        column = np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        column = np.empty(len(values))
+        for i, v in enumerate(values):
+            try:
+                column[i] = float(v)
+            except (TypeError, ValueError):
+                column[i] = np.nan
+    return column
+
+def predict_yield_batch(rows):
+    """
+    Predict yield for many plots in one vectorized pass.
     
-    mapped_crop = crop_mapping.get(crop, crop)
+    Args:
+        rows: list of dicts with the BATCH_FIELDS keys (values may be strings, e.g. from CSV)
     
-    # Use 2020 as default year and calculate pesticides estimate
-    year = 2020
-    pesticides = (nitrogen + phosphorus + potassium) / 10
+    Returns:
+        dict: {'results': [...], 'summary': {...}}. Invalid rows get an 'error'
+        entry instead of a prediction; they never fail the whole batch.
+    """
+    model = load_models()
+    n = len(rows)
+    errors = [None] * n
     
-    # Prepare features: Year, rainfall, pesticides, temperature, Area (state), Item (crop)
-    features = np.array([[year, rainfall, pesticides, temperature, state, mapped_crop]], dtype=object)
+    crops = [CROP_MAPPING.get(r.get('crop'), r.get('crop')) for r in rows]
+    states = [r.get('state') for r in rows]
+    numeric = {
+        field: _float_column([r.get(field) for r in rows])
+        for field in BATCH_FIELDS if field not in ('crop', 'state')
+    }
     
-    # Transform and predict
-    transformed_features = preprocesser.transform(features)
-    predicted_yield_hg = dtr.predict(transformed_features)[0]
+    for field, column in numeric.items():
+        if field in OPTIONAL_FIELDS:
+            continue
+        for i in np.flatnonzero(np.isnan(column)).tolist():
+            errors[i] = errors[i] or f"Invalid or missing '{field}'"
+    known_states, known_crops = model.columns
+    for i in range(n):
+        if errors[i] is None and states[i] not in known_states:
+            errors[i] = f"Unknown state '{states[i]}'"
+        elif errors[i] is None and crops[i] not in known_crops:
+            errors[i] = f"Unknown crop '{rows[i].get('crop')}'"
     
-    # Convert from hg/ha to quintals/ha (1 quintal = 100 kg, 1 hg = 0.1 kg)
-    yield_per_hectare = predicted_yield_hg / 10
-    total_yield = yield_per_hectare * area
+    valid = np.array([e is None for e in errors], dtype=bool)
+    idx = np.flatnonzero(valid)
+    results = [{'row': i, 'error': errors[i]} for i in range(n)]
     
-    # Generate recommendations
-    recommendations = []
+    if idx.size:
+        col = {field: column[idx] for field, column in numeric.items()}
+        nutrients = col['nitrogen'] + col['phosphorus'] + col['potassium']
+        features = model_features(col['rainfall'], col['temperature'], estimate_pesticides(nutrients))
+        predicted_hg = model.predict(
+            features, [states[i] for i in idx.tolist()], [crops[i] for i in idx.tolist()]
+        )
+        
+        yield_per_hectare = predicted_hg / 10
+        total_yield = yield_per_hectare * col['area']
+        recommendations = build_recommendations(
+            col['rainfall'], col['temperature'], col['humidity'], col['ph'], nutrients, total_yield
+        )
+        
+        for j, (i, y, t) in enumerate(zip(idx.tolist(), yield_per_hectare.tolist(), total_yield.tolist())):
+            results[i] = {
+                'row': i,
+                'crop': rows[i].get('crop'),
+                'state': states[i],
+                'yield': round(y, 2),
+                'total_yield': round(t, 2),
+                'recommendations': recommendations[j],
+            }
     
-    if rainfall < 600:
-        recommendations.append('💧 Low rainfall detected - ensure adequate irrigation')
-    elif rainfall > 2000:
-        recommendations.append('🌊 High rainfall - ensure proper drainage to prevent waterlogging')
+    predicted = int(idx.size)
+    total = float(total_yield.sum()) if predicted else 0.0
+    return {
+        'results': results,
+        'summary': {
+            'rows': n,
+            'predicted': predicted,
+            'failed': n - predicted,
+            'total_yield': round(total, 2),
+            'mean_yield': round(float(yield_per_hectare.mean()), 2) if predicted else None,
+        }
+    }
+
+def sweep_axis(name, spec):
+    """Grid values for one axis from a number, a list of numbers or {'min', 'max', 'steps'}"""
+    if isinstance(spec, dict):
+        steps = int(spec.get('steps', 10))
+        if not 1 <= steps <= YIELD_SWEEP_MAX_POINTS:
+            raise ValueError(f"'{name}' steps must be between 1 and {YIELD_SWEEP_MAX_POINTS}")
+        values = np.linspace(float(spec['min']), float(spec['max']), steps)
+    elif isinstance(spec, (list, tuple)):
+        values = np.array(spec, dtype=float)
     else:
-        recommendations.append('✅ Rainfall levels are optimal for crop growth')
+        values = np.array([float(spec)])
+    if values.size == 0 or not np.isfinite(values).all():
+        raise ValueError(f"'{name}' needs at least one finite value")
+    return values
+
+def sweep_scenarios(crop, state, rainfall, temperature, npk, area=1.0):
+    """
+    Evaluate a rainfall x temperature x NPK grid in one batched model call.
     
-    if temperature < 15:
-        recommendations.append('❄️ Low temperature - consider protective measures')
-    elif temperature > 35:
-        recommendations.append('🌡️ High temperature - ensure adequate water supply')
-    else:
-        recommendations.append('🌡️ Temperature is ideal for crop cultivation')
+    Args:
+        rainfall, temperature, npk: axis specs for sweep_axis; npk is total N + P + K,
+            the only form in which nutrients reach the model
+        area: hectares, for total production
     
-    if humidity < 40:
-        recommendations.append('🌵 Low humidity - increase irrigation frequency')
-    elif humidity > 80:
-        recommendations.append('💨 High humidity - monitor for fungal diseases')
-    else:
-        recommendations.append('✅ Humidity levels are good')
+    Returns:
+        dict: axes, the yield surface (quintals/ha, indexed [rainfall][temperature][npk]),
+        best and worst inputs, and per-axis sensitivity (mean yield at each axis value)
+    """
+    started = time.perf_counter()
+    model = load_models()
+    mapped_crop = CROP_MAPPING.get(crop, crop)
+    known_states, known_crops = model.columns
+    if state not in known_states:
+        raise ValueError(f"Unknown state '{state}'")
+    if mapped_crop not in known_crops:
+        raise ValueError(f"Unknown crop '{crop}'")
+    axes = {
+        name: sweep_axis(name, spec)
+        for name, spec in zip(SWEEP_AXES, (rainfall, temperature, npk))
+    }
+    shape = tuple(len(values) for values in axes.values())
+    points = int(np.prod(shape))
+    if points > YIELD_SWEEP_MAX_POINTS:
+        raise ValueError(f'Scenario grid has {points} points, the limit is {YIELD_SWEEP_MAX_POINTS}')
     
-    if ph < 5.5 or ph > 8.0:
-        recommendations.append('🧪 Soil pH not optimal - consider soil amendment')
-    else:
-        recommendations.append('🌿 Soil pH is within acceptable range')
+    grid_rainfall, grid_temperature, grid_npk = (
+        g.ravel() for g in np.meshgrid(*axes.values(), indexing='ij')
+    )
+    features = model_features(grid_rainfall, grid_temperature, estimate_pesticides(grid_npk))
+    predicted_hg = model.predict(features, [state] * points, [mapped_crop] * points)
+    surface = (predicted_hg / 10).reshape(shape)
     
-    total_nutrients = nitrogen + phosphorus + potassium
-    if total_nutrients < 100:
-        recommendations.append('🧪 Low nutrient levels - apply balanced fertilizers')
-    elif total_nutrients > 300:
-        recommendations.append('✅ Nutrient levels are good - maintain current fertilization')
-    else:
-        recommendations.append('📊 Moderate nutrient levels - consider supplemental fertilization')
+    def scenario(flat_index):
+        index = np.unravel_index(flat_index, shape)
+        y = float(surface[index])
+        inputs = {name: float(axes[name][i]) for name, i in zip(SWEEP_AXES, index)}
+        return dict(inputs, **{'yield': round(y, 2), 'total_yield': round(y * area, 2)})
     
-    recommendations.append(f'📈 Expected total production: {round(total_yield, 2)} quintals')
+    sensitivity = {}
+    for axis, name in enumerate(SWEEP_AXES):
+        others = tuple(a for a in range(len(SWEEP_AXES)) if a != axis)
+        marginal = surface.mean(axis=others)
+        sensitivity[name] = {
+            'mean_yield': np.round(marginal, 2).tolist(),
+            'range': round(float(marginal.max() - marginal.min()), 2),
+        }
     
     return {
-        'yield': round(yield_per_hectare, 2),
-        'total_yield': round(total_yield, 2),
-        'recommendations': recommendations
+        'crop': crop,
+        'state': state,
+        'area': area,
+        'axes': {name: values.tolist() for name, values in axes.items()},
+        'shape': list(shape),
+        'surface': np.round(surface, 2).tolist(),
+        'best': scenario(int(surface.argmax())),
+        'worst': scenario(int(surface.argmin())),
+        'sensitivity': sensitivity,
+        'points': points,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
     }
+
+def quantize(value, step):
+    """Snap value to the nearest multiple of step (step <= 0 leaves it unchanged)"""
+    if step <= 0:
+        return float(value)
+    return round(round(float(value) / step) * step, 6)
+
+def candidate_crops(model):
+    """
+    Every crop worth ranking: the UI's CROP_MAPPING plus the items the model was trained on.
+    
+    Returns:
+        tuple: ([(display name, dataset item), ...] the model supports, [unsupported names])
+    """
+    names = {}
+    for name, item in CROP_MAPPING.items():
+        names.setdefault(item, name)
+    for item in model.categories[1]:
+        names.setdefault(item, item)
+    known = model.columns[1]
+    supported = [(name, item) for item, name in names.items() if item in known]
+    unsupported = [name for item, name in names.items() if item not in known]
+    return supported, unsupported
+
+def rank_crops(state, rainfall, temperature, nitrogen, phosphorus, potassium, area=1.0):
+    """
+    Rank every supported crop for one state and set of conditions in a single batched prediction.
+    Rainfall, temperature and total NPK are snapped to RANK_*_STEP buckets first, so
+    the ranking is exact for the bucket and can be cached per bucket.
+    
+    Returns:
+        dict: bucketed inputs, 'ranking' sorted by expected total yield, 'unsupported'
+        crops the model has no data for, and whether the ranking came from cache
+    """
+    model = load_models()
+    inputs = {
+        'rainfall': quantize(rainfall, RANK_RAINFALL_STEP),
+        'temperature': quantize(temperature, RANK_TEMPERATURE_STEP),
+        'npk': quantize(nitrogen + phosphorus + potassium, RANK_NPK_STEP),
+    }
+    key = (model.version, state, inputs['rainfall'], inputs['temperature'], inputs['npk'])
+    
+    ranked = _rank_cache.get(key)
+    cached = ranked is not None
+    if not cached:
+        if state not in model.columns[0]:
+            raise ValueError(f"Unknown state '{state}'")
+        crops, unsupported = candidate_crops(model)
+        row = model_features(inputs['rainfall'], inputs['temperature'], estimate_pesticides(inputs['npk']))
+        predicted = model.predict(
+            np.tile(row, (len(crops), 1)), [state] * len(crops), [item for _, item in crops]
+        ) / 10
+        order = np.argsort(-predicted, kind='stable')
+        ranked = (
+            tuple((crops[i][0], crops[i][1], float(predicted[i])) for i in order.tolist()),
+            tuple(unsupported),
+        )
+        _rank_cache.set(key, ranked)
+    
+    ranking, unsupported = ranked
+    return {
+        'state': state,
+        'inputs': inputs,
+        'area': area,
+        'ranking': [
+            {
+                'rank': position,
+                'crop': name,
+                'item': item,
+                'yield': round(y, 2),
+                'total_yield': round(y * area, 2),
+            }
+            for position, (name, item, y) in enumerate(ranking, start=1)
+        ],
+        'unsupported': list(unsupported),
+        'cached': cached,
+    }
+
+def rank_cache_stats():
+    return _rank_cache.stats()
+
+def prediction_cache_stats():
+    return _prediction_cache.stats()
@@ -0,0 +1,193 @@
+"""
+Disease model benchmark
+Times each stage of app/ml_predict (decode, resize, enhance, forward pass,
+postprocess) at several batch sizes, then end-to-end throughput at several
+thread counts. Prints (or writes) a JSON report.
+
+    python -m benchmarks.bench_disease --images path/to/leaves --out bench_disease.json
+"""
+import argparse
+import io
+import json
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.common import summarize, timed, peak_rss_mb, environment, write_report
+from app import ml_predict
+from app.ml_backends import create_backend
+from app.ml_preprocess import open_image, enhance_image, get_buffer, INV_255
+
+
+def synthetic_images(count, width, height, seed=0):
+    """JPEG bytes of random leaf-coloured noise at phone-photo resolution"""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        base = rng.integers(0, 256, size=(height // 8, width // 8, 3), dtype=np.uint8)
+        base[..., 1] = np.maximum(base[..., 1], 96)  # greenish
+        img = Image.fromarray(base).resize((width, height), Image.BILINEAR)
+        buf = io.BytesIO()
+        img.save(buf, 'JPEG', quality=90)
+        images.append(buf.getvalue())
+    return images
+
+
+# Class names of the default model files the benchmark loads (not a registry release)
+_class_names = []
+
+
+def load_backend(name):
+    """Backend for the forward-pass stage, or None if the model cannot be loaded"""
+    if name == 'none':
+        return None
+    try:
+        backend = create_backend(name, ml_predict.model_path_for(name))
+        with open(ml_predict.CLASSES_PATH, 'r') as f:
+            _class_names[:] = json.load(f)
+        return backend
+    except Exception as e:
+        print(f"Forward pass skipped, {name} model unavailable: {e}")
+        return None
+
+
+def run_pipeline(payloads, backend, enhance, stage_ms=None):
+    """One batch through every stage; per-stage milliseconds are appended to stage_ms"""
+    size = ml_predict.IMG_SIZE
+    n = len(payloads)
+    buffer = get_buffer(n, size)
+    batch = buffer.data[:n]
+    times = {'decode': 0.0, 'resize': 0.0, 'enhance': 0.0, 'forward': 0.0, 'postprocess': 0.0}
+
+    for i, payload in enumerate(payloads):
+        # Full-resolution decode when enhancing, as app/ml_preprocess.decode_into does
+        img, ms = timed(open_image, io.BytesIO(payload), size, draft=not enhance)
+        times['decode'] += ms
+        if enhance:
+            img, ms = timed(enhance_image, img)
+            times['enhance'] += ms
+        started = time.perf_counter()
+        np.multiply(np.asarray(img.resize((size, size))), INV_255, out=batch[i], casting='unsafe')
+        times['resize'] += (time.perf_counter() - started) * 1000
+
+    if backend is not None:
+        probabilities, times['forward'] = timed(backend.predict, batch)
+        started = time.perf_counter()
+        for row in probabilities:
+            ml_predict.format_prediction(row, _class_names)
+        times['postprocess'] = (time.perf_counter() - started) * 1000
+
+    if stage_ms is not None:
+        for stage, ms in times.items():
+            stage_ms.setdefault(stage, []).append(ms)
+    return sum(times.values())
+
+
+def bench_stages(payloads, backend, batch_sizes, iterations, enhance):
+    results = {}
+    for batch_size in batch_sizes:
+        batch = (payloads * (batch_size // len(payloads) + 1))[:batch_size]
+        run_pipeline(batch, backend, enhance)  # warm-up
+        stage_ms, total_ms = {}, []
+        for _ in range(iterations):
+            total_ms.append(run_pipeline(batch, backend, enhance, stage_ms))
+        results[str(batch_size)] = {
+            'stages': {stage: summarize(ms) for stage, ms in stage_ms.items()},
+            'batch': summarize(total_ms),
+            'per_image_mean_ms': round(float(np.mean(total_ms)) / batch_size, 4),
+        }
+    return results
+
+
+def bench_threads(payloads, backend, thread_counts, batch_size, duration, enhance):
+    results = []
+    batch = (payloads * (batch_size // len(payloads) + 1))[:batch_size]
+    for threads in thread_counts:
+        latencies = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                run_pipeline(batch, backend, enhance)
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+
+        began = time.perf_counter()
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        wall = time.perf_counter() - began
+        results.append({
+            'threads': threads,
+            'batch_size': batch_size,
+            'batches': len(latencies),
+            'throughput_images_per_s': round(len(latencies) * batch_size / wall, 2),
+            'latency': summarize(latencies),
+        })
+    return results
+
+
+def parse_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help="Directory of sample leaf images (default: synthetic only)")
+    parser.add_argument('--limit', type=int, default=32)
+    parser.add_argument('--synthetic', type=int, default=8, help="Number of synthetic images")
+    parser.add_argument('--synthetic-size', default='1600x1200', help="WIDTHxHEIGHT of synthetic images")
+    parser.add_argument('--backend', default=ml_predict.BACKEND, choices=['keras', 'tflite', 'none'])
+    parser.add_argument('--batch-sizes', type=parse_list, default=[1, 4, 8, 16])
+    parser.add_argument('--threads', type=parse_list, default=[1, 2, 4])
+    parser.add_argument('--thread-batch-size', type=int, default=1)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per thread-count run")
+    parser.add_argument('--no-enhance', action='store_true')
+    parser.add_argument('--out', help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.synthetic_size.lower().split('x'))
+    sets = {}
+    if args.synthetic:
+        sets['synthetic'] = synthetic_images(args.synthetic, width, height)
+    if args.images:
+        paths = ml_predict.list_sample_images(args.images, args.limit)
+        sets['sample'] = [p.read_bytes() for p in paths]
+
+    backend, load_ms = timed(load_backend, args.backend)
+
+    enhance = not args.no_enhance
+    report = {
+        'benchmark': 'disease',
+        'environment': environment(),
+        'config': {
+            'backend': args.backend if backend is not None else 'none',
+            'model_load_ms': round(load_ms, 2),
+            'enhance': enhance,
+            'image_size': ml_predict.IMG_SIZE,
+            'iterations': args.iterations,
+        },
+        'image_sets': {},
+    }
+    for name, payloads in sets.items():
+        if not payloads:
+            continue
+        report['image_sets'][name] = {
+            'images': len(payloads),
+            'batch_sizes': bench_stages(payloads, backend, args.batch_sizes, args.iterations, enhance),
+            'threads': bench_threads(payloads, backend, args.threads, args.thread_batch_size, args.duration, enhance),
+        }
+    report['peak_rss_mb'] = peak_rss_mb()
+    write_report(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
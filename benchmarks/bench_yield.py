@@ -0,0 +1,364 @@
+"""
+Yield prediction benchmark
+Times each stage of app/yield_predict (unpickling the sklearn models versus
+memory-mapping the compiled artifact, ColumnTransformer.transform, tree predict,
+recommendation generation and end-to-end predict_yield / predict_yield_batch)
+at several batch sizes. With --load, it drives POST /predict-yield/ at several
+concurrency levels and reports throughput and tail latency. Prints (or writes)
+a JSON report.
+
+    python -m benchmarks.bench_yield --out bench_yield.json
+    python -m benchmarks.bench_yield --skip-stages --load client --concurrency 1,4,16
+    python -m benchmarks.bench_yield --skip-stages --load gunicorn --concurrency 1,8,32
+    python -m benchmarks.bench_yield --skip-stages --load http://127.0.0.1:8000 --sessionid <cookie>
+
+Load mode `client` runs the view in this process with Django's test client (one per
+thread); `gunicorn` starts `gunicorn ec.wsgi` with gunicorn_config.py on a free port;
+a URL targets a server that is already running. Requests are made as a benchmark
+user created in the configured database unless --sessionid is given.
+"""
+import argparse
+import http.client
+import os
+import pickle
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from benchmarks.common import REPO_ROOT, summarize, timed, peak_rss_mb, environment, write_report
+from app import ml_registry, yield_predict
+from app.yield_compiled import load_artifact, read_dataset
+
+BENCH_USERNAME = 'bench-yield'
+
+
+def sample_inputs(dataset, count, seed=0):
+    """
+    `count` plots drawn from yield_df.csv: raw model rows for the sklearn path and
+    predict_yield_batch dicts (NPK chosen so the pesticide estimate matches the row)
+    """
+    numeric, areas, items = read_dataset(dataset)
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(areas), size=count)
+    numeric = numeric[picks]
+    areas = [areas[i] for i in picks.tolist()]
+    items = [items[i] for i in picks.tolist()]
+    npk = numeric[:, 2] * 10
+    rows = [
+        {
+            'crop': item, 'state': area, 'rainfall': rainfall, 'temperature': temperature,
+            'humidity': float(h), 'ph': float(ph),
+            'nitrogen': n / 2, 'phosphorus': n / 4, 'potassium': n / 4, 'area': float(a),
+        }
+        for item, area, rainfall, temperature, n, h, ph, a in zip(
+            items, areas, numeric[:, 1].tolist(), numeric[:, 3].tolist(), npk.tolist(),
+            rng.uniform(30, 90, count), rng.uniform(5, 8, count), rng.uniform(0.5, 20, count),
+        )
+    ]
+    return numeric, areas, items, rows
+
+
+def bench_load(iterations):
+    """Cold-start costs: unpickling the sklearn models versus opening the compiled artifact"""
+    blobs = {}
+    for name in ('dtr.pkl', 'preprocesser.pkl'):
+        with open(os.path.join(yield_predict.ML_MODELS_DIR, name), 'rb') as f:
+            blobs[name] = f.read()
+    artifact = ml_registry.active_path('yield') or yield_predict.YIELD_MODEL_DIR
+
+    results = {}
+    for name, blob in blobs.items():
+        # The first load also pays for importing the sklearn modules it references
+        _, first_ms = timed(pickle.loads, blob)
+        results[name] = {
+            'bytes': len(blob),
+            'first_unpickle_ms': round(first_ms, 4),
+            'unpickle': summarize([timed(pickle.loads, blob)[1] for _ in range(iterations)]),
+        }
+    results['artifact'] = {
+        'path': artifact,
+        'mmap': summarize([timed(load_artifact, artifact)[1] for _ in range(iterations)]),
+        'read': summarize([timed(load_artifact, artifact, mmap=False)[1] for _ in range(iterations)]),
+    }
+    return results
+
+
+def bench_stages(inputs, batch_sizes, iterations):
+    numeric, areas, items, rows = inputs
+    dtr, preprocesser = yield_predict.load_sklearn_models()
+    compiled = yield_predict.load_models()
+    results = {}
+
+    for batch_size in batch_sizes:
+        raw = np.empty((batch_size, 6), dtype=object)
+        raw[:, :4] = numeric[:batch_size]
+        raw[:, 4] = areas[:batch_size]
+        raw[:, 5] = items[:batch_size]
+        batch_numeric, batch_areas, batch_items = numeric[:batch_size], areas[:batch_size], items[:batch_size]
+        batch_rows = rows[:batch_size]
+        X = preprocesser.transform(raw)
+        X_compiled = compiled.transform(batch_numeric, batch_areas, batch_items)
+        rainfall = np.array([r['rainfall'] for r in batch_rows])
+        temperature = np.array([r['temperature'] for r in batch_rows])
+        humidity = np.array([r['humidity'] for r in batch_rows])
+        ph = np.array([r['ph'] for r in batch_rows])
+        nutrients = batch_numeric[:, 2] * 10
+        total = compiled.predict_features(X_compiled) / 10
+
+        stages = {
+            'sklearn_transform': lambda: preprocesser.transform(raw),
+            'sklearn_predict': lambda: dtr.predict(X),
+            'compiled_transform': lambda: compiled.transform(batch_numeric, batch_areas, batch_items),
+            'compiled_predict': lambda: compiled.predict_features(X_compiled),
+            'recommendations': lambda: yield_predict.build_recommendations(
+                rainfall, temperature, humidity, ph, nutrients, total
+            ),
+        }
+        if batch_size == 1:
+            row = batch_rows[0]
+            args = [row[field] for field in yield_predict.BATCH_FIELDS]
+            stages['compiled_predict_one'] = lambda: compiled.predict_one(*batch_numeric[0].tolist(), areas[0], items[0])
+            stages['predict_yield_cached'] = lambda: yield_predict.predict_yield(*args)
+
+            def uncached():
+                yield_predict._prediction_cache.clear()
+                return yield_predict.predict_yield(*args)
+            stages['predict_yield_uncached'] = uncached
+        else:
+            stages['predict_yield_batch'] = lambda: yield_predict.predict_yield_batch(batch_rows)
+
+        timings = {}
+        for name, fn in stages.items():
+            fn()  # warm-up
+            timings[name] = summarize([timed(fn)[1] for _ in range(iterations)])
+        results[str(batch_size)] = {
+            'stages': timings,
+            'per_row_mean_ms': {name: round(t['mean_ms'] / batch_size, 5) for name, t in timings.items()},
+        }
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Load mode
+# ---------------------------------------------------------------------------
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ec.settings')
+    import django
+    django.setup()
+
+
+def bench_user_client():
+    """Django test client logged in as the benchmark user"""
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    user, _ = get_user_model().objects.get_or_create(username=BENCH_USERNAME)
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(user)
+    return client
+
+
+class ClientTarget:
+    """POSTs through Django's test client; each thread gets its own logged-in client"""
+    name = 'client'
+
+    def __init__(self):
+        _setup_django()
+        self._local = threading.local()
+        self._session = bench_user_client().cookies['sessionid'].value
+
+    def post(self, form):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            from django.test import Client
+            client = self._local.client = Client(HTTP_HOST='localhost')
+            client.cookies['sessionid'] = self._session
+        response = client.post('/predict-yield/', form)
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class HTTPTarget:
+    """POSTs to a running server over one keep-alive connection per thread"""
+
+    def __init__(self, url, sessionid=None):
+        parts = urlsplit(url)
+        self.name = url
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.path = parts.path.rstrip('/') + '/predict-yield/'
+        if sessionid is None:
+            _setup_django()
+            sessionid = bench_user_client().cookies['sessionid'].value
+        # Any well-formed secret passes the CSRF check when cookie and header agree
+        csrf = secrets.token_hex(16)
+        self.headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Cookie': f'sessionid={sessionid}; csrftoken={csrf}',
+            'X-CSRFToken': csrf,
+        }
+        self._local = threading.local()
+
+    def post(self, form):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            connection.request('POST', self.path, body=urlencode(form), headers=self.headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            raise
+
+    def close(self):
+        pass
+
+
+class GunicornTarget(HTTPTarget):
+    """Starts `gunicorn ec.wsgi` (gunicorn_config.py) on a free local port for the run"""
+
+    def __init__(self, sessionid=None, startup_timeout=60):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'ec.wsgi', '-c', 'gunicorn_config.py', '-b', f'127.0.0.1:{port}'],
+            cwd=REPO_ROOT,
+        )
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.process.kill()
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.2)
+        super().__init__(f'http://127.0.0.1:{port}', sessionid)
+        self.name = 'gunicorn'
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+
+
+def make_target(spec, sessionid=None):
+    if spec == 'client':
+        return ClientTarget()
+    if spec == 'gunicorn':
+        return GunicornTarget(sessionid)
+    return HTTPTarget(spec, sessionid)
+
+
+def bench_concurrency(target, rows, levels, duration, warmup):
+    """Closed loop: each of `threads` clients sends its next request as soon as the last one returns"""
+    forms = [{k: str(v) for k, v in row.items()} for row in rows]
+    for form in forms[:warmup]:
+        target.post(form)
+
+    results = []
+    for threads in levels:
+        latencies, statuses, errors = [], {}, []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def worker(offset):
+            i = offset
+            while time.perf_counter() < deadline:
+                form = forms[i % len(forms)]
+                i += threads
+                started = time.perf_counter()
+                try:
+                    status = target.post(form)
+                except Exception as e:
+                    with lock:
+                        errors.append(repr(e))
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        began = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        wall = time.perf_counter() - began
+        results.append({
+            'threads': threads,
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / wall, 2),
+            'statuses': {str(k): v for k, v in sorted(statuses.items())},
+            'errors': len(errors),
+            'first_error': errors[0] if errors else None,
+            'latency': summarize(latencies),
+        })
+    return results
+
+
+def parse_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', default=os.path.join(REPO_ROOT, 'yield_df.csv'))
+    parser.add_argument('--batch-sizes', type=parse_list, default=[1, 16, 256, 4096])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--load-iterations', type=int, default=5, help="Repeats of the cold-start timings")
+    parser.add_argument('--skip-stages', action='store_true', help="Only run the load mode")
+    parser.add_argument('--load', help="client, gunicorn or the base URL of a running server")
+    parser.add_argument('--sessionid', help="Session cookie for --load URL (default: create a benchmark user)")
+    parser.add_argument('--concurrency', type=parse_list, default=[1, 2, 4, 8])
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per concurrency level")
+    parser.add_argument('--unique-inputs', type=int, default=1000,
+                        help="Distinct plots cycled through in load mode (1: every request is a cache hit)")
+    parser.add_argument('--warmup', type=int, default=20, help="Requests sent before measuring")
+    parser.add_argument('--out', help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    inputs = sample_inputs(args.dataset, max(max(args.batch_sizes), args.unique_inputs))
+    report = {
+        'benchmark': 'yield',
+        'environment': environment(),
+        'config': {
+            'model_version': yield_predict.model_version(),
+            'nodes': yield_predict.load_models().node_count,
+            'iterations': args.iterations,
+        },
+    }
+    if not args.skip_stages:
+        report['cold_start'] = bench_load(args.load_iterations)
+        report['batch_sizes'] = bench_stages(inputs, args.batch_sizes, args.iterations)
+    if args.load:
+        target = make_target(args.load, args.sessionid)
+        try:
+            report['load'] = {
+                'target': target.name,
+                'unique_inputs': args.unique_inputs,
+                'duration_seconds': args.duration,
+                'levels': bench_concurrency(
+                    target, inputs[3][:args.unique_inputs], args.concurrency, args.duration, args.warmup
+                ),
+            }
+        finally:
+            target.close()
+    report['peak_rss_mb'] = peak_rss_mb()
+    write_report(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Shared helpers for the benchmark scripts
+Latency percentiles, peak RSS and JSON report output
+"""
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Benchmarks run from the repo root: python -m benchmarks.<name>
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def summarize(samples_ms):
+    """p50/p95/p99/mean/min/max of a list of millisecond samples"""
+    if not len(samples_ms):
+        return {'count': 0}
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        'count': int(arr.size),
+        'mean_ms': round(float(arr.mean()), 4),
+        'p50_ms': round(float(np.percentile(arr, 50)), 4),
+        'p95_ms': round(float(np.percentile(arr, 95)), 4),
+        'p99_ms': round(float(np.percentile(arr, 99)), 4),
+        'min_ms': round(float(arr.min()), 4),
+        'max_ms': round(float(arr.max()), 4),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """Call fn and return (result, elapsed milliseconds)"""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+    }
+
+
+def write_report(report, path=None):
+    """Print the JSON report, or write it to `path`"""
+    text = json.dumps(report, indent=2, default=str)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+        print(f"Benchmark report written to {path}")
+    else:
+        print(text)
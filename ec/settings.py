@@ -181,6 +181,10 @@ CLOUDINARY_STORAGE = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Uploads up to this size stay in memory and are decoded from the buffer;
+# larger ones are spilled by Django to a uniquely named temp file.
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', 10 * 1024 * 1024))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -219,6 +223,14 @@ DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:Kalpesh12345@#$%
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY", "")
 
+# ========================
+# SOIL REPORT OCR
+# ========================
+# Empty: tesseract from PATH or its usual install locations (see app/ocr_engines.py)
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "")
+# auto, tesserocr, cli or fake
+SOIL_OCR_ENGINE = os.getenv("SOIL_OCR_ENGINE", "auto")
+
 # ========================
 # LOGGING CONFIGURATION
 # ========================
@@ -1,5 +1,17 @@
 timeout = 300
 graceful_timeout = 300
 workers = 1
-worker_class = 'sync'
+# Threads keep the web worker responsive while requests wait on the ML worker pool
+worker_class = 'gthread'
+threads = 8
 preload_app = True
+
+
+def post_worker_init(worker):
+    # Spawn (and warm) the ML worker pool per web worker, after the preload fork:
+    # executor threads do not survive fork, and readiness waits for the warm-up.
+    # Job dispatchers start too, picking up jobs queued before a restart.
+    from app import ml_jobs
+    from app.ml_workers import ml_pool
+    ml_pool.start()
+    ml_jobs.start()
@@ -1,60 +1,308 @@
-import pandas as pd
+"""
+Yield model training and selection
+Cross-validates several candidate regressors in parallel across cores, records
+accuracy next to fit time, serving latency and model size, and exports the most
+accurate candidate that fits the latency and size budgets in the compiled
+serving format, published as the active 'yield' registry release.
+
+    python train_yield_model.py                          # train, select, export
+    python train_yield_model.py --dry-run --jobs 4       # report only
+    python train_yield_model.py --latency-budget-us 200 --size-budget-mb 5
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import platform
+import tempfile
+import time
+
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+import pandas as pd
+import sklearn
+from joblib import Parallel, delayed
 from sklearn.compose import ColumnTransformer
-from sklearn.tree import DecisionTreeRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
-import pickle
-import os
+from sklearn.model_selection import GroupKFold, GroupShuffleSplit
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+from app import ml_registry
+from app.yield_compiled import compile_model, compare, save_artifact
+
+SEED = 0
+COLUMNS = ['Year', 'average_rain_fall_mm_per_year', 'pesticides_tonnes', 'avg_temp', 'Area', 'Item']
+TARGET = 'hg/ha_yield'
+# Pickles of the active model: fallback when no release is active, and verification source
+PICKLE_DIR = os.path.join('app', 'ml_models')
+
+
+def candidates():
+    """Name -> unfitted regressor. Forests use one core each; parallelism is across candidates and folds."""
+    return {
+        'tree_full': DecisionTreeRegressor(random_state=SEED),
+        'tree_depth_12': DecisionTreeRegressor(max_depth=12, min_samples_leaf=2, random_state=SEED),
+        'tree_depth_20': DecisionTreeRegressor(max_depth=20, min_samples_leaf=2, random_state=SEED),
+        'forest_30_depth_16': RandomForestRegressor(
+            n_estimators=30, max_depth=16, min_samples_leaf=2, random_state=SEED, n_jobs=1
+        ),
+        'forest_100_depth_10': RandomForestRegressor(
+            n_estimators=100, max_depth=10, min_samples_leaf=2, random_state=SEED, n_jobs=1
+        ),
+        'hgb_300': HistGradientBoostingRegressor(max_iter=300, random_state=SEED),
+        'hgb_1000_leaves_63': HistGradientBoostingRegressor(
+            max_iter=1000, max_leaf_nodes=63, learning_rate=0.1, random_state=SEED
+        ),
+    }
+
+
+def make_preprocessor():
+    # Dense output: histogram gradient boosting does not accept sparse input
+    return ColumnTransformer(
+        transformers=[
+            ('StandardScale', StandardScaler(), [0, 1, 2, 3]),
+            ('OneHotEncode', OneHotEncoder(drop='first'), [4, 5])
+        ],
+        remainder='passthrough',
+        sparse_threshold=0,
+    )
+
+
+def load_dataset(path):
+    """
+    Features, target and split groups. The CSV repeats each (Area, Item, Year) once per
+    weather station with only avg_temp differing; splitting on that key keeps copies of
+    one harvest out of both sides of a split, so memorizing trees are not rewarded.
+    """
+    df = pd.read_csv(path)
+    df = df.drop(columns=[c for c in df.columns if c.startswith('Unnamed')]).drop_duplicates()
+    groups = df['Area'] + '|' + df['Item'] + '|' + df['Year'].astype(str)
+    return df[COLUMNS], df[TARGET].to_numpy(dtype=np.float64), groups.to_numpy()
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def cv_fold(name, estimator, X, y, train_idx, valid_idx):
+    estimator = sklearn.clone(estimator)
+    estimator.fit(X[train_idx], y[train_idx])
+    pred = estimator.predict(X[valid_idx])
+    return name, mean_absolute_error(y[valid_idx], pred), r2_score(y[valid_idx], pred)
+
+
+def percentile_us(samples, q):
+    return round(float(np.percentile(samples, q)) * 1e6, 2)
+
+
+def fit_and_profile(name, estimator, preprocesser, X_train, y_train, raw_test, X_test, y_test, latency_rows):
+    """Fit on the whole training split, then measure test accuracy, size and serving latency"""
+    estimator = sklearn.clone(estimator)
+    started = time.perf_counter()
+    estimator.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+
+    pred = estimator.predict(X_test)
+    compiled = compile_model(estimator, preprocesser)
+
+    numeric = raw_test[COLUMNS[:4]].to_numpy(dtype=np.float64)
+    areas = raw_test['Area'].tolist()
+    items = raw_test['Item'].tolist()
+    identical = compare(compiled, estimator, preprocesser, numeric, areas, items)
+
+    # Serving latency: compiled single-row path, plus a 1000-row batch
+    rows = list(zip(numeric.tolist(), areas, items))[:latency_rows]
+    single = []
+    for row, area, item in rows:
+        began = time.perf_counter()
+        compiled.predict_one(*row, area, item)
+        single.append(time.perf_counter() - began)
+    batch_n = min(1000, len(numeric))
+    began = time.perf_counter()
+    compiled.predict(numeric[:batch_n], areas[:batch_n], items[:batch_n])
+    batch_seconds = time.perf_counter() - began
+
+    return name, estimator, {
+        'test_mae': round(mean_absolute_error(y_test, pred), 2),
+        'test_r2': round(r2_score(y_test, pred), 5),
+        'fit_seconds': round(fit_seconds, 3),
+        'trees': compiled.tree_count,
+        'nodes': compiled.node_count,
+        'model_bytes': compiled.nbytes,
+        'pickle_bytes': len(pickle.dumps(estimator)),
+        'latency_single_p50_us': percentile_us(single, 50),
+        'latency_single_p95_us': percentile_us(single, 95),
+        'latency_single_p99_us': percentile_us(single, 99),
+        'latency_batch_per_row_us': round(batch_seconds / batch_n * 1e6, 2),
+        'bit_identical': not (identical['batch_mismatches'] or identical['single_mismatches']),
+    }
+
+
+def select(results, latency_budget_us, size_budget_bytes):
+    """Most accurate (cross-validated MAE) candidate within both budgets"""
+    for metrics in results.values():
+        reasons = []
+        if metrics['latency_single_p95_us'] > latency_budget_us:
+            reasons.append(f"p95 {metrics['latency_single_p95_us']} us > {latency_budget_us} us")
+        if metrics['model_bytes'] > size_budget_bytes:
+            reasons.append(f"{metrics['model_bytes']} bytes > {size_budget_bytes} bytes")
+        if not metrics['bit_identical']:
+            reasons.append("compiled output differs from sklearn")
+        metrics['within_budget'] = not reasons
+        metrics['rejected_because'] = reasons
+    eligible = [name for name, m in results.items() if m['within_budget']]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda name: results[name]['cv_mae_mean'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', default='yield_df.csv')
+    parser.add_argument('--output', help="Write the artifact to this directory instead of the model registry")
+    parser.add_argument('--no-activate', action='store_true', help="Publish without making the release active")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=-1, help="Parallel workers (-1: all cores)")
+    parser.add_argument('--only', help="Comma-separated subset of candidates")
+    parser.add_argument('--latency-budget-us', type=float, default=500.0, help="Max single-row p95 latency")
+    parser.add_argument('--size-budget-mb', type=float, default=20.0, help="Max compiled model size")
+    parser.add_argument('--latency-rows', type=int, default=500, help="Test rows timed one by one")
+    parser.add_argument('--report', help="Report path (default: training_report.json in the release)")
+    parser.add_argument('--dry-run', action='store_true', help="Evaluate and report without exporting")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    raw, y, groups = load_dataset(args.dataset)
+    train_idx, test_idx = next(GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=SEED).split(raw, y, groups))
+    raw_train, raw_test = raw.iloc[train_idx], raw.iloc[test_idx]
+    y_train, y_test = y[train_idx], y[test_idx]
+
+    # The preprocessor is unsupervised, so it is fitted once on the training split and shared by every fold
+    preprocesser = make_preprocessor()
+    X_train = preprocesser.fit_transform(raw_train.to_numpy(dtype=object))
+    X_test = preprocesser.transform(raw_test.to_numpy(dtype=object))
+
+    models = candidates()
+    if args.only:
+        models = {name: models[name] for name in args.only.split(',')}
+
+    folds = list(GroupKFold(n_splits=args.folds, shuffle=True, random_state=SEED).split(X_train, y_train, groups[train_idx]))
+    parallel = Parallel(n_jobs=args.jobs)
+    print(f"Cross-validating {len(models)} candidates x {len(folds)} folds...")
+    scores = parallel(
+        delayed(cv_fold)(name, estimator, X_train, y_train, train_idx, valid_idx)
+        for name, estimator in models.items()
+        for train_idx, valid_idx in folds
+    )
+    print("Fitting and profiling candidates...")
+    fitted = parallel(
+        delayed(fit_and_profile)(
+            name, estimator, preprocesser, X_train, y_train, raw_test, X_test, y_test, args.latency_rows
+        )
+        for name, estimator in models.items()
+    )
 
-# Load dataset
-df = pd.read_csv("yield_df.csv")
-df.drop('Unnamed: 0', axis=1, inplace=True)
-df.drop_duplicates(inplace=True)
+    results, estimators = {}, {}
+    for name, estimator, metrics in fitted:
+        mae = [s[1] for s in scores if s[0] == name]
+        r2 = [s[2] for s in scores if s[0] == name]
+        results[name] = {
+            'params': {k: v for k, v in estimator.get_params().items() if isinstance(v, (int, float, str, type(None)))},
+            'cv_mae_mean': round(float(np.mean(mae)), 2),
+            'cv_mae_std': round(float(np.std(mae)), 2),
+            'cv_r2_mean': round(float(np.mean(r2)), 5),
+            **metrics,
+        }
+        estimators[name] = estimator
 
-# Reorder columns
-col = ['Year','average_rain_fall_mm_per_year','pesticides_tonnes', 'avg_temp','Area', 'Item', 'hg/ha_yield']
-df = df[col]
+    winner = select(results, args.latency_budget_us, args.size_budget_mb * 1024 * 1024)
+    report = {
+        'seed': SEED,
+        'dataset': {'path': args.dataset, 'sha256': file_digest(args.dataset), 'rows': len(raw)},
+        'environment': {
+            'python': platform.python_version(),
+            'sklearn': sklearn.__version__,
+            'numpy': np.__version__,
+            'cpu_count': os.cpu_count(),
+        },
+        'folds': args.folds,
+        'split': 'grouped by (Area, Item, Year)',
+        'budgets': {'latency_single_p95_us': args.latency_budget_us, 'size_mb': args.size_budget_mb},
+        'candidates': results,
+        'winner': winner,
+        'elapsed_seconds': round(time.perf_counter() - started, 1),
+    }
 
-# Split features and target
-X = df.drop('hg/ha_yield', axis=1)
-y = df['hg/ha_yield']
+    print(f"\n{'candidate':<22}{'cv MAE':>10}{'cv R2':>9}{'test R2':>9}{'fit s':>8}"
+          f"{'p95 us':>9}{'batch us':>10}{'size KiB':>10}  budget")
+    for name, m in sorted(results.items(), key=lambda item: item[1]['cv_mae_mean']):
+        print(f"{name:<22}{m['cv_mae_mean']:>10}{m['cv_r2_mean']:>9}{m['test_r2']:>9}{m['fit_seconds']:>8}"
+              f"{m['latency_single_p95_us']:>9}{m['latency_batch_per_row_us']:>10}{m['model_bytes'] / 1024:>10.0f}"
+              f"  {'ok' if m['within_budget'] else '; '.join(m['rejected_because'])}")
 
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=0, shuffle=True)
+    if winner is None:
+        print("\nNo candidate fits the budgets; nothing exported")
+    elif args.dry_run:
+        print(f"\nWinner: {winner} (dry run, not exported)")
+    else:
+        estimator = estimators[winner]
+        compiled = compile_model(estimator, preprocesser)
+        metadata = {
+            'source': ['dtr.pkl', 'preprocesser.pkl'],
+            'candidate': winner,
+            'cv_mae': results[winner]['cv_mae_mean'],
+            'test_mae': results[winner]['test_mae'],
+            'test_r2': results[winner]['test_r2'],
+            'sklearn_version': sklearn.__version__,
+            'dataset_sha256': report['dataset']['sha256'],
+        }
+        report['exported'] = {'version': compiled.version}
 
-# Preprocessing
-ohe = OneHotEncoder(drop='first')
-scale = StandardScaler()
+        if args.output:
+            save_artifact(compiled, args.output, metadata=metadata)
+            save_pickles(args.output, estimator, preprocesser)
+            write_report(report, args.report or os.path.join(args.output, 'training_report.json'))
+            print(f"\nWinner: {winner}, serving artifact {compiled.version} saved to {args.output}/")
+        else:
+            # The version is the model fingerprint: retraining the same model only reactivates it
+            if compiled.version not in [r['version'] for r in ml_registry.versions('yield')]:
+                with tempfile.TemporaryDirectory() as staging:
+                    save_artifact(compiled, staging, metadata=metadata)
+                    with open(os.path.join(staging, 'training_report.json'), 'w', encoding='utf-8') as f:
+                        json.dump(report, f, indent=2)
+                    ml_registry.publish('yield', [staging], version=compiled.version, metadata=metadata)
+            if not args.no_activate:
+                ml_registry.activate_version('yield', compiled.version)
+                # The served fallback and the source of `manage.py compile_yield_model --verify`,
+                # so only replaced when the new model becomes the active one
+                save_pickles(PICKLE_DIR, estimator, preprocesser)
+            if args.report:
+                write_report(report, args.report)
+            print(f"\nWinner: {winner}, published yield/{compiled.version}"
+                  + ("" if args.no_activate else " (active)"))
+        return
 
-preprocesser = ColumnTransformer(
-    transformers=[
-        ('StandardScale', scale, [0,1,2,3]),
-        ('OneHotEncode', ohe, [4,5])
-    ], 
-    remainder='passthrough'
-)
+    if args.report:
+        write_report(report, args.report)
 
-X_train_dummy = preprocesser.fit_transform(X_train)
-X_test_dummy = preprocesser.transform(X_test)
 
-# Train model
-dtr = DecisionTreeRegressor()
-dtr.fit(X_train_dummy, y_train)
+def save_pickles(directory, estimator, preprocesser):
+    """The sklearn estimator and preprocessor as dtr.pkl / preprocesser.pkl in `directory`"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'dtr.pkl'), 'wb') as f:
+        pickle.dump(estimator, f)
+    with open(os.path.join(directory, 'preprocesser.pkl'), 'wb') as f:
+        pickle.dump(preprocesser, f)
 
-# Evaluate
-y_pred = dtr.predict(X_test_dummy)
-mae = mean_absolute_error(y_test, y_pred)
-r2 = r2_score(y_test, y_pred)
 
-print(f"Model Training Complete!")
-print(f"MAE: {mae:.2f}")
-print(f"R2 Score: {r2:.4f}")
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {path}")
 
-# Save models
-os.makedirs('app/ml_models', exist_ok=True)
-pickle.dump(dtr, open("app/ml_models/dtr.pkl", "wb"))
-pickle.dump(preprocesser, open("app/ml_models/preprocesser.pkl", "wb"))
 
-print("Models saved to app/ml_models/")
+if __name__ == '__main__':
+    main()